@@ -0,0 +1,550 @@
+import os
+import json
+import time
+import queue
+import shutil
+import signal
+import tempfile
+import itertools
+import threading
+from multiprocessing import Pool, active_children, cpu_count, resource_tracker
+import extract
+import pagecache
+from cache import file_sha256
+from spans import SpanTable
+
+# Budgets for pathological PDFs; None disables a limit
+PAGE_TIMEOUT = 10.0
+DOCUMENT_TIMEOUT = 600.0
+MAX_WORKER_RSS = 2 * 1024 * 1024 * 1024
+# Workers are replaced after this many tasks so fragmented heaps are returned
+MAX_TASKS_PER_CHILD = 64
+QUARANTINE_AFTER = 2
+# A worker that vanished without a result is treated as crashed after this
+CRASH_GRACE = 2.0
+SUPERVISE_INTERVAL = 0.1
+# Documents read into shared memory but not finished yet; None means twice the
+# workers. Their shared copies may add up to this many bytes, which leaves
+# room for the workers' span tables in a 64MB /dev/shm
+WINDOW_DOCUMENTS = None
+WINDOW_BYTES = 24 * 1024 * 1024
+
+_status_dir = None
+
+
+def _init_worker(status_dir):
+    global _status_dir
+    _status_dir = status_dir
+
+
+def _write_status(task_id, *fields):
+    # Replaced in one step, so the parent never reads half a status
+    path = os.path.join(_status_dir, task_id)
+    with open(path + ".tmp", 'w') as f:
+        f.write(" ".join(map(str, fields)))
+    os.replace(path + ".tmp", path)
+
+
+def extract_batch_task(task):
+    task_id, group_id, index, source, seg_from, seg_to, profile = task
+    if _status_dir is not None:
+        # Another task of the same document already failed
+        if os.path.exists(os.path.join(_status_dir, "cancel_" + group_id)):
+            return index, None, "cancelled"
+        # Tells the parent which worker runs the task and since when
+        started = time.time()
+        _write_status(task_id, os.getpid(), started)
+    try:
+        spans = extract.extract_span_range(source, seg_from, seg_to, profile)
+        result = index, spans.to_shared_memory(), None
+    except Exception as e:
+        result = index, None, str(e)
+    if _status_dir is not None:
+        # The result may wait in the parent's queue; budgets stop here
+        _write_status(task_id, os.getpid(), started, time.time())
+    return result
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _worker_rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Quarantine:
+    """
+    Failure counts of PDFs by content hash, kept in a JSON file. Documents
+    that failed `max_failures` times in a row are skipped without being
+    opened; a success clears the count.
+    """
+
+    def __init__(self, path, max_failures=QUARANTINE_AFTER):
+        self.path = path
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def check(self, key):
+        """The reason the document is quarantined, or None."""
+        entry = self._entries.get(key)
+        if entry is None or entry["failures"] < self.max_failures:
+            return None
+        return f"quarantined after {entry['failures']} failures (last: {entry['error']})"
+
+    def record(self, key, error):
+        with self._lock:
+            if error is None:
+                if self._entries.pop(key, None) is None:
+                    return
+            else:
+                entry = self._entries.setdefault(key, {"failures": 0, "error": None})
+                entry["failures"] += 1
+                entry["error"] = error
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not write quarantine file: {e}")
+
+
+class BatchExtractor:
+    """
+    Keeps a single worker pool alive for a whole batch of PDFs.
+
+    Every PDF is read from its file once into shared memory
+    (extract.SharedInput); the workers and the page inspection here open
+    that copy instead of the file. A document's tasks are submitted as soon
+    as it has been read, so extraction overlaps with reading the rest of the
+    batch. At most `window_documents` documents, holding at most
+    `window_bytes` of shared copies, are read and not finished at a time
+    (one document is always let through). Documents are read largest file
+    first and those longer than `pages_per_task` are split into page
+    ranges, so no long document runs alone at the tail of the batch. With a
+    `page_cache`
+    (pagecache.PageSpanCache) only the pages that are not cached yet are
+    extracted.
+
+    Every task gets `page_timeout` seconds per page and every document
+    `document_timeout` seconds from its first task's start; a task's time
+    ends when its worker finishes it, not when its result is read. A worker
+    that overruns a budget, grows beyond `max_worker_rss` bytes or dies is
+    killed and replaced, and its document fails without holding up the
+    others.
+    Workers are also replaced after `max_tasks_per_child` tasks. With a
+    `quarantine` (Quarantine), documents that keep failing are skipped.
+
+    extract() and extract_windows() may run in several threads at once;
+    they share the pool.
+    """
+
+    def __init__(self, processes=None, pages_per_task=16, profile=extract.DEFAULT_PROFILE, page_cache=None,
+                 page_timeout=PAGE_TIMEOUT, document_timeout=DOCUMENT_TIMEOUT, max_worker_rss=MAX_WORKER_RSS,
+                 max_tasks_per_child=MAX_TASKS_PER_CHILD, quarantine=None,
+                 shared_input_max_bytes=extract.SHARED_INPUT_MAX_BYTES, window_documents=WINDOW_DOCUMENTS,
+                 window_bytes=WINDOW_BYTES):
+        self.processes = processes or cpu_count()
+        self.pages_per_task = max(1, pages_per_task)
+        self.profile = profile
+        self.page_cache = page_cache
+        self.page_timeout = page_timeout
+        self.document_timeout = document_timeout
+        self.max_worker_rss = max_worker_rss
+        self.quarantine = quarantine
+        self.shared_input_max_bytes = shared_input_max_bytes
+        self.window_documents = window_documents or 2 * self.processes
+        self.window_bytes = window_bytes
+        self.killed_workers = 0
+        # Tasks given up before their result came, e.g. on a crashed worker
+        self.abandoned_tasks = 0
+        self._task_batches = itertools.count(1)
+        self._status_dir = tempfile.mkdtemp(prefix="round1a_tasks_")
+        # Workers must share our resource tracker, or each one would report the
+        # SharedInput blocks it attached to as leaked when it exits
+        resource_tracker.ensure_running()
+        self.pool = Pool(self.processes, initializer=_init_worker, initargs=(self._status_dir,),
+                         maxtasksperchild=max_tasks_per_child)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            if self.abandoned_tasks:
+                # Tasks of killed or crashed workers never complete, so join() would wait forever
+                self.pool.terminate()
+            else:
+                self.pool.close()
+            self.pool.join()
+            self.pool = None
+            shutil.rmtree(self._status_dir, ignore_errors=True)
+
+    def _inspect_document(self, pdf_path, source):
+        with extract.open_document(source) as doc:
+            page_count = len(doc)
+            page_dims = None
+            if page_count > 0:
+                rect = doc.load_page(0).rect
+                page_dims = {"width": rect.width, "height": rect.height}
+            fingerprints = None
+            if self.page_cache is not None:
+                try:
+                    fingerprints = pagecache.document_fingerprints(doc, self.profile)
+                except Exception as e:
+                    # Only a cache; the document is still extracted, just not from it
+                    print(f"Warning: Page cache skipped for {os.path.basename(pdf_path)}: {e}")
+            return page_count, page_dims, fingerprints
+
+    def _page_ranges(self, doc):
+        """Page ranges still to extract; fills doc["cached"] with the pages the cache had."""
+        if doc["fingerprints"] is None:
+            return [
+                (seg_from, min(seg_from + self.pages_per_task, doc["page_count"]))
+                for seg_from in range(0, doc["page_count"], self.pages_per_task)
+            ]
+        missing = []
+        for page_number, fingerprint in enumerate(doc["fingerprints"]):
+            spans = self.page_cache.get(fingerprint, page_number)
+            if spans is None:
+                missing.append(page_number)
+            else:
+                doc["cached"].append((page_number, spans))
+        return pagecache.missing_ranges(missing, self.pages_per_task)
+
+    def _quarantine_key(self, pdf_path, shared=None):
+        """(key, reason it is quarantined or None); the key is None without a quarantine."""
+        if self.quarantine is None:
+            return None, None
+        try:
+            key = (shared.sha256() if shared is not None else None) or file_sha256(pdf_path)
+        except OSError as e:
+            return None, str(e)
+        return key, self.quarantine.check(key)
+
+    def _record_outcome(self, key, error):
+        if key is not None:
+            self.quarantine.record(key, error)
+
+    def _shared_bytes(self, pdf_path):
+        """Bytes SharedInput would put in shared memory for this file (0 if it keeps the path)."""
+        size = _file_size(pdf_path)
+        return size if size <= self.shared_input_max_bytes else 0
+
+    def _window_full(self, docs, pdf_path):
+        in_flight = [doc for doc in docs if doc["remaining"]]
+        if not in_flight:
+            return False
+        if len(in_flight) >= self.window_documents:
+            return True
+        if self.window_bytes is None:
+            return False
+        in_flight_bytes = sum(doc["input"].size for doc in in_flight if doc["input"].shm is not None)
+        return in_flight_bytes + self._shared_bytes(pdf_path) > self.window_bytes
+
+    def _load_documents(self, pdf_paths, docs, tasks, failed, ready):
+        """
+        Reads and inspects the documents one by one and yields the jobs of
+        each as soon as it is read. Fills `docs`, `tasks` (doc_idx, chunk_idx
+        per job), `failed` with (pdf_path, error) and `ready` with the
+        documents the page cache fully covered. Yields None instead of reading
+        the next document while the window is full.
+        """
+        for pdf_path in pdf_paths:
+            while self._window_full(docs, pdf_path):
+                yield None
+            shared = None
+            key = None
+            try:
+                shared = extract.SharedInput(pdf_path, self.shared_input_max_bytes)
+                key, quarantined = self._quarantine_key(pdf_path, shared)
+                if quarantined is not None:
+                    shared.close()
+                    failed.append((pdf_path, quarantined))
+                    continue
+                page_count, page_dims, fingerprints = self._inspect_document(pdf_path, shared.source)
+            except Exception as e:
+                if shared is not None:
+                    shared.close()
+                self._record_outcome(key, str(e))
+                failed.append((pdf_path, str(e)))
+                continue
+
+            doc = {
+                "path": pdf_path,
+                "key": key,
+                "input": shared,
+                "page_count": page_count,
+                "page_dims": page_dims,
+                "fingerprints": fingerprints,
+                "cached": [],
+                "error": None,
+            }
+            ranges = self._page_ranges(doc)
+            doc["ranges"] = ranges
+            doc["chunks"] = [None] * len(ranges)
+            doc["remaining"] = len(ranges)
+            doc_idx = len(docs)
+            docs.append(doc)
+            if not ranges:
+                shared.close()
+                ready.append(doc)
+                continue
+            for chunk_idx, (seg_from, seg_to) in enumerate(ranges):
+                tasks.append((doc_idx, chunk_idx))
+                yield doc_idx, shared.source, seg_from, seg_to
+
+    def _read_status(self, task_id):
+        """(pid, started, ended or None) a worker wrote for a task, or None before it starts."""
+        try:
+            with open(os.path.join(self._status_dir, task_id)) as f:
+                fields = f.read().split()
+            return int(fields[0]), float(fields[1]), float(fields[2]) if len(fields) > 2 else None
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _kill(self, state):
+        # Only a worker that is still on the task; once it finished it may be idle or on another task
+        status = self._read_status(state["task_id"])
+        if status is None or status[0] != state["pid"] or status[2] is not None:
+            return
+        if state["pid"] in {process.pid for process in active_children()}:
+            try:
+                os.kill(state["pid"], signal.SIGKILL)
+            except ProcessLookupError:
+                return
+            self.killed_workers += 1
+
+    def _overrun(self, state, group_started, live_pids, now):
+        """Why a task has to be stopped, or None; a finished task is charged up to its end."""
+        if state["ended"] is None and state["pid"] not in live_pids:
+            # Workers also exit normally after max_tasks_per_child; give the result time to arrive
+            state["missing_since"] = state["missing_since"] or now
+            if now - state["missing_since"] > CRASH_GRACE:
+                return "worker crashed"
+            return None
+        end = state["ended"] if state["ended"] is not None else now
+        budget = self.page_timeout * state["pages"] if self.page_timeout is not None else None
+        if budget is not None and end - state["started"] > budget:
+            return f"timed out after {budget:.0f}s ({state['pages']} page(s), {self.page_timeout:g}s per page)"
+        if self.document_timeout is not None and end - group_started[state["group"]] > self.document_timeout:
+            return f"document timed out after {self.document_timeout:g}s"
+        if self.max_worker_rss is not None and state["ended"] is None:
+            rss = _worker_rss(state["pid"])
+            if rss > self.max_worker_rss:
+                return f"worker exceeded the memory cap ({rss / 2**20:.0f} MB RSS)"
+        return None
+
+    def _supervise(self, jobs, group_started=None):
+        """
+        Runs `jobs`, an iterable of (group, source, seg_from, seg_to) that is
+        submitted as it is consumed, and yields
+        (index, descriptor, error) in the order they finish. A None job means
+        the iterable has nothing to submit yet; it is asked again after the
+        next result. A group is one
+        document: once one of its jobs fails, the rest are killed or skipped
+        and reported with the same error. `group_started` (group -> start
+        time) carries document budgets across calls.
+        """
+        batch_id = next(self._task_batches)
+        group_started = {} if group_started is None else group_started
+        group_ids = {}
+        running = {}
+        failed_groups = {}
+        results = queue.Queue()
+        jobs = iter(jobs)
+        submitted = 0
+        exhausted = False
+
+        last_check = time.monotonic()
+        while running or not exhausted:
+            # Queue whatever the jobs allow, so workers stay busy while the
+            # caller works on documents that are already extracted
+            while not exhausted:
+                job = next(jobs, StopIteration)
+                if job is StopIteration:
+                    exhausted = True
+                    break
+                if job is None:
+                    break
+                group, source, seg_from, seg_to = job
+                index = submitted
+                submitted += 1
+                group_id = group_ids.setdefault(group, f"{batch_id}_{len(group_ids)}")
+                task_id = f"{group_id}_{index}"
+                running[index] = {"task_id": task_id, "group": group, "group_id": group_id,
+                                  "pages": seg_to - seg_from, "pid": None, "started": None, "ended": None,
+                                  "missing_since": None}
+                self.pool.apply_async(extract_batch_task,
+                                      ((task_id, group_id, index, source, seg_from, seg_to, self.profile),),
+                                      callback=results.put)
+
+            # Everything that finished, so none of it is checked against a budget below
+            finished = []
+            try:
+                finished.append(results.get(timeout=SUPERVISE_INTERVAL))
+                while True:
+                    finished.append(results.get_nowait())
+            except queue.Empty:
+                pass
+            for index, descriptor, error in finished:
+                state = running.pop(index, None)
+                if state is None or state["group"] in failed_groups:
+                    # Killed or cancelled meanwhile; release its shared memory
+                    if descriptor is not None:
+                        SpanTable.from_shared_memory(descriptor)
+                    if state is not None:
+                        self._remove_status(state)
+                        yield index, None, failed_groups[state["group"]]
+                    continue
+                self._remove_status(state)
+                if error is not None:
+                    self._fail_group(failed_groups, state, error)
+                yield index, descriptor, error
+
+            if time.monotonic() - last_check < SUPERVISE_INTERVAL:
+                continue
+            last_check = time.monotonic()
+            now = time.time()
+            live_pids = {process.pid for process in active_children()}
+            started_ids = set(os.listdir(self._status_dir))
+            for index, state in list(running.items()):
+                if state["task_id"] not in started_ids:
+                    continue
+                if state["ended"] is None:
+                    # Read again until the worker reports the task finished
+                    status = self._read_status(state["task_id"])
+                    if status is None:
+                        continue
+                    state["pid"], state["started"], state["ended"] = status
+                    group_started.setdefault(state["group"], state["started"])
+                error = failed_groups.get(state["group"])
+                if error is None:
+                    error = self._overrun(state, group_started, live_pids, now)
+                if error is None:
+                    continue
+                self._fail_group(failed_groups, state, error)
+                self._kill(state)
+                self._remove_status(state)
+                del running[index]
+                self.abandoned_tasks += 1
+                yield index, None, failed_groups[state["group"]]
+
+    def _fail_group(self, failed_groups, state, error):
+        if state["group"] in failed_groups:
+            return
+        failed_groups[state["group"]] = error
+        # Queued tasks of the group see this and return without extracting
+        with open(os.path.join(self._status_dir, "cancel_" + state["group_id"]), 'w'):
+            pass
+
+    def _remove_status(self, state):
+        try:
+            os.remove(os.path.join(self._status_dir, state["task_id"]))
+        except FileNotFoundError:
+            pass
+
+    def extract(self, pdf_paths):
+        """
+        Yields (pdf_path, spans, page_dims, error) for every input PDF in the
+        order the documents finish. `spans` is a SpanTable for the whole
+        document.
+        """
+        docs, tasks, failed, ready = [], [], [], []
+        # Largest first, so the long documents do not end up running alone at the tail
+        pdf_paths = sorted(pdf_paths, key=_file_size, reverse=True)
+        jobs = self._load_documents(pdf_paths, docs, tasks, failed, ready)
+        try:
+            for index, descriptor, error in self._supervise(jobs):
+                yield from self._drain(failed, ready)
+                doc_idx, chunk_idx = tasks[index]
+                doc = docs[doc_idx]
+                doc["remaining"] -= 1
+                if error is not None:
+                    doc["error"] = doc["error"] or error
+                elif doc["error"] is None:
+                    spans = SpanTable.from_shared_memory(descriptor)
+                    if doc["fingerprints"] is not None:
+                        self.page_cache.store_pages(doc["fingerprints"], spans, range(*doc["ranges"][chunk_idx]))
+                    doc["chunks"][chunk_idx] = spans
+                else:
+                    SpanTable.from_shared_memory(descriptor)
+
+                if doc["remaining"] == 0:
+                    doc["input"].close()
+                    self._record_outcome(doc["key"], doc["error"])
+                    if doc["error"] is not None:
+                        yield doc["path"], None, None, doc["error"]
+                    else:
+                        yield doc["path"], self._document_spans(doc), doc["page_dims"], None
+                    doc["chunks"] = None
+                    doc["cached"] = None
+            yield from self._drain(failed, ready)
+        finally:
+            for doc in docs:
+                doc["input"].close()
+
+    def _drain(self, failed, ready):
+        """Yields the documents that failed to load or came fully from the page cache."""
+        while failed:
+            pdf_path, error = failed.pop(0)
+            yield pdf_path, None, None, error
+        while ready:
+            doc = ready.pop(0)
+            self._record_outcome(doc["key"], None)
+            yield doc["path"], self._document_spans(doc), doc["page_dims"], None
+            doc["cached"] = None
+
+    def extract_windows(self, pdf_path, ranges):
+        """
+        Yields the SpanTable of each (seg_from, seg_to) page range of one
+        document in order, with at most one range per worker in flight, under
+        the same budgets and quarantine as extract(). Raises RuntimeError if
+        the document is quarantined or a range fails.
+        """
+        with extract.SharedInput(pdf_path, self.shared_input_max_bytes) as shared:
+            key, quarantined = self._quarantine_key(pdf_path, shared)
+            if quarantined is not None:
+                raise RuntimeError(quarantined)
+            group_started = {}
+            for i in range(0, len(ranges), self.processes):
+                group = ranges[i:i + self.processes]
+                descriptors = [None] * len(group)
+                error = None
+                jobs = [(pdf_path, shared.source, seg_from, seg_to) for seg_from, seg_to in group]
+                for index, descriptor, task_error in self._supervise(jobs, group_started):
+                    descriptors[index] = descriptor
+                    error = error or task_error
+                if error is not None:
+                    for descriptor in descriptors:
+                        if descriptor is not None:
+                            SpanTable.from_shared_memory(descriptor)
+                    self._record_outcome(key, error)
+                    raise RuntimeError(error)
+                for descriptor in descriptors:
+                    yield SpanTable.from_shared_memory(descriptor)
+        self._record_outcome(key, None)
+
+    def _document_spans(self, doc):
+        pieces = doc["cached"] + [(start, spans) for (start, _), spans in zip(doc["ranges"], doc["chunks"])]
+        pieces.sort(key=lambda piece: piece[0])
+        return SpanTable.concat([spans for _, spans in pieces])
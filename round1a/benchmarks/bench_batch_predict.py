@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Throughput of parse_batch on many small PDFs with one predict call per
+document against cross-document batched prediction (PDFParser.parse_batch
+with `predict_batch_rows`).
+
+The corpus is `--copies` copies of every sample PDF plus `--synthetic-docs`
+short synthetic documents (benchmarks/synthetic.py). Bookmarks and the
+outline cache are off so every document goes through the model. Both runs
+share one warm BatchExtractor; the script checks they write the same
+outlines and reports documents/s, the number of predict calls and the time
+spent inside them. Extraction dominates the end-to-end time on small
+machines, so the prediction stage is also timed on its own over the
+already-featurized documents.
+
+    python benchmarks/bench_batch_predict.py --copies 20 --synthetic-docs 60
+    python benchmarks/bench_batch_predict.py --sklearn --n-jobs -1
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch
+from parser import PDFParser, PREDICT_BATCH_ROWS
+from bench_pipeline import FEATURES, DEFAULT_PDF_DIR, DEFAULT_SYNTHETIC_DIR, load_models
+from synthetic import ensure_synthetic_corpus
+
+
+class CountingModel:
+    """Wraps a model to count predict calls and the time spent in them."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self.seconds = 0.0
+
+    def predict(self, X):
+        t0 = time.perf_counter()
+        try:
+            return self.model.predict(X)
+        finally:
+            self.calls += 1
+            self.seconds += time.perf_counter() - t0
+
+
+def build_corpus(work_dir, pdf_dir, copies, synthetic_docs, synthetic_dir):
+    paths = []
+    samples = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+    for copy in range(copies):
+        for sample in samples:
+            path = os.path.join(work_dir, f"{copy:03d}_{os.path.basename(sample)}")
+            shutil.copy(sample, path)
+            paths.append(path)
+    for seed in range(synthetic_docs):
+        paths.extend(ensure_synthetic_corpus(synthetic_dir, [1 + seed % 3], seed=seed))
+    return paths
+
+
+def timed_batch(parser, model, extractor, pdf_paths, output_dir, predict_batch_rows):
+    model.calls = 0
+    model.seconds = 0.0
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = parser.parse_batch(pdf_paths, output_dir, extractor=extractor,
+                                     predict_batch_rows=predict_batch_rows)
+    elapsed = time.perf_counter() - t0
+    return results, {
+        "seconds": elapsed,
+        "docs_per_s": len(pdf_paths) / elapsed,
+        "predict_calls": model.calls,
+        "predict_seconds": model.seconds,
+    }
+
+
+def predict_stage(parser, extractor, pdf_paths, rounds):
+    """Best time to label every document's rows one predict call at a time vs all in one call."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        frames = [parser._create_features_for_new_pdf(path, spans, dims)
+                  for path, spans, dims, error in extractor.extract(pdf_paths) if error is None]
+    frames = [frame for frame in frames if not frame.empty]
+
+    def per_document():
+        return [parser._predict_labels(frame) for frame in frames]
+
+    def batched():
+        labels = parser._predict_labels(pd.concat(frames, ignore_index=True))
+        return np.split(labels, np.cumsum([len(frame) for frame in frames])[:-1])
+
+    times = {}
+    labels = {}
+    for name, fn in (("per_document", per_document), ("batched", batched)):
+        best = float("inf")
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            labels[name] = fn()
+            best = min(best, time.perf_counter() - t0)
+        times[name] = best
+    same = all(np.array_equal(a, b) for a, b in zip(labels["per_document"], labels["batched"]))
+    return {
+        "rows": int(sum(len(frame) for frame in frames)),
+        "per_document_seconds": times["per_document"],
+        "batched_seconds": times["batched"],
+        "speedup": times["per_document"] / times["batched"],
+        "same_labels": same,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--copies", type=int, default=20, help="Copies of every sample PDF")
+    arg_parser.add_argument("--synthetic-docs", type=int, default=60, help="Additional 1-3 page synthetic PDFs")
+    arg_parser.add_argument("--synthetic-dir", default=DEFAULT_SYNTHETIC_DIR)
+    arg_parser.add_argument("--batch-rows", type=int, default=PREDICT_BATCH_ROWS)
+    arg_parser.add_argument("--sklearn", action="store_true", help="Use the pickled sklearn forest")
+    arg_parser.add_argument("--n-jobs", type=int, default=-1, help="Prediction threads (-1: every CPU)")
+    arg_parser.add_argument("--rounds", type=int, default=2)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    model, label_encoder = load_models(use_sklearn=args.sklearn)
+    model.n_jobs = args.n_jobs
+    counting = CountingModel(model)
+    parser = PDFParser(model=counting, label_encoder=label_encoder, feature_list=FEATURES, use_bookmarks=False)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_paths = build_corpus(work_dir, args.pdf_dir, args.copies, args.synthetic_docs, args.synthetic_dir)
+        runs = {"per_document": None, "batched": None}
+        outputs = {}
+        with batch.BatchExtractor() as extractor:
+            for _ in range(args.rounds):
+                for name, batch_rows in (("per_document", None), ("batched", args.batch_rows)):
+                    results, stats = timed_batch(parser, counting, extractor, pdf_paths,
+                                                 os.path.join(work_dir, name), batch_rows)
+                    outputs[name] = results
+                    if runs[name] is None or stats["seconds"] < runs[name]["seconds"]:
+                        runs[name] = stats
+            stage = predict_stage(parser, extractor, pdf_paths, args.rounds)
+
+    same_output = all(outputs["per_document"][path] == outputs["batched"][path] for path in pdf_paths)
+    same_output = same_output and stage["same_labels"]
+    results = {
+        "documents": len(pdf_paths),
+        "model": "sklearn" if args.sklearn else "flat",
+        "n_jobs": args.n_jobs,
+        "cpus": os.cpu_count(),
+        "batch_rows": args.batch_rows,
+        "runs": runs,
+        "speedup": runs["per_document"]["seconds"] / runs["batched"]["seconds"],
+        "predict_stage": stage,
+        "same_output": same_output,
+    }
+
+    for name, stats in runs.items():
+        print(f"{name:>13}: {stats['seconds']:.2f}s, {stats['docs_per_s']:.1f} docs/s, "
+              f"{stats['predict_calls']} predict call(s) taking {stats['predict_seconds']:.2f}s")
+    print(f"Prediction stage alone ({stage['rows']} rows): {stage['per_document_seconds']:.3f}s per document, "
+          f"{stage['batched_seconds']:.3f}s batched ({stage['speedup']:.1f}x)")
+    print(f"Batched prediction: {results['speedup']:.2f}x the throughput of per-document prediction "
+          f"over {len(pdf_paths)} documents ({'same' if same_output else 'DIFFERENT'} outlines)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0 if same_output else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
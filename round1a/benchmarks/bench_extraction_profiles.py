@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Reports what the lean "text" extraction profile saves over the "full" one
+(PyMuPDF's default get_text("dict") flags, which decode image blocks).
+
+For every PDF both profiles extract all pages in this process. The script
+checks that the parser assembles the same lines from both (image blocks can
+split a span in two, so the raw spans may differ) and reports wall time, the
+Python allocation peak (tracemalloc) and the image blocks/bytes the full
+profile decoded and threw away.
+
+    python benchmarks/bench_extraction_profiles.py
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tracemalloc
+import pymupdf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract
+from parser import PDFParser
+from spans import SpanTableBuilder
+
+DEFAULT_PDF_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..",
+    "hackathon-task", "sample-1a", "Datasets", "Pdfs"
+)
+
+
+def run_profile(pdf_path, profile):
+    image_blocks = 0
+    image_bytes = 0
+    builder = SpanTableBuilder()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with pymupdf.open(pdf_path) as doc:
+        for page_number in range(len(doc)):
+            blocks = extract.page_text_blocks(doc.load_page(page_number), profile)
+            for block in blocks:
+                if block.get('type') == 1:
+                    image_blocks += 1
+                    image_bytes += len(block.get('image', b''))
+            builder.add_page(page_number, blocks)
+            del blocks
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": elapsed,
+        "peak_bytes": peak,
+        "image_blocks": image_blocks,
+        "image_bytes": image_bytes,
+        "spans": builder.build(),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    # Line assembly never touches the model, any placeholder will do
+    parser = PDFParser(model=object(), label_encoder=object(), feature_list=["page"])
+
+    results = []
+    print(f"{'Document':<42} {'Images':>7} {'Image MB':>9} {'full ms':>8} {'text ms':>8} "
+          f"{'full peak MB':>13} {'text peak MB':>13} {'Same':>5}")
+    print("-" * 112)
+    for pdf_path in sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf"))):
+        full = run_profile(pdf_path, "full")
+        text = run_profile(pdf_path, "text")
+        same = parser._assemble_lines(full["spans"], pdf_path).equals(parser._assemble_lines(text["spans"], pdf_path))
+        results.append({
+            "document": os.path.basename(pdf_path),
+            "image_blocks": full["image_blocks"],
+            "image_bytes": full["image_bytes"],
+            "full_seconds": full["seconds"],
+            "text_seconds": text["seconds"],
+            "full_peak_bytes": full["peak_bytes"],
+            "text_peak_bytes": text["peak_bytes"],
+            "same_lines": same,
+        })
+        print(f"{os.path.basename(pdf_path)[:42]:<42} {full['image_blocks']:>7} {full['image_bytes'] / 1e6:>9.2f} "
+              f"{full['seconds'] * 1000:>8.1f} {text['seconds'] * 1000:>8.1f} "
+              f"{full['peak_bytes'] / 1e6:>13.2f} {text['peak_bytes'] / 1e6:>13.2f} {str(same):>5}")
+
+    full_time = sum(r["full_seconds"] for r in results)
+    text_time = sum(r["text_seconds"] for r in results)
+    print("-" * 112)
+    print(f"Total time: full {full_time * 1000:.1f} ms, text {text_time * 1000:.1f} ms "
+          f"({(1 - text_time / full_time) * 100:.1f}% saved)")
+    print(f"Image payload skipped: {sum(r['image_bytes'] for r in results) / 1e6:.2f} MB "
+          f"in {sum(r['image_blocks'] for r in results)} blocks")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
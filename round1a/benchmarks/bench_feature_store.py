@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+What the feature store (featurestore.py) saves when features are needed
+again: re-scoring with another model, threshold experiments, retraining.
+
+The corpus is the sample PDFs plus synthetic documents of
+`--synthetic-pages` pages. Every document is parsed once into a fresh
+store, then the script times, best of `--rounds`:
+
+    reparse          extraction and feature engineering of every PDF
+    store            every document back from the store (the CSV's columns)
+    csv              the same rows from one CSV file, the notebook's format
+    table            the same rows from one columnar table, the format
+                     training/curation.py writes its dataset in
+    store_features   only the model's feature columns from the store
+    csv_features     only those columns from the CSV (usecols)
+    rescore_store    stored features + prediction, i.e. scoring with a new model
+    rescore_reparse  extraction, features and prediction
+
+It checks the stored features equal the computed ones and that re-scoring
+from the store gives the same labels. bbox is left out of the CSV and table
+comparisons, the store rebuilds it from x0/y0/x1/y1.
+
+    python benchmarks/bench_feature_store.py --synthetic-pages 50 400 1000
+    python benchmarks/bench_feature_store.py --json feature_store.json
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import columnar
+from parser import PDFParser
+from featurestore import FeatureStore
+from bench_pipeline import FEATURES, DEFAULT_PDF_DIR, DEFAULT_SYNTHETIC_DIR, load_models
+from synthetic import ensure_synthetic_corpus
+
+
+def best_time(fn, rounds):
+    best = float("inf")
+    result = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--synthetic-pages", type=int, nargs="*", default=[50, 400])
+    arg_parser.add_argument("--synthetic-dir", default=DEFAULT_SYNTHETIC_DIR)
+    arg_parser.add_argument("--sklearn", action="store_true", help="Use the pickled sklearn forest")
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    pdf_paths += ensure_synthetic_corpus(args.synthetic_dir, args.synthetic_pages)
+    model, label_encoder = load_models(use_sklearn=args.sklearn)
+    parser = PDFParser(model=model, label_encoder=label_encoder, feature_list=FEATURES, use_bookmarks=False)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = FeatureStore.for_parser(os.path.join(work_dir, "store"), parser)
+
+        def reparse():
+            return [parser._create_features_for_new_pdf(path) for path in pdf_paths]
+
+        times = {}
+        times["reparse"], frames = best_time(reparse, args.rounds)
+        parser.feature_store = store
+        with contextlib.redirect_stdout(io.StringIO()):
+            reparse()
+        keys = [store.key_for(path) for path in pdf_paths]
+        computed = pd.concat(frames, ignore_index=True)
+
+        csv_path = os.path.join(work_dir, "features.csv")
+        table_dir = os.path.join(work_dir, "features")
+        flat = computed.drop(columns=["bbox"])
+        flat.to_csv(csv_path, index=False)
+        columnar.write_table(table_dir, flat)
+        loaded = store.load(keys)
+        times["store"], _ = best_time(lambda: store.load(keys, list(flat.columns)), args.rounds)
+        times["csv"], _ = best_time(lambda: pd.read_csv(csv_path), args.rounds)
+        times["table"], _ = best_time(lambda: columnar.read_frame(table_dir), args.rounds)
+        times["store_features"], _ = best_time(lambda: store.load(keys, FEATURES), args.rounds)
+        times["csv_features"], _ = best_time(lambda: pd.read_csv(csv_path, usecols=FEATURES), args.rounds)
+
+        def rescore_store():
+            return [parser._predict_labels(parser._load_stored_features(path)) for path in pdf_paths]
+
+        parser.feature_store = None
+
+        def rescore_reparse():
+            return [parser._predict_labels(frame) for frame in reparse()]
+
+        times["rescore_reparse"], reparsed_labels = best_time(rescore_reparse, args.rounds)
+        parser.feature_store = store
+        times["rescore_store"], stored_labels = best_time(rescore_store, args.rounds)
+        store_bytes = store.stats()["bytes"]
+        csv_bytes = os.path.getsize(csv_path)
+
+    same_features = loaded.drop(columns=["sha256"]).equals(computed)
+    same_labels = all(np.array_equal(a, b) for a, b in zip(reparsed_labels, stored_labels))
+    results = {
+        "documents": len(pdf_paths),
+        "rows": len(computed),
+        "store_bytes": store_bytes,
+        "csv_bytes": csv_bytes,
+        "seconds": times,
+        "load_speedup": times["csv"] / times["store"],
+        "table_speedup": times["csv"] / times["table"],
+        "rescore_speedup": times["rescore_reparse"] / times["rescore_store"],
+        "same_features": same_features,
+        "same_labels": same_labels,
+    }
+
+    print(f"{len(pdf_paths)} documents, {len(computed)} rows; store {store_bytes / 1e6:.1f} MB, "
+          f"CSV {csv_bytes / 1e6:.1f} MB")
+    for name, seconds in times.items():
+        print(f"{name:>16}: {seconds * 1000:.1f} ms")
+    print(f"Loading from the store: {results['load_speedup']:.1f}x faster than CSV, from one table "
+          f"{results['table_speedup']:.1f}x; re-scoring "
+          f"{results['rescore_speedup']:.1f}x faster than re-parsing "
+          f"({'same' if same_features else 'DIFFERENT'} features, {'same' if same_labels else 'DIFFERENT'} labels)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0 if same_features and same_labels else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Compares the per-line feature loop (PDFParser._engineer_features) with the
+vectorized path (PDFParser._engineer_features_vectorized).
+
+Every PDF is extracted once, its lines are optionally repeated to simulate a
+longer document, and both paths are timed on the same lines. The 12 model
+features are checked for equality before any timing is reported.
+
+    python benchmarks/bench_features.py --repeat 50
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract
+from parser import PDFParser
+
+FEATURES = [
+    'page', 'avg_font_size', 'y_position', 'is_bold', 'is_all_caps',
+    'text_len', 'starts_with_numbering', 'relative_font_size',
+    'norm_y_pos', 'is_centered', 'space_before', 'space_after'
+]
+DEFAULT_PDF_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..",
+    "hackathon-task", "sample-1a", "Datasets", "Pdfs"
+)
+
+
+def repeat_lines(lines_df, repeat):
+    if repeat <= 1:
+        return lines_df.reset_index(drop=True)
+    page_count = int(lines_df['page'].max())
+    copies = []
+    for i in range(repeat):
+        copy = lines_df.copy()
+        copy['page'] = copy['page'] + i * page_count
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def run_loop(parser, lines_df, page_height, page_width):
+    lines = lines_df.drop(columns=['x0', 'y0', 'x1', 'y1']).to_dict('records')
+    t0 = time.perf_counter()
+    stats = parser._get_doc_stats(lines)
+    featured = parser._engineer_features(lines, stats, page_height, page_width)
+    result = pd.DataFrame(featured)
+    elapsed = time.perf_counter() - t0
+    return result, elapsed
+
+
+def run_vectorized(parser, lines_df, page_height, page_width):
+    lines_df = lines_df.copy()
+    t0 = time.perf_counter()
+    stats = parser._get_doc_stats_vectorized(lines_df)
+    result = parser._engineer_features_vectorized(lines_df, stats, page_height, page_width)
+    elapsed = time.perf_counter() - t0
+    return result, elapsed
+
+
+def features_match(expected, actual):
+    for feature in FEATURES:
+        a = expected[feature].to_numpy(dtype=np.float64)
+        b = actual[feature].to_numpy(dtype=np.float64)
+        if not np.array_equal(a, b):
+            return False
+    return True
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--repeat", type=int, default=20, help="Repeat each document's lines this many times")
+    arg_parser.add_argument("--rounds", type=int, default=3, help="Best of N timing rounds")
+    args = arg_parser.parse_args()
+
+    # The feature methods never touch the model, any placeholder will do
+    parser = PDFParser(model=object(), label_encoder=object(), feature_list=FEATURES)
+
+    pdf_files = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    if not pdf_files:
+        print(f"No PDF files found in {args.pdf_dir}")
+        return
+
+    print(f"{'Document':<45} {'Lines':>8} {'Loop (ms)':>10} {'Vector (ms)':>12} {'Speedup':>8} {'Match':>6}")
+    print("-" * 94)
+    total_loop = 0.0
+    total_vectorized = 0.0
+    for pdf_path in pdf_files:
+        extractor = extract.TextExtractor(pdf_path)
+        dims = extractor.get_page_dimensions(0)
+        spans = extractor.extract_span_table_multiprocessing()
+        lines_df = repeat_lines(parser._assemble_lines(spans, pdf_path), args.repeat)
+        if lines_df.empty:
+            continue
+
+        loop_time = float("inf")
+        vectorized_time = float("inf")
+        for _ in range(args.rounds):
+            expected, elapsed = run_loop(parser, lines_df, dims["height"], dims["width"])
+            loop_time = min(loop_time, elapsed)
+            actual, elapsed = run_vectorized(parser, lines_df, dims["height"], dims["width"])
+            vectorized_time = min(vectorized_time, elapsed)
+
+        match = features_match(expected, actual)
+        total_loop += loop_time
+        total_vectorized += vectorized_time
+        print(f"{os.path.basename(pdf_path)[:45]:<45} {len(lines_df):>8} {loop_time * 1000:>10.2f} "
+              f"{vectorized_time * 1000:>12.2f} {loop_time / vectorized_time:>7.1f}x {str(match):>6}")
+
+    print("-" * 94)
+    print(f"{'Total':<45} {'':>8} {total_loop * 1000:>10.2f} {total_vectorized * 1000:>12.2f} "
+          f"{total_loop / total_vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Times the pickled sklearn forest against the flattened FlatForest on the
+feature rows of every sample PDF, after checking both predict the same labels.
+
+    python benchmarks/bench_forest.py --rounds 20
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+import joblib
+import pandas as pd
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+
+import forest
+from parser import PDFParser
+
+FEATURES = [
+    'page', 'avg_font_size', 'y_position', 'is_bold', 'is_all_caps',
+    'text_len', 'starts_with_numbering', 'relative_font_size',
+    'norm_y_pos', 'is_centered', 'space_before', 'space_after'
+]
+DEFAULT_PDF_DIR = os.path.join(ROUND1A_DIR, "..", "hackathon-task", "sample-1a", "Datasets", "Pdfs")
+
+
+def best_time(fn, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--rounds", type=int, default=10, help="Best of N timing rounds")
+    args = arg_parser.parse_args()
+
+    model = joblib.load(os.path.join(ROUND1A_DIR, "random_forest_model.pkl"))
+    label_encoder = joblib.load(os.path.join(ROUND1A_DIR, "label_encoder.pkl"))
+    with tempfile.TemporaryDirectory() as model_dir:
+        forest.export_forest(model, label_encoder, model_dir)
+        flat_model, decoder = forest.load_flat_model(model_dir)
+
+    parser = PDFParser(model=model, label_encoder=label_encoder, feature_list=FEATURES)
+
+    print(f"{'Document':<45} {'Rows':>6} {'sklearn (ms)':>13} {'flat (ms)':>10} {'Speedup':>8} {'Match':>6}")
+    print("-" * 93)
+    total_sklearn = 0.0
+    total_flat = 0.0
+    for pdf_path in sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf"))):
+        df = parser._create_features_for_new_pdf(pdf_path)
+        if df.empty:
+            continue
+        X = df[FEATURES]
+
+        mismatches = forest.verify(model, label_encoder, flat_model, decoder, X)
+        sklearn_time = best_time(lambda: model.predict(X), args.rounds)
+        flat_time = best_time(lambda: flat_model.predict(X), args.rounds)
+        total_sklearn += sklearn_time
+        total_flat += flat_time
+        print(f"{os.path.basename(pdf_path)[:45]:<45} {len(X):>6} {sklearn_time * 1000:>13.2f} "
+              f"{flat_time * 1000:>10.2f} {sklearn_time / flat_time:>7.1f}x {str(mismatches == 0):>6}")
+
+    print("-" * 93)
+    print(f"{'Total':<45} {'':>6} {total_sklearn * 1000:>13.2f} {total_flat * 1000:>10.2f} "
+          f"{total_sklearn / total_flat:>7.1f}x")
+
+    X = pd.DataFrame(forest.random_feature_matrix(model, 20000), columns=FEATURES)
+    print(f"\nRandom rows near the split thresholds: "
+          f"{forest.verify(model, label_encoder, flat_model, decoder, X)} mismatches out of {len(X)}")
+
+
+if __name__ == "__main__":
+    main()
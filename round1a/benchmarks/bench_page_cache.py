@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Measures incremental re-extraction with the per-page span cache.
+
+A synthetic document (benchmarks/synthetic.py) is parsed once to fill an empty
+page cache. Then a revision with a few edited pages is parsed without the
+cache and with the warm cache. The script checks that the cached run writes
+the same outline as the uncached one and reports the time of each run.
+
+    python benchmarks/bench_page_cache.py --pages 800 --edited 5
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import pymupdf
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parser import PDFParser
+from pagecache import PageSpanCache
+from bench_pipeline import FEATURES, DEFAULT_SYNTHETIC_DIR, load_models
+from synthetic import ensure_synthetic_corpus
+
+
+def edit_pages(source_path, target_path, page_count, edited):
+    """Copy of the document with a new heading stamped on `edited` evenly spread pages."""
+    doc = pymupdf.open(source_path)
+    step = max(1, page_count // (edited + 1))
+    pages = [min(page_count - 1, step * (i + 1)) for i in range(edited)]
+    for page_number in pages:
+        doc.load_page(page_number).insert_text((72, 60), f"Revised Section {page_number}", fontsize=14, fontname="hebo")
+    doc.save(target_path, garbage=3, deflate=True)
+    doc.close()
+    return pages
+
+
+def timed_parse(parser, pdf_path, output_dir):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        output = parser.parse_and_save(pdf_path, output_dir, check_cache=False)
+    return output, time.perf_counter() - t0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pages", type=int, default=800)
+    arg_parser.add_argument("--edited", type=int, default=5, help="Number of pages changed in the revision")
+    arg_parser.add_argument("--synthetic-dir", default=DEFAULT_SYNTHETIC_DIR)
+    args = arg_parser.parse_args()
+
+    model, label_encoder = load_models(use_sklearn=False)
+    original = ensure_synthetic_corpus(args.synthetic_dir, [args.pages])[0]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        revision = os.path.join(work_dir, "revision.pdf")
+        edited_pages = edit_pages(original, revision, args.pages, args.edited)
+        cache = PageSpanCache(os.path.join(work_dir, "page_cache"))
+        plain = PDFParser(model=model, label_encoder=label_encoder, feature_list=FEATURES, use_bookmarks=False)
+        cached = PDFParser(model=model, label_encoder=label_encoder, feature_list=FEATURES, use_bookmarks=False,
+                           page_cache=cache)
+
+        _, fill_time = timed_parse(cached, original, os.path.join(work_dir, "fill"))
+        expected, cold_time = timed_parse(plain, revision, os.path.join(work_dir, "cold"))
+        hits_before, misses_before = cache.hits, cache.misses
+        actual, warm_time = timed_parse(cached, revision, os.path.join(work_dir, "warm"))
+
+    results = {
+        "pages": args.pages,
+        "edited_pages": edited_pages,
+        "fill_seconds": fill_time,
+        "cold_seconds": cold_time,
+        "warm_seconds": warm_time,
+        "page_hits": cache.hits - hits_before,
+        "page_misses": cache.misses - misses_before,
+        "same_output": expected == actual,
+    }
+    print(json.dumps(results, indent=4))
+    print(f"Revision with {args.edited} edited page(s): {cold_time:.2f}s without the page cache, "
+          f"{warm_time:.2f}s with it ({warm_time / cold_time * 100:.0f}% of cold)")
+    return 0 if results["same_output"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Stage-by-stage benchmark of the round1a pipeline.
+
+Runs the sample corpus plus synthetic PDFs (benchmarks/synthetic.py) through
+every stage separately, each timed over several rounds:
+
+    extract_serial    all pages in this process (extract.extract_span_range)
+    extract_parallel  TextExtractor.extract_span_table_multiprocessing on a warm pool
+    lines             PDFParser._assemble_lines (or _assemble_native_lines)
+    features          doc stats + PDFParser._engineer_features_vectorized
+    predict           PDFParser._predict_labels
+    write             PDFParser._format_predictions_to_json + the JSON file
+
+For every document and stage it reports the median time, pages/s and
+p50/p90/p99 over the rounds, plus the peak RSS of this process and of the pool
+workers. --json writes everything in machine-readable form; --compare takes an
+earlier --json file and flags stages whose median pages/s dropped by more than
+--tolerance, exiting non-zero so CI can catch regressions.
+
+    python benchmarks/bench_pipeline.py --synthetic-pages 10 100 1000 5000 --json bench.json
+    python benchmarks/bench_pipeline.py --json new.json --compare bench.json
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import joblib
+import numpy as np
+import pymupdf
+from multiprocessing import Pool, cpu_count
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import extract
+import forest
+from parser import PDFParser, LINE_ASSEMBLY_MODES
+from synthetic import ensure_synthetic_corpus
+
+FEATURES = [
+    'page', 'avg_font_size', 'y_position', 'is_bold', 'is_all_caps',
+    'text_len', 'starts_with_numbering', 'relative_font_size',
+    'norm_y_pos', 'is_centered', 'space_before', 'space_after'
+]
+STAGES = ("extract_serial", "extract_parallel", "lines", "features", "predict", "write")
+DEFAULT_PDF_DIR = os.path.join(ROUND1A_DIR, "..", "hackathon-task", "sample-1a", "Datasets", "Pdfs")
+DEFAULT_SYNTHETIC_DIR = os.path.join(tempfile.gettempdir(), "round1a_synthetic")
+
+
+def peak_rss_bytes(pid="self"):
+    """High-water mark of the resident set (Linux only, None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def load_models(use_sklearn):
+    model = joblib.load(os.path.join(ROUND1A_DIR, "random_forest_model.pkl"))
+    label_encoder = joblib.load(os.path.join(ROUND1A_DIR, "label_encoder.pkl"))
+    if use_sklearn:
+        return model, label_encoder
+    with tempfile.TemporaryDirectory() as model_dir:
+        forest.export_forest(model, label_encoder, model_dir)
+        return forest.load_flat_model(model_dir)
+
+
+def summarize(times, pages):
+    times = np.asarray(times)
+    median = float(np.percentile(times, 50))
+    return {
+        "p50": median,
+        "p90": float(np.percentile(times, 90)),
+        "p99": float(np.percentile(times, 99)),
+        "min": float(times.min()),
+        "pages_per_s": pages / median if median > 0 else None,
+    }
+
+
+def time_stage(fn, rounds):
+    times = []
+    result = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, times
+
+
+def bench_document(parser, pdf_path, pool, rounds, output_dir):
+    extractor = extract.TextExtractor(pdf_path, parser.extraction_profile)
+    pages = extractor.page_count
+    dims = extractor.get_page_dimensions(0)
+    times = {}
+
+    spans, times["extract_serial"] = time_stage(
+        lambda: extract.extract_span_range(pdf_path, 0, pages, parser.extraction_profile), rounds)
+    parallel_spans, times["extract_parallel"] = time_stage(
+        lambda: extractor.extract_span_table_multiprocessing(pool), rounds)
+    same_spans = np.array_equal(spans.page, parallel_spans.page) and spans.texts == parallel_spans.texts
+
+    lines_df, times["lines"] = time_stage(lambda: parser._lines_from_spans(spans, pdf_path), rounds)
+
+    def features():
+        df = lines_df.copy()
+        stats = parser._get_doc_stats_vectorized(df)
+        df = parser._engineer_features_vectorized(df, stats, dims["height"], dims["width"])
+        df['page'] -= 1
+        return df
+    featured_df, times["features"] = time_stage(features, rounds)
+
+    labels, times["predict"] = time_stage(lambda: parser._predict_labels(featured_df), rounds)
+    featured_df['predicted_label'] = labels
+
+    def write():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return parser._save_output(pdf_path, output_dir, parser._format_predictions_to_json(featured_df))
+    _, times["write"] = time_stage(write, rounds)
+
+    return {
+        "document": os.path.basename(pdf_path),
+        "pages": pages,
+        "spans": len(spans),
+        "lines": len(lines_df),
+        "parallel_matches_serial": bool(same_spans),
+        "stages": {stage: summarize(times[stage], pages) for stage in STAGES},
+        "peak_rss_bytes": peak_rss_bytes(),
+        "worker_peak_rss_bytes": max(
+            (peak_rss_bytes(worker.pid) or 0 for worker in pool._pool), default=None),
+    }
+
+
+def corpus_totals(documents):
+    pages = sum(d["pages"] for d in documents)
+    totals = {}
+    for stage in STAGES:
+        seconds = sum(d["stages"][stage]["p50"] for d in documents)
+        totals[stage] = {"seconds": seconds, "pages_per_s": pages / seconds if seconds > 0 else None}
+    return {"pages": pages, "stages": totals}
+
+
+def compare(results, baseline, tolerance):
+    """Stages whose median pages/s fell by more than `tolerance` against the baseline."""
+    previous = {d["document"]: d for d in baseline["documents"]}
+    regressions = []
+    for document in results["documents"]:
+        old = previous.get(document["document"])
+        if old is None:
+            continue
+        for stage in STAGES:
+            new_rate = document["stages"][stage]["pages_per_s"]
+            old_rate = old["stages"].get(stage, {}).get("pages_per_s")
+            if new_rate and old_rate and new_rate < old_rate * (1 - tolerance):
+                regressions.append((document["document"], stage, old_rate, new_rate))
+    return regressions
+
+
+def print_table(documents):
+    header = f"{'Document':<40} {'Pages':>6}" + "".join(f" {stage:>16}" for stage in STAGES) + f" {'Peak RSS MB':>12}"
+    print(header)
+    print("-" * len(header))
+    for d in documents:
+        row = f"{d['document'][:40]:<40} {d['pages']:>6}"
+        for stage in STAGES:
+            rate = d["stages"][stage]["pages_per_s"]
+            row += f" {rate:>10.0f} pg/s" if rate else f" {'-':>16}"
+        rss = d["peak_rss_bytes"]
+        row += f" {rss / 1e6:>12.1f}" if rss else f" {'-':>12}"
+        print(row)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--synthetic-dir", default=DEFAULT_SYNTHETIC_DIR,
+                            help="Where generated PDFs are kept between runs")
+    arg_parser.add_argument("--synthetic-pages", type=int, nargs="*", default=[10, 100, 1000],
+                            help="Page counts of the synthetic documents (none to skip)")
+    arg_parser.add_argument("--rounds", type=int, default=5)
+    arg_parser.add_argument("--sklearn", action="store_true", help="Predict with the pickled sklearn model")
+    arg_parser.add_argument("--line-assembly", choices=LINE_ASSEMBLY_MODES, default="sorted")
+    arg_parser.add_argument("--json", help="Write the results to this file")
+    arg_parser.add_argument("--compare", help="Earlier --json results to check for regressions")
+    arg_parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed drop in median pages/s before --compare fails")
+    args = arg_parser.parse_args()
+
+    model, label_encoder = load_models(args.sklearn)
+    parser = PDFParser(model=model, label_encoder=label_encoder, feature_list=FEATURES,
+                       line_assembly=args.line_assembly)
+
+    pdf_files = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    if args.synthetic_pages:
+        pdf_files += ensure_synthetic_corpus(args.synthetic_dir, args.synthetic_pages)
+    if not pdf_files:
+        print("No PDF files to benchmark")
+        return 1
+
+    documents = []
+    with Pool() as pool, tempfile.TemporaryDirectory() as output_dir:
+        # Start the workers before the first timed round
+        pool.map(abs, range(cpu_count()))
+        for pdf_path in pdf_files:
+            documents.append(bench_document(parser, pdf_path, pool, args.rounds, output_dir))
+            print(f"Benchmarked {os.path.basename(pdf_path)}", file=sys.stderr)
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "pymupdf": pymupdf.__version__,
+            "numpy": np.__version__,
+            "cpu_count": cpu_count(),
+            "platform": platform.platform(),
+            "model": "sklearn" if args.sklearn else "flat",
+            "extraction_profile": parser.extraction_profile,
+            "line_assembly": parser.line_assembly,
+        },
+        "rounds": args.rounds,
+        "documents": documents,
+        "totals": corpus_totals(documents),
+    }
+
+    print_table(documents)
+    print()
+    for stage, total in results["totals"]["stages"].items():
+        print(f"{stage:<17} {total['seconds'] * 1000:>10.1f} ms  {total['pages_per_s'] or 0:>10.0f} pages/s")
+    mismatched = [d["document"] for d in documents if not d["parallel_matches_serial"]]
+    if mismatched:
+        print(f"Parallel extraction differs from serial for: {', '.join(mismatched)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for document, stage, old_rate, new_rate in regressions:
+            print(f"Regression: {document} {stage} {old_rate:.0f} -> {new_rate:.0f} pages/s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+I/O of BatchExtractor with every PDF read once into shared memory
+(extract.SharedInput) against every task opening the file itself
+(`shared_input_max_bytes=0`).
+
+The corpus is the sample PDFs plus synthetic documents of
+`--synthetic-pages` pages, so the long ones are split into several page
+range tasks. For both modes it reports the best wall time over `--rounds`,
+the time until the first document came out, and the bytes read by this
+process and by the pool workers from /proc/<pid>/io: `rchar` counts every
+read() call, `read_bytes` what actually came from storage. With
+--drop-caches (root only) the page cache is dropped before every run so
+`read_bytes` shows the cold-cache reads. The script checks both modes
+extract the same spans.
+
+    python benchmarks/bench_shared_input.py --synthetic-pages 50 400 1000
+    sudo python benchmarks/bench_shared_input.py --drop-caches --json shared.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from multiprocessing import active_children
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch
+from bench_pipeline import DEFAULT_PDF_DIR, DEFAULT_SYNTHETIC_DIR
+from synthetic import ensure_synthetic_corpus
+
+MODES = (("per_task_files", 0), ("shared_input", None))
+
+
+def process_io(pid="self"):
+    """{'rchar': ..., 'read_bytes': ...} of a process, empty if /proc is unavailable."""
+    counters = {}
+    try:
+        with open(f"/proc/{pid}/io", 'r') as f:
+            for line in f:
+                name, value = line.split(":")
+                if name in ("rchar", "read_bytes"):
+                    counters[name] = int(value)
+    except OSError:
+        pass
+    return counters
+
+
+def pool_io():
+    """Summed I/O counters of this process and its live pool workers."""
+    total = {"rchar": 0, "read_bytes": 0}
+    for pid in ["self"] + [process.pid for process in active_children()]:
+        for name, value in process_io(pid).items():
+            total[name] += value
+    return total
+
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", 'w') as f:
+        f.write("1\n")
+
+
+def timed_extract(extractor, pdf_paths, cold):
+    """Runs one batch; returns the spans per document and the run's statistics."""
+    if cold:
+        drop_caches()
+    before = pool_io()
+    t0 = time.perf_counter()
+    first = None
+    spans = {}
+    for pdf_path, table, page_dims, error in extractor.extract(pdf_paths):
+        if first is None:
+            first = time.perf_counter() - t0
+        spans[pdf_path] = error if error is not None else table.to_bytes()
+    elapsed = time.perf_counter() - t0
+    after = pool_io()
+    return spans, {
+        "seconds": elapsed,
+        "first_document_seconds": first,
+        "rchar": after["rchar"] - before["rchar"],
+        "read_bytes": after["read_bytes"] - before["read_bytes"],
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--synthetic-pages", type=int, nargs="*", default=[50, 400, 1000])
+    arg_parser.add_argument("--synthetic-dir", default=DEFAULT_SYNTHETIC_DIR)
+    arg_parser.add_argument("--processes", type=int, default=None)
+    arg_parser.add_argument("--pages-per-task", type=int, default=16)
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--drop-caches", action="store_true", help="Drop the page cache before every run (root)")
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    pdf_paths += ensure_synthetic_corpus(args.synthetic_dir, args.synthetic_pages)
+    input_bytes = sum(os.path.getsize(path) for path in pdf_paths)
+
+    runs = {}
+    outputs = {}
+    for name, max_bytes in MODES:
+        options = {} if max_bytes is None else {"shared_input_max_bytes": max_bytes}
+        # Workers are kept for the whole run so their counters cover every task
+        with batch.BatchExtractor(args.processes, args.pages_per_task, max_tasks_per_child=None,
+                                  **options) as extractor:
+            timed_extract(extractor, pdf_paths[:1], cold=False)
+            for _ in range(args.rounds):
+                outputs[name], stats = timed_extract(extractor, pdf_paths, args.drop_caches)
+                if name not in runs or stats["seconds"] < runs[name]["seconds"]:
+                    runs[name] = stats
+
+    same_output = outputs["per_task_files"] == outputs["shared_input"]
+    results = {
+        "documents": len(pdf_paths),
+        "input_bytes": input_bytes,
+        "cpus": os.cpu_count(),
+        "drop_caches": args.drop_caches,
+        "runs": runs,
+        "rchar_saved": 1 - runs["shared_input"]["rchar"] / max(1, runs["per_task_files"]["rchar"]),
+        "speedup": runs["per_task_files"]["seconds"] / runs["shared_input"]["seconds"],
+        "same_output": same_output,
+    }
+
+    print(f"{len(pdf_paths)} documents, {input_bytes / 1e6:.1f} MB of PDF")
+    for name, stats in runs.items():
+        print(f"{name:>15}: {stats['seconds']:.2f}s (first document after {stats['first_document_seconds']:.2f}s), "
+              f"read() {stats['rchar'] / 1e6:.1f} MB, from storage {stats['read_bytes'] / 1e6:.1f} MB")
+    print(f"Shared input: {results['rchar_saved']:.0%} fewer bytes read, {results['speedup']:.2f}x the speed "
+          f"({'same' if same_output else 'DIFFERENT'} spans)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0 if same_output else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Time to first output of a fresh process, the latency of a per-file
+serverless run, for three ways of loading round1a:
+
+    sklearn     parser.py (pandas) with the pickled sklearn forest (joblib)
+    flat        parser.py (pandas) with the flattened forest, what main.py
+                runs when forest_model/ exists
+    fast_start  faststart.py: NumPy only, memory-mapped flattened forest
+
+Every run starts a new interpreter that parses `--pdf` (by default a
+one-page sample without bookmarks) with the outline cache off. The child
+reports when its imports finished, when the model was loaded and when the
+first outline was written; all times are from the moment the parent started
+the process, so interpreter start-up is included. Runs of the modes are interleaved and
+the medians over `--runs` are reported. The script checks every mode writes
+the same outline and exports forest_model/ to a temp directory if it is
+missing.
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --pdf big.pdf --json startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# One page and no bookmarks, so the model runs
+DEFAULT_PDF = os.path.join(ROUND1A_DIR, "..", "hackathon-task", "sample-1a", "Datasets", "Pdfs",
+                           "TOPJUMP-PARTY-INVITATION-20161003-V01.pdf")
+
+# Each child prints "<stage> <time.time()>" lines; {pdf}, {output} and {model_dir} are filled in
+CHILD_PRELUDE = "import time\n"
+MODES = {
+    "sklearn": """
+import joblib
+from parser import PDFParser
+from rules import FEATURES
+print('imported', time.time())
+model = joblib.load('random_forest_model.pkl')
+label_encoder = joblib.load('label_encoder.pkl')
+pdf_parser = PDFParser(model, label_encoder, FEATURES)
+print('loaded', time.time())
+pdf_parser.parse_and_save({pdf!r}, {output!r})
+print('first_output', time.time())
+""",
+    "flat": """
+from parser import PDFParser
+from forest import load_flat_model
+from rules import FEATURES
+print('imported', time.time())
+model, label_decoder = load_flat_model({model_dir!r}, n_jobs=-1)
+pdf_parser = PDFParser(model, label_decoder, FEATURES)
+print('loaded', time.time())
+pdf_parser.parse_and_save({pdf!r}, {output!r})
+print('first_output', time.time())
+""",
+    "fast_start": """
+import faststart
+print('imported', time.time())
+pdf_parser = faststart.build_parser({model_dir!r}, use_cache=False)
+print('loaded', time.time())
+pdf_parser.parse_and_save({pdf!r}, {output!r})
+print('first_output', time.time())
+""",
+}
+STAGES = ("imported", "loaded", "first_output", "exit")
+
+
+def run_child(mode, pdf, output, model_dir):
+    code = CHILD_PRELUDE + MODES[mode].format(pdf=pdf, output=output, model_dir=model_dir)
+    t0 = time.time()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROUND1A_DIR, capture_output=True, text=True)
+    exited = time.time()
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{completed.stderr}")
+    marks = {}
+    for line in completed.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] in STAGES:
+            marks[parts[0]] = float(parts[1])
+    marks["exit"] = exited
+    return {stage: marks[stage] - t0 for stage in STAGES}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf", default=DEFAULT_PDF)
+    arg_parser.add_argument("--runs", type=int, default=7)
+    arg_parser.add_argument("--model-dir", default=os.path.join(ROUND1A_DIR, "forest_model"))
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+    pdf = os.path.abspath(args.pdf)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_dir = args.model_dir
+        if not os.path.isdir(model_dir):
+            model_dir = os.path.join(work_dir, "forest_model")
+            subprocess.run([sys.executable, "forest.py", "export", "random_forest_model.pkl", "label_encoder.pkl",
+                            model_dir], cwd=ROUND1A_DIR, check=True, capture_output=True)
+
+        timings = {mode: [] for mode in MODES}
+        outlines = {}
+        # One untimed run per mode warms the page cache for the imports
+        for run in range(args.runs + 1):
+            for mode in MODES:
+                output = os.path.join(work_dir, f"{mode}_{run}")
+                marks = run_child(mode, pdf, output, model_dir)
+                if run:
+                    timings[mode].append(marks)
+                with open(os.path.join(output, os.path.basename(pdf).replace('.pdf', '.json')), encoding='utf-8') as f:
+                    outlines[mode] = json.load(f)
+
+    medians = {mode: {stage: statistics.median(marks[stage] for marks in runs) for stage in STAGES}
+               for mode, runs in timings.items()}
+    same_output = all(outline == outlines["sklearn"] for outline in outlines.values())
+    results = {
+        "pdf": os.path.basename(pdf),
+        "runs": args.runs,
+        "median_seconds": medians,
+        "speedup": medians["flat"]["first_output"] / medians["fast_start"]["first_output"],
+        "same_output": same_output,
+    }
+
+    print(f"{os.path.basename(pdf)}, median of {args.runs} runs, seconds since process start:")
+    print(f"{'':>12} {'imported':>9} {'loaded':>9} {'output':>9} {'exit':>9}")
+    for mode, stages in medians.items():
+        print(f"{mode:>12} " + " ".join(f"{stages[stage]:9.3f}" for stage in STAGES))
+    print(f"Fast start: first output {results['speedup']:.2f}x sooner than the flat-forest path "
+          f"({'same' if same_output else 'DIFFERENT'} outlines)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0 if same_output else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test for service.py: concurrent clients POST the sample PDFs to
+/outline for a fixed number of requests, then the client-side latencies and
+the service's own /stats are reported.
+
+    python service.py --port 8080 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --clients 8 --requests 200
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import itertools
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+
+DEFAULT_PDF_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..",
+    "hackathon-task", "sample-1a", "Datasets", "Pdfs"
+)
+
+
+def post_pdf(url, pdf_bytes, timeout):
+    request = urllib.request.Request(url + "/outline", data=pdf_bytes, method="POST",
+                                     headers={"Content-Type": "application/pdf"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        payload = json.load(response)
+        return response.status, response.headers.get("X-Outline-Source"), payload
+
+
+def get_json(url, path):
+    with urllib.request.urlopen(url + path, timeout=10) as response:
+        return json.load(response)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--url", default="http://127.0.0.1:8080")
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--clients", type=int, default=8)
+    arg_parser.add_argument("--requests", type=int, default=100, help="Total requests over all clients")
+    arg_parser.add_argument("--timeout", type=float, default=120.0)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    pdfs = [open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))]
+    if not pdfs:
+        print(f"No PDF files found in {args.pdf_dir}")
+        return 1
+
+    stats_before = get_json(args.url, "/stats")
+    work = itertools.islice(itertools.cycle(pdfs), args.requests)
+    work_lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    results_lock = threading.Lock()
+
+    def client():
+        while True:
+            with work_lock:
+                pdf_bytes = next(work, None)
+            if pdf_bytes is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                status, _, _ = post_pdf(args.url, pdf_bytes, args.timeout)
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError:
+                status = "connection error"
+            elapsed = time.perf_counter() - t0
+            with results_lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+    stats_after = get_json(args.url, "/stats")
+
+    latencies = np.array(latencies)
+    batches = stats_after["predict_batches"] - stats_before["predict_batches"]
+    results = {
+        "clients": args.clients,
+        "requests": len(latencies),
+        "wall_seconds": wall,
+        "requests_per_s": len(latencies) / wall,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "latency_ms": {f"p{q}": float(np.percentile(latencies, q)) * 1000 for q in (50, 90, 99)},
+        "predict_batches": batches,
+        "service_stats": stats_after,
+    }
+
+    print(f"{results['requests']} requests from {args.clients} clients in {wall:.2f}s "
+          f"({results['requests_per_s']:.1f} req/s)")
+    print("Status codes: " + ", ".join(f"{k}: {v}" for k, v in results["statuses"].items()))
+    print("Latency: " + ", ".join(f"{k} {v:.1f} ms" for k, v in results["latency_ms"].items()))
+    print(f"Predict calls: {batches} (mean batch {stats_after['mean_batch_size']:.2f} requests, "
+          f"largest {stats_after['largest_batch']})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Generates synthetic report-style PDFs with PyMuPDF for benchmarking: a title
+page, numbered H1/H2/H3 headings in bold Helvetica, justified body paragraphs
+and a running header/footer on every page. Generation is seeded, so the same
+page count always gives the same document.
+
+    python benchmarks/synthetic.py /tmp/synthetic 10 100 1000 5000
+"""
+import os
+import sys
+import random
+import argparse
+import pymupdf
+
+WORDS = (
+    "analysis system data model process result method performance value "
+    "document section report design test review support network service "
+    "quality control policy change project resource plan budget level "
+    "structure function access security record output input example"
+).split()
+PAGE_RECT = pymupdf.paper_rect("letter")
+MARGIN = 72
+HEADING_SIZES = {1: 16, 2: 13, 3: 11.5}
+BODY_SIZE = 10
+
+
+def _sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(8, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def _heading(rng):
+    return " ".join(rng.choices(WORDS, k=rng.randint(2, 5))).title()
+
+
+def generate_pdf(path, page_count, seed=0):
+    rng = random.Random(seed * 100003 + page_count)
+    doc = pymupdf.open()
+
+    page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+    page.insert_textbox(pymupdf.Rect(MARGIN, 220, PAGE_RECT.width - MARGIN, 320),
+                        f"Synthetic Benchmark Report ({page_count} pages)",
+                        fontsize=24, fontname="hebo", align=pymupdf.TEXT_ALIGN_CENTER)
+    page.insert_textbox(pymupdf.Rect(MARGIN, 340, PAGE_RECT.width - MARGIN, 380),
+                        "Generated for round1a performance testing",
+                        fontsize=12, fontname="helv", align=pymupdf.TEXT_ALIGN_CENTER)
+
+    numbers = [0, 0, 0]
+    for page_number in range(1, page_count):
+        page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+        page.insert_text((MARGIN, 40), "Synthetic Benchmark Report", fontsize=8, fontname="helv")
+        page.insert_text((PAGE_RECT.width / 2 - 10, PAGE_RECT.height - 36), f"Page {page_number + 1}",
+                         fontsize=8, fontname="helv")
+
+        y = MARGIN
+        bottom = PAGE_RECT.height - MARGIN
+        while y < bottom - 60:
+            if rng.random() < 0.35:
+                level = 1 if page_number == 1 and y == MARGIN else rng.choice((1, 2, 2, 3, 3, 3))
+                numbers[level - 1] += 1
+                numbers[level:] = [0] * (3 - level)
+                label = ".".join(str(max(n, 1)) for n in numbers[:level])
+                size = HEADING_SIZES[level]
+                page.insert_text((MARGIN, y + size), f"{label} {_heading(rng)}", fontsize=size, fontname="hebo")
+                y += size * 2.2
+
+            rect = pymupdf.Rect(MARGIN, y, PAGE_RECT.width - MARGIN, bottom)
+            # Negative return: the paragraph did not fit, leave the rest of the page empty
+            remaining = page.insert_textbox(rect, _paragraph(rng), fontsize=BODY_SIZE, fontname="helv",
+                                            align=pymupdf.TEXT_ALIGN_JUSTIFY)
+            if remaining < 0:
+                break
+            y = bottom - remaining + BODY_SIZE
+
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def ensure_synthetic_corpus(directory, page_counts, seed=0):
+    """Paths of synthetic PDFs for every page count, generating only the missing ones."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for page_count in page_counts:
+        path = os.path.join(directory, f"synthetic_{page_count:05d}p_s{seed}.pdf")
+        if not os.path.exists(path):
+            generate_pdf(path + ".tmp", page_count, seed)
+            os.replace(path + ".tmp", path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("output_dir")
+    arg_parser.add_argument("page_counts", type=int, nargs="+")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    for path in ensure_synthetic_corpus(args.output_dir, args.page_counts, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Bump when a change to extraction or features changes the outlines
+PIPELINE_VERSION = "2"
+# Files whose hash is remembered; long-running processes see a stream of paths
+HASH_MEMO_ENTRIES = 256
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileHashMemo:
+    """
+    file_sha256 of the `max_entries` most recently hashed files, by
+    (path, mtime, size), so a file read by several steps is hashed once.
+    """
+
+    def __init__(self, max_entries=HASH_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memo_key(self, path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def _store(self, memo_key, key):
+        with self._lock:
+            self._entries[memo_key] = key
+            self._entries.move_to_end(memo_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def sha256(self, path):
+        memo_key = self._memo_key(path)
+        with self._lock:
+            key = self._entries.get(memo_key)
+            if key is not None:
+                self._entries.move_to_end(memo_key)
+                return key
+        key = file_sha256(path)
+        self._store(memo_key, key)
+        return key
+
+    def remember(self, path, sha256):
+        """Records the hash of a file whose bytes the caller already hashed."""
+        self._store(self._memo_key(path), sha256)
+
+    def forget(self, path):
+        """Drops the entries of a path that will not be read again, e.g. a temp file."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for memo_key in [memo_key for memo_key in self._entries if memo_key[0] == path]:
+                del self._entries[memo_key]
+
+
+def model_fingerprint(model_path, label_encoder_path, feature_list):
+    """Fingerprint of everything besides the PDF that decides the outline."""
+    digest = hashlib.sha256()
+    digest.update(PIPELINE_VERSION.encode())
+    digest.update(file_sha256(model_path).encode())
+    digest.update(file_sha256(label_encoder_path).encode())
+    digest.update(json.dumps(list(feature_list)).encode())
+    return digest.hexdigest()[:16]
+
+
+def feature_set_version(extraction_profile, line_assembly, prune_repeated_lines):
+    """Fingerprint of everything besides the PDF that decides the featured lines."""
+    settings = [PIPELINE_VERSION, extraction_profile, line_assembly, prune_repeated_lines]
+    return hashlib.sha256(json.dumps(settings).encode()).hexdigest()[:16]
+
+
+class OutlineOutputMixin:
+    """
+    Outline output shared by PDFParser and FastStartParser: the outline
+    cache (`self.cache`, an OutlineCache or None) under the parser's
+    feature set, the JSON files in the output directory and the pruned row
+    counts. Expects `extraction_profile`, `line_assembly`,
+    `prune_repeated_lines` and the `pruned_rows` dict.
+    """
+
+    @property
+    def feature_set(self):
+        """Version of the settings that decide the featured lines; part of the outline cache key."""
+        return feature_set_version(self.extraction_profile, self.line_assembly, self.prune_repeated_lines)
+
+    def _cached_outline(self, pdf_path):
+        if self.cache is None:
+            return None
+        try:
+            cached_output = self.cache.get(pdf_path, self.feature_set)
+        except OSError as e:
+            print(f"Warning: Could not read cache for {pdf_path}: {e}")
+            return None
+        if cached_output is not None:
+            print(f"Cache hit for {os.path.basename(pdf_path)}")
+        return cached_output
+
+    def _store_cached(self, pdf_path, final_output):
+        if self.cache is None:
+            return
+        try:
+            self.cache.put(pdf_path, final_output, self.feature_set)
+        except OSError as e:
+            print(f"Warning: Could not write cache for {pdf_path}: {e}")
+
+    def _save_output(self, pdf_path, output_dir, final_output):
+        os.makedirs(output_dir, exist_ok=True)
+        output_filename = os.path.basename(pdf_path).replace('.pdf', '.json')
+        output_filepath = os.path.join(output_dir, output_filename)
+
+        # Readers of output_dir never see a half-written file
+        tmp_filepath = os.path.join(output_dir, f".{output_filename}.{os.getpid()}.tmp")
+        with open(tmp_filepath, 'w', encoding='utf-8') as f:
+            json.dump(final_output, f, indent=4)
+        os.replace(tmp_filepath, output_filepath)
+
+        print(f"Prediction complete. Output saved to {output_filepath}")
+        return output_filepath
+
+    def _record_pruned(self, pdf_path, pruned, total_rows):
+        self.pruned_rows[pdf_path] = (pruned, total_rows)
+        if pruned:
+            print(f"Pruned {pruned} of {total_rows} rows as repeated headers/footers")
+
+
+class OutlineCache:
+    """
+    On-disk cache of outline JSON keyed by PDF content hash and the parser's
+    feature set (feature_set_version: extraction profile, line assembly and
+    repeated-line pruning), so parsers with other settings never share an
+    outline.
+
+    Entries live in `<cache_dir>/<fingerprint>/<sha256>.<feature set>.json`. Entries written
+    under another fingerprint (different model, label encoder or feature list)
+    are removed when the cache is opened. Once the entries add up to more than
+    `max_bytes`, the least recently used ones are evicted.
+    """
+
+    def __init__(self, cache_dir, fingerprint, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.entry_dir = os.path.join(cache_dir, fingerprint)
+        self.hits = 0
+        self.misses = 0
+        self._hash_memo = FileHashMemo()
+
+        os.makedirs(self.entry_dir, exist_ok=True)
+        self._drop_stale_fingerprints()
+
+        # name -> [size, last used]
+        self._entries = {}
+        for name in os.listdir(self.entry_dir):
+            if not name.endswith('.json'):
+                continue
+            stat = os.stat(os.path.join(self.entry_dir, name))
+            self._entries[name] = [stat.st_size, stat.st_mtime]
+        self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    def _drop_stale_fingerprints(self):
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name != self.fingerprint and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def key_for(self, pdf_path):
+        return self._hash_memo.sha256(pdf_path)
+
+    def remember_key(self, pdf_path, sha256):
+        self._hash_memo.remember(pdf_path, sha256)
+
+    def forget_key(self, pdf_path):
+        self._hash_memo.forget(pdf_path)
+
+    def _name(self, pdf_path, feature_set):
+        return f"{self.key_for(pdf_path)}.{feature_set}.json"
+
+    def get(self, pdf_path, feature_set):
+        name = self._name(pdf_path, feature_set)
+        path = os.path.join(self.entry_dir, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                outline = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        if name in self._entries:
+            self._entries[name][1] = os.stat(path).st_mtime
+        self.hits += 1
+        return outline
+
+    def put(self, pdf_path, outline, feature_set):
+        name = self._name(pdf_path, feature_set)
+        path = os.path.join(self.entry_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(outline, f)
+        os.replace(tmp_path, path)
+
+        stat = os.stat(path)
+        if name in self._entries:
+            self._total_bytes -= self._entries[name][0]
+        self._entries[name] = [stat.st_size, stat.st_mtime]
+        self._total_bytes += stat.st_size
+        self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.entry_dir, name))
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+            del self._entries[name]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
@@ -0,0 +1,116 @@
+"""
+Column-per-file tables on disk.
+
+A table is a directory with one .npy file per numeric or boolean column and,
+per string column, a UTF-8 blob plus an offsets array (the same packing as
+spans.SpanTable). `meta.json` lists the columns and carries free-form
+metadata. Numeric columns can be memory-mapped, and a reader that needs a
+few columns only touches their files.
+"""
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from spans import _pack_strings, _unpack_strings
+
+META_FILE = "meta.json"
+
+
+def write_table(directory, columns, metadata=None):
+    """
+    Writes `columns` (a DataFrame or a dict of equally long arrays/lists) to
+    `directory`, replacing any table already there. Object columns must hold
+    str; other columns are saved with their NumPy dtype.
+    """
+    if isinstance(columns, pd.DataFrame):
+        columns = {name: columns[name].to_numpy() for name in columns.columns}
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    schema = []
+    for name, values in columns.items():
+        array = np.asarray(values)
+        if array.dtype.kind in "OUS":
+            strings = array.tolist()
+            if not all(isinstance(value, str) for value in strings):
+                raise TypeError(f"Column {name!r} mixes strings with other objects")
+            blob, offsets = _pack_strings(strings)
+            np.save(os.path.join(tmp_dir, f"{name}.utf8.npy"), np.frombuffer(blob, dtype=np.uint8),
+                    allow_pickle=False)
+            np.save(os.path.join(tmp_dir, f"{name}.offsets.npy"), offsets, allow_pickle=False)
+            schema.append({"name": name, "kind": "string"})
+        else:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array, allow_pickle=False)
+            schema.append({"name": name, "kind": "array", "dtype": array.dtype.str})
+
+    meta = {"rows": lengths.pop() if lengths else 0, "columns": schema, "metadata": metadata or {}}
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    # A directory cannot be replaced in one rename, so the old one is moved aside first
+    old_dir = f"{directory}.{os.getpid()}.old"
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _load_array(path, dtype, mmap):
+    """
+    A 1-D .npy file written by write_table. The dtype comes from meta.json,
+    so without `mmap` the header is skipped instead of parsed, which is most
+    of np.load's time on the small files of a single document.
+    """
+    if mmap:
+        return np.load(path, mmap_mode='r', allow_pickle=False)
+    with open(path, 'rb') as f:
+        data = bytearray(os.fstat(f.fileno()).st_size)
+        f.readinto(data)
+    # Format 1.0 stores the header length in 2 bytes, 2.0 and 3.0 in 4
+    if data[6] == 1:
+        offset = 10 + int.from_bytes(data[8:10], 'little')
+    else:
+        offset = 12 + int.from_bytes(data[8:12], 'little')
+    return np.frombuffer(data, dtype=dtype, offset=offset)
+
+
+def read_meta(directory):
+    with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_table(directory, columns=None, mmap=True):
+    """
+    Returns ({name: array}, metadata) for the requested columns (all by
+    default). Numeric columns are memory-mapped read-only unless `mmap` is
+    False; string columns come back as object arrays of str.
+    """
+    meta = read_meta(directory)
+    schema = {column["name"]: column for column in meta["columns"]}
+    names = list(schema) if columns is None else list(columns)
+    missing = [name for name in names if name not in schema]
+    if missing:
+        raise KeyError(f"Table {directory} has no column(s) {missing}")
+
+    arrays = {}
+    for name in names:
+        if schema[name]["kind"] == "string":
+            blob = _load_array(os.path.join(directory, f"{name}.utf8.npy"), np.uint8, mmap=False)
+            offsets = _load_array(os.path.join(directory, f"{name}.offsets.npy"), np.int64, mmap=False)
+            strings = np.empty(len(offsets) - 1, dtype=object)
+            strings[:] = _unpack_strings(blob.tobytes(), offsets)
+            arrays[name] = strings
+        else:
+            arrays[name] = _load_array(os.path.join(directory, f"{name}.npy"), np.dtype(schema[name]["dtype"]), mmap)
+    return arrays, meta["metadata"]
+
+
+def read_frame(directory, columns=None, mmap=False):
+    """read_table as a DataFrame, plus the metadata."""
+    arrays, metadata = read_table(directory, columns, mmap=mmap)
+    return pd.DataFrame(arrays), metadata
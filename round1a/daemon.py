@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Long-running alternative to main.py: loads the model once, keeps the
+extraction pool warm and writes an outline for every PDF that lands in the
+input directory.
+
+New files are picked up through inotify (close after write, or moved in);
+where inotify is not available the directory is polled and a file is taken
+once its size and mtime stop changing. PDFs already present at start-up are
+processed if their output is missing or older. Paths wait in a bounded queue,
+so a burst of uploads blocks the watcher instead of growing memory. On
+SIGTERM/SIGINT the daemon stops watching, finishes what is queued and exits;
+a second signal exits after the current batch.
+
+    python daemon.py --input /app/input --output /app/output
+"""
+import os
+import sys
+import time
+import queue
+import ctypes
+import ctypes.util
+import select
+import signal
+import struct
+import argparse
+import threading
+import batch
+from main import build_parser, open_quarantine, STREAMING_PAGE_THRESHOLD
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def is_candidate(name):
+    return name.lower().endswith('.pdf') and not name.startswith('.')
+
+
+def scan_directory(directory):
+    """{path: (size, mtime_ns)} of the PDFs in `directory`."""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if is_candidate(entry.name) and entry.is_file():
+                stat = entry.stat()
+                files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+class InotifyWatcher:
+    """Reports PDFs when their writer closes them or they are moved into the directory."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.directory = directory
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def poll(self, timeout):
+        """
+        Paths that became ready within `timeout` seconds, or None if the
+        kernel queue overflowed and the directory has to be rescanned.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        overflow = False
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif is_candidate(name):
+                paths.append(os.path.join(self.directory, name))
+        return None if overflow else paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Reports a PDF once its size and mtime are the same in two consecutive scans."""
+
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        # Files present at start-up are the start-up scan's job
+        self._previous = scan_directory(directory)
+        self._reported = dict(self._previous)
+
+    def poll(self, timeout):
+        time.sleep(max(timeout, self.interval))
+        current = scan_directory(self.directory)
+        paths = []
+        for path, signature in current.items():
+            if self._reported.get(path) != signature and self._previous.get(path) == signature:
+                paths.append(path)
+                self._reported[path] = signature
+        self._reported = {path: s for path, s in self._reported.items() if path in current}
+        self._previous = current
+        return paths
+
+    def close(self):
+        pass
+
+
+class OutlineDaemon:
+    def __init__(self, pdf_parser, input_dir, output_dir, queue_size=64, batch_size=8, poll_interval=1.0,
+                 force_polling=False, stream_above_pages=STREAMING_PAGE_THRESHOLD):
+        self.parser = pdf_parser
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.stream_above_pages = stream_above_pages
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.aborting = threading.Event()
+        # path -> (size, mtime_ns) while queued or in progress, so one upload is
+        # queued once; the entry goes once the file has been processed
+        self._queued = {}
+        self.processed = 0
+        self.failed = 0
+
+    def _output_path(self, pdf_path):
+        return os.path.join(self.output_dir, os.path.basename(pdf_path).replace('.pdf', '.json'))
+
+    def _needs_processing(self, pdf_path, signature):
+        try:
+            return os.stat(self._output_path(pdf_path)).st_mtime_ns < signature[1]
+        except FileNotFoundError:
+            return True
+
+    def _enqueue(self, pdf_path, signature=None):
+        if signature is None:
+            try:
+                stat = os.stat(pdf_path)
+            except FileNotFoundError:
+                return
+            signature = (stat.st_size, stat.st_mtime_ns)
+        if self._queued.get(pdf_path) == signature or not self._needs_processing(pdf_path, signature):
+            return
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(pdf_path, timeout=0.5)
+            except queue.Full:
+                continue
+            self._queued[pdf_path] = signature
+            return
+
+    def _enqueue_stale(self):
+        for pdf_path, signature in sorted(scan_directory(self.input_dir).items()):
+            if self._needs_processing(pdf_path, signature):
+                self._enqueue(pdf_path, signature)
+
+    def _make_watcher(self):
+        if not self.force_polling:
+            try:
+                return InotifyWatcher(self.input_dir)
+            except (OSError, AttributeError) as e:
+                print(f"Warning: inotify unavailable ({e}), polling {self.input_dir} every {self.poll_interval}s")
+        return PollingWatcher(self.input_dir, self.poll_interval)
+
+    def _watch(self, watcher):
+        try:
+            self._enqueue_stale()
+            while not self.stopping.is_set():
+                paths = watcher.poll(self.poll_interval)
+                if paths is None:
+                    print("Warning: inotify queue overflowed, rescanning input directory")
+                    self._enqueue_stale()
+                    continue
+                for pdf_path in paths:
+                    self._enqueue(pdf_path)
+        finally:
+            watcher.close()
+
+    def _handle_signal(self, signum, frame):
+        if self.stopping.is_set():
+            print("Second signal received, exiting after the current batch")
+            self.aborting.set()
+        else:
+            print(f"Received signal {signum}, draining {self.queue.qsize()} queued file(s)")
+            self.stopping.set()
+
+    def _next_batch(self):
+        try:
+            pdf_paths = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(pdf_paths) < self.batch_size:
+            try:
+                pdf_paths.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        # Keep the first occurrence if a file was queued again meanwhile
+        return list(dict.fromkeys(pdf_paths))
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        # Fork the pool before starting the watcher thread
+        with batch.BatchExtractor(profile=self.parser.extraction_profile, page_cache=self.parser.page_cache,
+                                  quarantine=open_quarantine()) as extractor:
+            watcher_thread = threading.Thread(target=self._watch, args=(self._make_watcher(),), daemon=True)
+            watcher_thread.start()
+            print(f"Watching {self.input_dir} for PDF files")
+
+            while not self.aborting.is_set():
+                queued_paths = self._next_batch()
+                if not queued_paths:
+                    if self.stopping.is_set() and not watcher_thread.is_alive() and self.queue.empty():
+                        break
+                    continue
+                pdf_paths = [p for p in queued_paths if os.path.exists(p)]
+                try:
+                    results = self.parser.parse_batch(pdf_paths, self.output_dir, extractor=extractor,
+                                                      stream_above_pages=self.stream_above_pages)
+                except Exception as e:
+                    print(f"Error during batch processing: {str(e)}")
+                    results = {}
+                for pdf_path in queued_paths:
+                    self._queued.pop(pdf_path, None)
+                for pdf_path in pdf_paths:
+                    if results.get(pdf_path):
+                        self.processed += 1
+                    else:
+                        self.failed += 1
+                        reason = self.parser.failures.get(pdf_path, "no outline produced")
+                        print(f"Failed to process {os.path.basename(pdf_path)}: {reason}")
+                    # Reported; the parser would otherwise keep every path the daemon ever saw
+                    self.parser.outline_sources.pop(pdf_path, None)
+                    self.parser.failures.pop(pdf_path, None)
+                    self.parser.pruned_rows.pop(pdf_path, None)
+
+            watcher_thread.join(timeout=5)
+
+        print(f"Stopped: {self.processed} processed, {self.failed} failed, {self.queue.qsize()} left in queue")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--input", default="/app/input")
+    arg_parser.add_argument("--output", default="/app/output")
+    arg_parser.add_argument("--queue-size", type=int, default=64, help="Files waiting before the watcher blocks")
+    arg_parser.add_argument("--batch-size", type=int, default=8, help="Queued files handed to one parse_batch call")
+    arg_parser.add_argument("--poll-interval", type=float, default=1.0)
+    arg_parser.add_argument("--polling", action="store_true", help="Poll even if inotify is available")
+    args = arg_parser.parse_args()
+
+    pdf_parser = build_parser()
+    if pdf_parser is None:
+        return 1
+
+    os.makedirs(args.input, exist_ok=True)
+    OutlineDaemon(pdf_parser, args.input, args.output, queue_size=args.queue_size, batch_size=args.batch_size,
+                  poll_interval=args.poll_interval, force_polling=args.polling).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
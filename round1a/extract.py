@@ -1,11 +1,133 @@
-import pymupdf
+import os
 import time
+import shutil
+import hashlib
+import contextlib
+import pymupdf
 from multiprocessing import Pool, cpu_count
+from multiprocessing.shared_memory import SharedMemory
+from spans import SpanTable, SpanTableBuilder
+import pagecache
+
+# Flags for page.get_text("dict") per extraction profile. "full" is PyMuPDF's
+# default and also decodes image blocks with their binary payload; "text" drops
+# images (and never collects vector graphics), which the parser never reads.
+EXTRACTION_PROFILES = {
+    "full": pymupdf.TEXTFLAGS_DICT,
+    "text": pymupdf.TEXTFLAGS_DICT & ~pymupdf.TEXT_PRESERVE_IMAGES & ~pymupdf.TEXT_COLLECT_VECTORS,
+}
+DEFAULT_PROFILE = "text"
+
+# Bookmark outlines that fail these checks go through the model instead
+TOC_MIN_ENTRIES = 3
+TOC_MAX_DEPTH = 4
+TOC_MIN_PAGE_COVERAGE = 0.5
+
+# Larger PDFs are opened from the file by every worker instead, so they do not
+# exhaust /dev/shm (64MB by default in Docker)
+SHARED_INPUT_MAX_BYTES = 48 * 1024 * 1024
+SHM_DIR = "/dev/shm"
+
+
+def page_text_blocks(page, profile=DEFAULT_PROFILE):
+    return page.get_text("dict", flags=EXTRACTION_PROFILES[profile])['blocks']
+
+
+class SharedInput:
+    """
+    The bytes of a PDF, read from the file once into a shared memory block.
+
+    `source` is what workers pass to open_document: a small descriptor of the
+    block, which they open with pymupdf.open(stream=...) on a view of the
+    shared memory, without copying it or touching the file again. Files that
+    are empty, larger than `max_bytes` or do not fit into shared memory keep
+    their path as `source` and are opened from the file as before.
+    """
+
+    def __init__(self, filename, max_bytes=SHARED_INPUT_MAX_BYTES):
+        self.filename = filename
+        self.source = filename
+        self.size = os.path.getsize(filename)
+        self.shm = None
+        if self.size == 0 or self.size > max_bytes:
+            return
+        # tmpfs allocates on write, so a full /dev/shm would kill us with SIGBUS
+        if os.path.isdir(SHM_DIR) and shutil.disk_usage(SHM_DIR).free < 2 * self.size:
+            return
+        try:
+            shm = SharedMemory(create=True, size=self.size)
+        except OSError as e:
+            print(f"Warning: Could not share {filename} with the workers, they will read the file: {e}")
+            return
+        try:
+            with open(filename, 'rb', buffering=0) as f:
+                offset = 0
+                while offset < self.size:
+                    read = f.readinto(shm.buf[offset:self.size])
+                    if not read:
+                        raise OSError(f"{filename} shrank while it was being read")
+                    offset += read
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        self.shm = shm
+        self.source = {"name": shm.name, "size": self.size, "filename": filename}
+
+    def sha256(self):
+        """Content hash from the shared copy; None if the file was not shared."""
+        if self.shm is None:
+            return None
+        view = self.shm.buf[:self.size]
+        try:
+            return hashlib.sha256(view).hexdigest()
+        finally:
+            view.release()
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+            self.source = self.filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@contextlib.contextmanager
+def open_document(source):
+    """Opens a PDF from a path or from a SharedInput.source descriptor."""
+    if isinstance(source, str):
+        doc = pymupdf.open(source)
+        try:
+            yield doc
+        finally:
+            doc.close()
+        return
+
+    shm = SharedMemory(name=source["name"])
+    view = shm.buf[:source["size"]]
+    try:
+        doc = pymupdf.open(stream=view, filetype="pdf")
+        try:
+            yield doc
+        finally:
+            doc.close()
+    finally:
+        view.release()
+        shm.close()
 
 
 class TextExtractor:
-    def __init__(self, filename) -> None:
+    def __init__(self, filename, profile=DEFAULT_PROFILE) -> None:
+        if profile not in EXTRACTION_PROFILES:
+            raise ValueError(f"Unknown extraction profile: {profile}. Expected one of {list(EXTRACTION_PROFILES)}.")
         self.filename = filename
+        self.profile = profile
         self.document = pymupdf.open(filename)
         if not self.document:
             raise ValueError(f"Failed to open document: {filename}")
@@ -40,12 +162,20 @@ class TextExtractor:
             "height": page.rect.height,
         }
 
+    def get_trusted_toc(self):
+        """The embedded bookmark outline as [level, title, page] entries, or None if it can't be trusted."""
+        try:
+            toc = self.document.get_toc(simple=True)
+        except Exception:
+            return None
+        return toc if is_trusted_toc(toc, self.page_count) else None
+
     def extract_text_from_page(self, page_number):
         if page_number < 0 or page_number >= self.page_count:
             raise ValueError(f"Page number {page_number} is out of range. Document has {self.page_count} pages.")
 
         page = self.document.load_page(page_number)
-        texts = page.get_text("dict")['blocks']
+        texts = page_text_blocks(page, self.profile)
         for text in texts:
             if 'lines' in text:
                 for line in text['lines']:
@@ -60,67 +190,211 @@ class TextExtractor:
                             "y_position": span['bbox'][1]
                         }
 
+    def extract_span_table_from_page(self, page_number):
+        if page_number < 0 or page_number >= self.page_count:
+            raise ValueError(f"Page number {page_number} is out of range. Document has {self.page_count} pages.")
+
+        builder = SpanTableBuilder()
+        page = self.document.load_page(page_number)
+        builder.add_page(page_number, page_text_blocks(page, self.profile))
+        return builder.build()
+
     def extract_text_from_all_pages(self):
         all_texts = []
         for page_number in range(self.page_count):
             all_texts.extend(list(self.extract_text_from_page(page_number)))
         return all_texts
 
-    def extract_text_from_all_pages_multiprocessing(self):
+    def extract_text_from_all_pages_multiprocessing(self, pool=None):
         cpu = cpu_count()
-        vectors = [(i, cpu, self.filename, self.page_count) for i in range(cpu)]
-        
-        with Pool() as pool:
-            results = pool.map(extract_text_segment, vectors)
+        with SharedInput(self.filename) as shared:
+            vectors = [(i, cpu, shared.source, self.page_count, self.profile) for i in range(cpu)]
+
+            if pool is None:
+                with Pool() as pool:
+                    results = pool.map(extract_text_segment, vectors)
+            else:
+                results = pool.map(extract_text_segment, vectors)
         
         all_texts = []
         for result in results:
             all_texts.extend(result)
         return all_texts
 
+    def extract_span_table_multiprocessing(self, pool=None):
+        """
+        Same page split as extract_text_from_all_pages_multiprocessing, but
+        every worker returns a SpanTable through shared memory instead of
+        pickling a list of span dicts. The workers read the PDF from one
+        shared copy (SharedInput) rather than each opening the file.
+        """
+        cpu = cpu_count()
+        with SharedInput(self.filename) as shared:
+            vectors = [(i, cpu, shared.source, self.page_count, self.profile) for i in range(cpu)]
+
+            if pool is None:
+                with Pool() as pool:
+                    descriptors = pool.map(extract_span_segment, vectors)
+            else:
+                descriptors = pool.map(extract_span_segment, vectors)
+
+        return SpanTable.concat([SpanTable.from_shared_memory(d) for d in descriptors])
+
+    def extract_span_table_cached(self, page_cache, pool=None, pages_per_task=16):
+        """
+        Like extract_span_table_multiprocessing, but pages found in
+        `page_cache` (a pagecache.PageSpanCache) are loaded instead of
+        extracted, and the pages that had to be extracted are added to it.
+        A document that cannot be fingerprinted is extracted without the
+        cache.
+        """
+        try:
+            fingerprints = pagecache.document_fingerprints(self.document, self.profile)
+        except Exception as e:
+            print(f"Warning: Page cache skipped for {os.path.basename(self.filename)}: {e}")
+            return self.extract_span_table_multiprocessing(pool)
+        tables = {}
+        missing = []
+        for page_number, fingerprint in enumerate(fingerprints):
+            spans = page_cache.get(fingerprint, page_number)
+            if spans is None:
+                missing.append(page_number)
+            else:
+                tables[page_number] = spans
+
+        ranges = pagecache.missing_ranges(missing, pages_per_task)
+        if len(missing) <= pages_per_task:
+            # Not worth starting a pool for a handful of changed pages
+            extracted = [extract_span_range(self.filename, start, stop, self.profile) for start, stop in ranges]
+        else:
+            with SharedInput(self.filename) as shared:
+                windows = [(shared.source, start, stop, self.profile) for start, stop in ranges]
+                if pool is None:
+                    with Pool() as pool:
+                        descriptors = pool.map(extract_span_window, windows)
+                else:
+                    descriptors = pool.map(extract_span_window, windows)
+            extracted = [SpanTable.from_shared_memory(d) for d in descriptors]
+
+        for (start, stop), spans in zip(ranges, extracted):
+            page_cache.store_pages(fingerprints, spans, range(start, stop))
+            tables[start] = spans
+        return SpanTable.concat([tables[page_number] for page_number in sorted(tables)])
+
 
 def extract_text_segment(vector):
     idx = vector[0]
     cpu = vector[1]
     filename = vector[2]
     total_pages = vector[3]
-    
-    doc = pymupdf.open(filename)
+    profile = vector[4] if len(vector) > 4 else DEFAULT_PROFILE
     
     seg_size = int(total_pages / cpu + 1)
     seg_from = idx * seg_size
     seg_to = min(seg_from + seg_size, total_pages)
     
+    return extract_page_range(filename, seg_from, seg_to, profile)
+
+
+def extract_page_range(source, seg_from, seg_to, profile=DEFAULT_PROFILE):
     segment_texts = []
     
-    for page_number in range(seg_from, seg_to):
-        page = doc.load_page(page_number)
-        texts = page.get_text("dict")['blocks']
-        for text in texts:
-            if 'lines' in text:
-                for line in text['lines']:
-                    for span in line['spans']:
-                        segment_texts.append({
-                            "text": span['text'],
-                            "font_size": span['size'],
-                            "font_name": span['font'],
-                            "flags": span['flags'],
-                            "page": page_number + 1,
-                            "bbox": span['bbox'],
-                            "y_position": span['bbox'][1]
-                        })
+    with open_document(source) as doc:
+        for page_number in range(seg_from, seg_to):
+            page = doc.load_page(page_number)
+            texts = page_text_blocks(page, profile)
+            for text in texts:
+                if 'lines' in text:
+                    for line in text['lines']:
+                        for span in line['spans']:
+                            segment_texts.append({
+                                "text": span['text'],
+                                "font_size": span['size'],
+                                "font_name": span['font'],
+                                "flags": span['flags'],
+                                "page": page_number + 1,
+                                "bbox": span['bbox'],
+                                "y_position": span['bbox'][1]
+                            })
     
     return segment_texts
 
+def extract_span_segment(vector):
+    idx = vector[0]
+    cpu = vector[1]
+    filename = vector[2]
+    total_pages = vector[3]
+    profile = vector[4] if len(vector) > 4 else DEFAULT_PROFILE
+
+    seg_size = int(total_pages / cpu + 1)
+    seg_from = idx * seg_size
+    seg_to = min(seg_from + seg_size, total_pages)
+
+    return extract_span_range(filename, seg_from, seg_to, profile).to_shared_memory()
+
+
+def extract_span_range(source, seg_from, seg_to, profile=DEFAULT_PROFILE):
+    """Spans of pages [seg_from, seg_to) of a PDF path or SharedInput.source."""
+    builder = SpanTableBuilder()
+    with open_document(source) as doc:
+        for page_number in range(seg_from, seg_to):
+            page = doc.load_page(page_number)
+            builder.add_page(page_number, page_text_blocks(page, profile))
+    return builder.build()
+
+
+def extract_span_window(task):
+    filename, seg_from, seg_to, profile = task
+    return extract_span_range(filename, seg_from, seg_to, profile).to_shared_memory()
+
+
+def is_trusted_toc(toc, page_count, min_entries=TOC_MIN_ENTRIES, max_depth=TOC_MAX_DEPTH,
+                   min_page_coverage=TOC_MIN_PAGE_COVERAGE):
+    """
+    A bookmark outline is trusted when it has enough entries, starts at level
+    1, never skips a level going down and stays shallow, has a title on every
+    entry, points at pages in the document in reading order and spans at least
+    `min_page_coverage` of the pages.
+    """
+    if page_count == 0 or len(toc) < min_entries:
+        return False
+
+    previous_level = 0
+    previous_page = 1
+    for level, title, page in toc:
+        if level < 1 or level > previous_level + 1 or level > max_depth:
+            return False
+        if not title.strip():
+            return False
+        if page < previous_page or page > page_count:
+            return False
+        previous_level = level
+        previous_page = page
+
+    covered_pages = toc[-1][2] - toc[0][2] + 1
+    return covered_pages / page_count >= min_page_coverage
+
+
+def get_page_count(filename):
+    """Page count without extracting anything; returns 0 if the file can't be opened."""
+    try:
+        with pymupdf.open(filename) as doc:
+            return len(doc)
+    except Exception:
+        return 0
+
 
 if __name__ == "__main__":
-    extractor = TextExtractor("../hackathon-task/sample-1a/Datasets/Pdfs/program.pdf")
+    # Quick look at one document; benchmarks/bench_pipeline.py times every stage properly
+    import sys
+    filename = sys.argv[1] if len(sys.argv) > 1 else "../hackathon-task/sample-1a/Datasets/Pdfs/E0CCG5S312.pdf"
+    extractor = TextExtractor(filename)
     
     t0 = time.perf_counter()
-    all_texts = extractor.extract_text_from_all_pages_multiprocessing()
+    spans = extractor.extract_span_table_multiprocessing()
     t1 = time.perf_counter()
     
-    print(all_texts)
+    print(f"{len(spans)} spans from {extractor.page_count} pages")
     x = extractor.get_page_dimensions(0)
     print(x)
     print(f"Multiprocessing time: {t1 - t0:.2f} seconds")
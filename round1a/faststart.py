@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Fast-start inference for runs that parse one or a few PDFs per process, such
+as a per-file serverless function.
+
+main.py imports pandas, joblib and the extraction pool machinery before it
+looks at the first page, which is most of the latency of a one-page PDF.
+FastStartParser runs the same pipeline (bookmarks, outline cache, sorted
+line assembly, header/footer pruning, features, the flattened forest) on
+NumPy arrays instead of DataFrames and writes the same outlines. The model
+is the `forest_model/` directory exported by forest.py, memory-mapped rather
+than unpickled; there is no sklearn fallback. Short documents are extracted
+in this process, longer ones on a pool. The page cache and feature store
+are not used.
+
+    python faststart.py                      # /app/input -> /app/output
+    python faststart.py doc.pdf --output out --no-cache
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import os
+import sys
+import glob
+import argparse
+import numpy as np
+import extract
+from spans import SpanTableBuilder
+from cache import OutlineCache, OutlineOutputMixin, model_fingerprint
+from forest import load_flat_model
+from rules import (
+    FEATURES, assemble_lines, modal_font_size, engineer_features, repeated_line_mask, format_predictions,
+    format_bookmarks,
+)
+
+INPUT_DIR = "/app/input"
+OUTPUT_DIR = "/app/output"
+MODEL_PATH = 'random_forest_model.pkl'
+LABEL_ENCODER_PATH = 'label_encoder.pkl'
+FLAT_MODEL_DIR = 'forest_model'
+# Shared with main.py, so either path answers what the other has parsed
+CACHE_DIR = "/app/cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Documents up to this many pages are extracted without starting a pool
+SERIAL_EXTRACTION_PAGES = 16
+
+
+class FastStartParser(OutlineOutputMixin):
+    """
+    PDFParser's extraction-to-outline path without pandas. Every step is the
+    rules.py function PDFParser builds its DataFrames on, applied to the dict
+    of line columns that rules.assemble_lines returns.
+    """
+
+    # Lines are assembled like PDFParser's default "sorted" mode
+    line_assembly = "sorted"
+
+    def __init__(self, model, label_decoder, feature_list=FEATURES, cache=None,
+                 extraction_profile=extract.DEFAULT_PROFILE, use_bookmarks=True, prune_repeated_lines=True):
+        self.model = model
+        self.label_decoder = label_decoder
+        self.features = feature_list
+        self.cache = cache
+        self.extraction_profile = extraction_profile
+        self.use_bookmarks = use_bookmarks
+        self.prune_repeated_lines = prune_repeated_lines
+        # pdf path -> "bookmarks", "cache" or "model", whichever produced its outline
+        self.outline_sources = {}
+        # pdf path -> why it has no outline
+        self.failures = {}
+        # pdf path -> (rows pruned as repeated headers/footers, rows)
+        self.pruned_rows = {}
+
+    def _extract(self, text_extractor):
+        if text_extractor.page_count > SERIAL_EXTRACTION_PAGES:
+            return text_extractor.extract_span_table_multiprocessing()
+        builder = SpanTableBuilder()
+        for page_number in range(text_extractor.page_count):
+            page = text_extractor.document.load_page(page_number)
+            builder.add_page(page_number, extract.page_text_blocks(page, self.extraction_profile))
+        return builder.build()
+
+    def _feature_matrix(self, lines, page_height, page_width):
+        columns = dict(lines)
+        columns.update(engineer_features(lines, modal_font_size(lines["avg_font_size"]), page_height, page_width))
+        # The forest compares float32 inputs, as sklearn does
+        X = np.empty((len(lines["text"]), len(self.features)), dtype=np.float32)
+        for i, name in enumerate(self.features):
+            X[:, i] = columns[name]
+        return X
+
+    def _outline(self, pdf_path):
+        text_extractor = extract.TextExtractor(pdf_path, self.extraction_profile)
+        try:
+            if self.use_bookmarks:
+                toc = text_extractor.get_trusted_toc()
+                if toc is not None:
+                    print(f"Using embedded bookmarks for {os.path.basename(pdf_path)}")
+                    return format_bookmarks(toc, text_extractor.document.metadata.get("title")), "bookmarks"
+
+            cached_output = self._cached_outline(pdf_path)
+            if cached_output is not None:
+                return cached_output, "cache"
+
+            print(f"Processing PDF: {os.path.basename(pdf_path)}")
+            spans = self._extract(text_extractor)
+            try:
+                page_dims = text_extractor.get_page_dimensions(0)
+                page_width, page_height = page_dims["width"], page_dims["height"]
+            except Exception as e:
+                print(f"Warning: Could not get page dimensions for {pdf_path}. Using default values. Error: {e}")
+                page_width, page_height = 612, 792
+        finally:
+            text_extractor.document.close()
+
+        lines = assemble_lines(spans)
+        if lines is None:
+            return None, "no text lines"
+
+        repeated = repeated_line_mask(lines) if self.prune_repeated_lines else None
+        lines["page"] = lines["page"] - 1
+        X = self._feature_matrix(lines, page_height, page_width)
+
+        total_rows = len(X)
+        if repeated is not None and repeated.any():
+            keep = ~repeated
+            X = X[keep]
+            lines = {name: np.asarray(values, dtype=object)[keep] if isinstance(values, list) else values[keep]
+                     for name, values in lines.items()}
+        self._record_pruned(pdf_path, total_rows - len(X), total_rows)
+
+        labels = self.label_decoder.inverse_transform(self.model.predict(X)).tolist()
+        bboxes = list(zip(lines["x0"].tolist(), lines["y0"].tolist(), lines["x1"].tolist(), lines["y1"].tolist()))
+        final_output = format_predictions(list(lines["text"]), lines["page"].tolist(), bboxes, labels)
+        self._store_cached(pdf_path, final_output)
+        return final_output, "model"
+
+    def parse_and_save(self, pdf_path, output_dir="."):
+        """Writes the outline of one PDF to output_dir; returns it, or None on failure."""
+        self.failures.pop(pdf_path, None)
+        self.pruned_rows.pop(pdf_path, None)
+        if not os.path.exists(pdf_path):
+            print(f"Error: PDF file not found at {pdf_path}")
+            self.failures[pdf_path] = "file not found"
+            return None
+        try:
+            final_output, source = self._outline(pdf_path)
+            if final_output is None:
+                print(f"Could not extract any text lines from {pdf_path}.")
+                self.failures[pdf_path] = source
+                return None
+            self._save_output(pdf_path, output_dir, final_output)
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {str(e)}")
+            self.failures[pdf_path] = str(e)
+            return None
+        self.outline_sources[pdf_path] = source
+        return final_output
+
+
+def build_parser(model_dir=FLAT_MODEL_DIR, use_cache=True):
+    """Memory-maps the flattened model and opens the outline cache; returns None if the model is missing."""
+    try:
+        model, label_decoder = load_flat_model(model_dir, n_jobs=-1)
+    except FileNotFoundError as e:
+        print(f"Error loading model files: {e} (export them with `python forest.py export ...`)")
+        return None
+
+    cache = None
+    if use_cache:
+        try:
+            cache = OutlineCache(CACHE_DIR, fingerprint=model_fingerprint(MODEL_PATH, LABEL_ENCODER_PATH, FEATURES),
+                                 max_bytes=CACHE_MAX_BYTES)
+        except OSError as e:
+            print(f"Warning: Outline cache disabled: {e}")
+    return FastStartParser(model, label_decoder, FEATURES, cache=cache)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("pdfs", nargs="*", help=f"PDF files (default: every PDF in {INPUT_DIR})")
+    arg_parser.add_argument("--output", default=OUTPUT_DIR, help="Output directory")
+    arg_parser.add_argument("--model-dir", default=FLAT_MODEL_DIR)
+    arg_parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the outline cache")
+    args = arg_parser.parse_args()
+
+    pdf_files = args.pdfs or glob.glob(os.path.join(INPUT_DIR, "*.pdf"))
+    if not pdf_files:
+        print("No PDF files to process")
+        return 1
+
+    pdf_parser = build_parser(args.model_dir, use_cache=not args.no_cache)
+    if pdf_parser is None:
+        return 1
+    print(f"Model loaded after {(time.perf_counter() - STARTED) * 1000:.0f} ms")
+
+    first_output = None
+    for pdf_path in pdf_files:
+        if pdf_parser.parse_and_save(pdf_path, args.output) is None:
+            print(f"Failed to process {os.path.basename(pdf_path)}: {pdf_parser.failures.get(pdf_path)}")
+        elif first_output is None:
+            first_output = time.perf_counter() - STARTED
+            print(f"First output after {first_output * 1000:.0f} ms")
+    failed = [pdf_path for pdf_path in pdf_files if pdf_path in pdf_parser.failures]
+    print(f"Batch summary: {len(pdf_files) - len(failed)} processed, {len(failed)} failed "
+          f"in {(time.perf_counter() - STARTED) * 1000:.0f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import columnar
+from cache import FileHashMemo
+
+# Columns rebuilt on load instead of stored: bbox is (x0, y0, x1, y1) and
+# source_pdf is the name of whichever file had the content
+DERIVED_COLUMNS = ("bbox", "source_pdf")
+BBOX_COLUMNS = ["x0", "y0", "x1", "y1"]
+
+
+class FeatureStore:
+    """
+    On-disk store of the featured lines of every parsed PDF, written by
+    inference and by training data curation alike. Re-scoring with a new
+    model, threshold experiments and retraining read the features back
+    instead of parsing the PDFs again.
+
+    Every document is a columnar table (columnar.py) in
+    `<store_dir>/<feature set version>/<sha256>/`, holding every column
+    _create_features_for_new_pdf produces, not only the model's features.
+    Feature sets of other versions are kept, so datasets built with older
+    settings stay loadable. With `max_bytes` set, the least recently used
+    documents of this feature set are evicted once they add up to more.
+    """
+
+    def __init__(self, store_dir, feature_set, max_bytes=None):
+        self.store_dir = store_dir
+        self.feature_set = feature_set
+        self.max_bytes = max_bytes
+        self.entry_dir = os.path.join(store_dir, feature_set)
+        self.hits = 0
+        self.misses = 0
+        self._hash_memo = FileHashMemo()
+
+        os.makedirs(self.entry_dir, exist_ok=True)
+        # sha256 -> [size, last used]
+        self._entries = {}
+        for name in os.listdir(self.entry_dir):
+            entry = self._entry_stat(name)
+            if entry is not None:
+                self._entries[name] = entry
+        self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    @classmethod
+    def for_parser(cls, store_dir, pdf_parser, max_bytes=None):
+        return cls(store_dir, pdf_parser.feature_set, max_bytes)
+
+    def _entry_stat(self, name):
+        path = os.path.join(self.entry_dir, name)
+        try:
+            meta_mtime = os.stat(os.path.join(path, columnar.META_FILE)).st_mtime
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+        except OSError:
+            # Half-written (*.tmp) or moved aside (*.old) by a writer
+            return None
+        return [size, meta_mtime]
+
+    def key_for(self, pdf_path):
+        return self._hash_memo.sha256(pdf_path)
+
+    def remember_key(self, pdf_path, sha256):
+        self._hash_memo.remember(pdf_path, sha256)
+
+    def forget_key(self, pdf_path):
+        self._hash_memo.forget(pdf_path)
+
+    def contains(self, sha256):
+        return os.path.exists(os.path.join(self.entry_dir, sha256, columnar.META_FILE))
+
+    def keys(self):
+        """Content hashes of every stored document of this feature set."""
+        return sorted(name for name in os.listdir(self.entry_dir) if self.contains(name))
+
+    def get(self, sha256, columns=None, pdf_name=None):
+        """
+        (featured DataFrame, metadata) of a stored document, or None. With
+        `columns` only those are read; bbox and source_pdf are rebuilt when
+        requested (source_pdf from `pdf_name` or the name it was stored under).
+        """
+        path = os.path.join(self.entry_dir, sha256)
+        stored = None
+        if columns is not None:
+            stored = [c for c in columns if c not in DERIVED_COLUMNS]
+            if "bbox" in columns:
+                stored += [c for c in BBOX_COLUMNS if c not in stored]
+        try:
+            featured_df, metadata = columnar.read_frame(path, stored)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        if columns is None or "bbox" in columns:
+            featured_df["bbox"] = list(zip(*(featured_df[c].tolist() for c in BBOX_COLUMNS)))
+        if columns is None or "source_pdf" in columns:
+            featured_df["source_pdf"] = pdf_name or metadata.get("pdf")
+        # In the order _create_features_for_new_pdf made them
+        order = list(columns) if columns is not None else metadata.get("columns", list(featured_df.columns))
+        featured_df = featured_df[order]
+
+        os.utime(os.path.join(path, columnar.META_FILE))
+        self._touch(sha256)
+        self.hits += 1
+        return featured_df, metadata
+
+    def put(self, sha256, featured_df, metadata=None):
+        columns = featured_df.drop(columns=[c for c in DERIVED_COLUMNS if c in featured_df.columns])
+        metadata = dict(metadata or {}, columns=list(featured_df.columns))
+        columnar.write_table(os.path.join(self.entry_dir, sha256), columns, metadata)
+        if sha256 in self._entries:
+            self._total_bytes -= self._entries.pop(sha256)[0]
+        self._touch(sha256)
+        self._evict()
+
+    def load(self, keys=None, columns=None):
+        """
+        The stored documents `keys` (all by default) as one DataFrame with a
+        `sha256` column, in the order of `keys`. Missing documents are skipped.
+        Columns are concatenated across documents before the DataFrame is
+        built, which is what makes loading a whole dataset fast.
+        """
+        names = None if columns is None else [c for c in columns if c not in DERIVED_COLUMNS]
+        if columns is not None and "bbox" in columns:
+            names += [c for c in BBOX_COLUMNS if c not in names]
+        parts = []
+        for sha256 in self.keys() if keys is None else keys:
+            path = os.path.join(self.entry_dir, sha256)
+            try:
+                arrays, metadata = columnar.read_table(path, names, mmap=False)
+            except (OSError, ValueError, KeyError):
+                self.misses += 1
+                continue
+            self.hits += 1
+            parts.append((sha256, arrays, metadata))
+        if not parts:
+            return pd.DataFrame()
+
+        # Column order of the first document, which every document shares
+        order = list(columns) if columns is not None else parts[0][2].get("columns", list(parts[0][1]))
+        lengths = [len(next(iter(arrays.values()))) if arrays else 0 for _, arrays, _ in parts]
+        data = {name: np.concatenate([arrays[name] for _, arrays, _ in parts])
+                for name in parts[0][1]}
+        if "bbox" in order:
+            data["bbox"] = list(zip(*(data[c].tolist() for c in BBOX_COLUMNS)))
+        if "source_pdf" in order:
+            data["source_pdf"] = np.repeat(np.array([metadata.get("pdf") for _, _, metadata in parts], dtype=object),
+                                           lengths)
+        featured_df = pd.DataFrame({name: data[name] for name in order})
+        featured_df["sha256"] = np.repeat(np.array([sha256 for sha256, _, _ in parts], dtype=object), lengths)
+        return featured_df
+
+    def _touch(self, sha256):
+        entry = self._entry_stat(sha256)
+        if entry is None:
+            return
+        if sha256 not in self._entries:
+            # New, or written by another process sharing the directory
+            self._total_bytes += entry[0]
+        self._entries[sha256] = entry
+
+    def _evict(self):
+        if self.max_bytes is None or self._total_bytes <= self.max_bytes:
+            return
+        for sha256, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.entry_dir, sha256), ignore_errors=True)
+            self._total_bytes -= size
+            del self._entries[sha256]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
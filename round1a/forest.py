@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Flattened, array-backed random forest for inference without sklearn.
+
+`export` turns the pickled RandomForestClassifier and LabelEncoder into a
+directory of .npy arrays (all trees concatenated into one node table).
+FlatForest and LabelDecoder load that directory with NumPy only and plug into
+PDFParser in place of the sklearn objects. The export also holds the
+prediction tables FlatForest derives from the trees, so loading is a handful
+of memory-mapped files and no tree walking:
+
+    python forest.py export random_forest_model.pkl label_encoder.pkl forest_model
+    python forest.py verify random_forest_model.pkl label_encoder.pkl forest_model
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes", "label_classes")
+# FlatForest's prediction tables, written by export_forest so loading skips _build_scorer
+SCORER_ARRAYS = ("leaf_values", "tree_base", "split_thresholds", "split_offsets", "mask_offsets", "prefix_masks")
+
+
+class FlatForest:
+    """
+    All trees of a fitted forest in contiguous node arrays. `left`/`right`
+    hold global node indices, `feature` is -1 on leaves and `value` holds the
+    normalised class probabilities of every node.
+
+    Prediction does not walk the trees node by node. At load time every split
+    gets a bitmask of the leaves it rules out when the sample goes right, and
+    per feature the splits are sorted by threshold with running ANDs of those
+    masks. A sample then needs one binary search and one table row per
+    feature; the leaf it reaches in each tree is the lowest bit still set.
+
+    With `n_jobs` (-1 for every CPU), large inputs are split into row blocks
+    scored on that many threads; NumPy releases the GIL in the mask and
+    gather kernels, and every row is scored independently, so the
+    probabilities are the same as with one thread.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, feature_names=None, chunk_size=256,
+                 n_jobs=None, scorer=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_names = feature_names
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self._executor = None
+        self._executor_threads = 0
+        self.n_features = int(feature.max()) + 1 if len(feature) else 0
+        if feature_names is not None:
+            self.n_features = len(feature_names)
+        if scorer is not None:
+            self._load_scorer(scorer)
+        else:
+            self._build_scorer()
+
+    def _number_leaves(self):
+        """In-order leaf slot of every leaf and leaf range [lo, hi) under every node."""
+        lo = np.zeros(len(self.feature), dtype=np.int64)
+        hi = np.zeros(len(self.feature), dtype=np.int64)
+        feature = self.feature.tolist()
+        left = self.left.tolist()
+        right = self.right.tolist()
+        leaf_counts = []
+        for root in self.roots.tolist():
+            counter = 0
+            stack = [(root, False)]
+            while stack:
+                node, children_done = stack.pop()
+                if feature[node] < 0:
+                    lo[node] = counter
+                    hi[node] = counter + 1
+                    counter += 1
+                elif children_done:
+                    lo[node] = lo[left[node]]
+                    hi[node] = hi[right[node]]
+                else:
+                    stack.append((node, True))
+                    stack.append((right[node], False))
+                    stack.append((left[node], False))
+            leaf_counts.append(counter)
+        return lo, hi, leaf_counts
+
+    def _build_scorer(self):
+        n_trees = len(self.roots)
+        n_classes = self.value.shape[1]
+        lo, hi, leaf_counts = self._number_leaves()
+        self._words = max(1, (max(leaf_counts) + 63) // 64)
+        self._leaf_stride = self._words * 64
+
+        # Leaf values indexed by tree * stride + in-order slot
+        is_leaf = self.feature < 0
+        tree_of_node = np.repeat(np.arange(n_trees), np.diff(np.append(self.roots, len(self.feature))))
+        self._leaf_values = np.zeros((n_trees * self._leaf_stride, n_classes))
+        self._leaf_values[tree_of_node[is_leaf] * self._leaf_stride + lo[is_leaf]] = self.value[is_leaf]
+        self._tree_base = np.arange(n_trees) * self._leaf_stride
+
+        # Going right at a split rules out the leaves of its left subtree
+        internal = np.flatnonzero(~is_leaf)
+        all_bits = (1 << self._leaf_stride) - 1
+        masks = np.empty((len(internal), self._words), dtype=np.uint64)
+        for i, node in enumerate(internal.tolist()):
+            left_lo = int(lo[self.left[node]])
+            left_hi = int(hi[self.left[node]])
+            mask = all_bits ^ ((1 << left_hi) - (1 << left_lo))
+            for word in range(self._words):
+                masks[i, word] = (mask >> (64 * word)) & 0xFFFFFFFFFFFFFFFF
+
+        self._split_thresholds = []
+        self._mask_offsets = np.zeros(self.n_features, dtype=np.intp)
+        tables = []
+        offset = 0
+        for f in range(self.n_features):
+            nodes = np.flatnonzero(self.feature[internal] == f)
+            nodes = nodes[np.argsort(self.threshold[internal[nodes]], kind="stable")]
+            self._split_thresholds.append(self.threshold[internal[nodes]])
+            # Row p: AND of the masks of the p lowest thresholds, per tree
+            table = np.full((len(nodes) + 1, n_trees, self._words), np.uint64(0xFFFFFFFFFFFFFFFF))
+            table[np.arange(1, len(nodes) + 1), tree_of_node[internal[nodes]]] = masks[nodes]
+            tables.append(np.bitwise_and.accumulate(table, axis=0))
+            self._mask_offsets[f] = offset
+            offset += len(nodes) + 1
+        self._prefix_masks = np.concatenate(tables)
+
+    def scorer_arrays(self):
+        """The tables _build_scorer derives, as arrays export_forest can save."""
+        return {
+            "leaf_values": self._leaf_values,
+            "tree_base": self._tree_base,
+            "split_thresholds": np.concatenate(self._split_thresholds),
+            "split_offsets": np.cumsum([0] + [len(t) for t in self._split_thresholds]),
+            "mask_offsets": self._mask_offsets,
+            "prefix_masks": self._prefix_masks,
+        }
+
+    def _load_scorer(self, scorer):
+        self._words = scorer["prefix_masks"].shape[-1]
+        self._leaf_stride = self._words * 64
+        self._leaf_values = scorer["leaf_values"]
+        self._tree_base = scorer["tree_base"]
+        offsets = scorer["split_offsets"].tolist()
+        self._split_thresholds = [scorer["split_thresholds"][start:stop]
+                                  for start, stop in zip(offsets[:-1], offsets[1:])]
+        self._mask_offsets = scorer["mask_offsets"]
+        self._prefix_masks = scorer["prefix_masks"]
+
+    def _as_matrix(self, X):
+        if self.feature_names is not None and hasattr(X, "columns"):
+            X = X[self.feature_names]
+        # sklearn validates inputs as float32 before comparing with the thresholds
+        return np.asarray(X, dtype=np.float32).astype(np.float64)
+
+    def _leaf_slots(self, mask_rows):
+        masks = self._prefix_masks[mask_rows[:, 0]]
+        for f in range(1, mask_rows.shape[1]):
+            masks &= self._prefix_masks[mask_rows[:, f]]
+
+        if self._words == 1:
+            words = masks[..., 0]
+            base = 0
+        else:
+            first_word = np.argmax(masks != 0, axis=-1)
+            words = np.take_along_axis(masks, first_word[..., None], axis=-1)[..., 0]
+            base = first_word * 64
+        lowest_bit = words & (~words + np.uint64(1))
+        return base + np.bitwise_count(lowest_bit - np.uint64(1)).astype(np.intp)
+
+    def _threads(self, n_samples):
+        n_jobs = self.n_jobs or 1
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        # Below a few chunks per thread the hand-off costs more than it saves
+        return max(1, min(n_jobs, n_samples // (4 * self.chunk_size)))
+
+    def predict_proba(self, X):
+        X = self._as_matrix(X)
+        threads = self._threads(X.shape[0])
+        if threads == 1:
+            return self._predict_proba_rows(X)
+        if self._executor_threads < threads:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = ThreadPoolExecutor(max_workers=threads)
+            self._executor_threads = threads
+        # Block edges on chunk boundaries, so each block scores the same chunks as one thread would
+        chunks = -(-X.shape[0] // self.chunk_size)
+        bounds = [self.chunk_size * (chunks * i // threads) for i in range(threads)] + [X.shape[0]]
+        blocks = [X[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        return np.concatenate(list(self._executor.map(self._predict_proba_rows, blocks)))
+
+    def _predict_proba_rows(self, X):
+        n_samples = X.shape[0]
+        mask_rows = np.empty((n_samples, self.n_features), dtype=np.intp)
+        for f in range(self.n_features):
+            # Thresholds strictly below x are the splits that send the sample right
+            mask_rows[:, f] = self._mask_offsets[f] + np.searchsorted(self._split_thresholds[f], X[:, f], side="left")
+
+        proba = np.empty((n_samples, self._leaf_values.shape[1]))
+        for start in range(0, n_samples, self.chunk_size):
+            slots = self._leaf_slots(mask_rows[start:start + self.chunk_size])
+            leaf_values = self._leaf_values[(slots + self._tree_base).T]
+            # Summing over the leading tree axis adds tree by tree, like sklearn
+            proba[start:start + len(slots)] = leaf_values.sum(axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        if len(X) == 0:
+            return self.classes_[:0]
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+class LabelDecoder:
+    """The part of sklearn's LabelEncoder that inference needs."""
+
+    def __init__(self, classes):
+        # Object dtype, like the string labels sklearn returns
+        self.classes_ = classes.astype(object)
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y)]
+
+
+def export_forest(model, label_encoder, output_dir):
+    feature = []
+    threshold = []
+    left = []
+    right = []
+    value = []
+    roots = []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        roots.append(offset)
+        is_leaf = tree.children_left < 0
+        feature.append(np.where(is_leaf, -1, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        node_value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        normalizer = node_value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(node_value / normalizer)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "value": np.concatenate(value),
+        "roots": np.array(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_),
+        "label_classes": np.asarray(label_encoder.classes_).astype(str),
+    }
+
+    feature_names = getattr(model, "feature_names_in_", None)
+    forest = FlatForest(arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"], arrays["value"],
+                        arrays["roots"], arrays["classes"],
+                        list(feature_names) if feature_names is not None else None)
+    arrays.update(forest.scorer_arrays())
+
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f"{name}.npy"), array, allow_pickle=False)
+
+    meta = {
+        "n_trees": len(roots),
+        "n_nodes": offset,
+        "max_depth": int(max_depth),
+        "feature_names": list(feature_names) if feature_names is not None else None,
+    }
+    with open(os.path.join(output_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+    return meta
+
+
+def load_flat_model(model_dir, n_jobs=None, mmap=True):
+    """
+    Returns (FlatForest, LabelDecoder) for a directory written by
+    export_forest. The arrays are memory-mapped read-only unless `mmap` is
+    False, so only the pages prediction touches are read, and processes
+    loading the same directory share them in the page cache. Exports without
+    the prediction tables have them rebuilt.
+    """
+    with open(os.path.join(model_dir, "meta.json"), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+
+    def load(name):
+        return np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+
+    arrays = {name: load(name) for name in ARRAYS}
+    scorer = None
+    if all(os.path.exists(os.path.join(model_dir, f"{name}.npy")) for name in SCORER_ARRAYS):
+        scorer = {name: load(name) for name in SCORER_ARRAYS}
+    forest = FlatForest(
+        arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"], arrays["value"],
+        arrays["roots"], arrays["classes"], meta.get("feature_names"), n_jobs=n_jobs, scorer=scorer,
+    )
+    return forest, LabelDecoder(arrays["label_classes"])
+
+
+def verify(model, label_encoder, forest, decoder, X):
+    """Checks the flat forest against the sklearn model on X; returns the mismatch count."""
+    expected = label_encoder.inverse_transform(model.predict(X))
+    actual = decoder.inverse_transform(forest.predict(X))
+    return int(np.sum(expected != actual))
+
+
+def random_feature_matrix(model, n_rows, seed=0):
+    """Rows that hit both sides of the thresholds the forest actually uses."""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, model.n_features_in_))
+    for column in range(model.n_features_in_):
+        thresholds = np.concatenate([
+            e.tree_.threshold[e.tree_.feature == column] for e in model.estimators_
+        ])
+        if len(thresholds) == 0:
+            X[:, column] = rng.normal(size=n_rows)
+            continue
+        X[:, column] = rng.choice(thresholds, n_rows) + rng.normal(scale=0.5, size=n_rows)
+        # Exact threshold values test the <= comparison
+        exact = rng.random(n_rows) < 0.1
+        X[exact, column] = rng.choice(thresholds, int(exact.sum()))
+    return X
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+    for command in ("export", "verify"):
+        sub = subparsers.add_parser(command)
+        sub.add_argument("model_path")
+        sub.add_argument("label_encoder_path")
+        sub.add_argument("output_dir")
+    subparsers.choices["verify"].add_argument("--rows", type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    import joblib
+    model = joblib.load(args.model_path)
+    label_encoder = joblib.load(args.label_encoder_path)
+
+    if args.command == "export":
+        meta = export_forest(model, label_encoder, args.output_dir)
+        print(f"Exported {meta['n_trees']} trees ({meta['n_nodes']} nodes, max depth {meta['max_depth']}) to {args.output_dir}")
+        return
+
+    forest, decoder = load_flat_model(args.output_dir)
+    X = random_feature_matrix(model, args.rows)
+    if forest.feature_names is not None:
+        import pandas as pd
+        X = pd.DataFrame(X, columns=forest.feature_names)
+    mismatches = verify(model, label_encoder, forest, decoder, X)
+    print(f"{mismatches} mismatching predictions out of {args.rows}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
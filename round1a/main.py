@@ -1,24 +1,86 @@
 #!/usr/bin/env python3
 import os
 import glob
-import joblib
+import batch
 from parser import PDFParser
+from cache import OutlineCache, model_fingerprint
+from pagecache import PageSpanCache
+from featurestore import FeatureStore
+from forest import load_flat_model
+from rules import FEATURES
 
-def main():
+# Documents longer than this are parsed window by window to bound memory
+STREAMING_PAGE_THRESHOLD = 500
+
+MODEL_PATH = 'random_forest_model.pkl'
+LABEL_ENCODER_PATH = 'label_encoder.pkl'
+# Written by `python forest.py export ...` at image build time
+FLAT_MODEL_DIR = 'forest_model'
+CACHE_DIR = "/app/cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Spans of single pages, so revised documents only re-extract changed pages
+PAGE_CACHE_DIR = "/app/page_cache"
+PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Featured lines of every parsed PDF, for re-scoring and training without re-parsing
+FEATURE_STORE_DIR = "/app/feature_store"
+FEATURE_STORE_MAX_BYTES = 1024 * 1024 * 1024
+# Failure counts of PDFs that crashed, hung or ran out of memory in a worker
+QUARANTINE_PATH = os.path.join(CACHE_DIR, "quarantine.json")
+
+def build_parser():
+    """Loads the model, caches and feature store; returns None if the model files are missing."""
     try:
-        rf_model = joblib.load('random_forest_model.pkl')
-        le = joblib.load('label_encoder.pkl')
+        if os.path.isdir(FLAT_MODEL_DIR):
+            rf_model, le = load_flat_model(FLAT_MODEL_DIR, n_jobs=-1)
+        else:
+            # Only the pickled fallback needs joblib (and sklearn)
+            import joblib
+            rf_model = joblib.load(MODEL_PATH)
+            le = joblib.load(LABEL_ENCODER_PATH)
     except FileNotFoundError as e:
         print(f"Error loading model files: {e}")
-        return
+        return None
+    
+    try:
+        cache = OutlineCache(
+            CACHE_DIR,
+            fingerprint=model_fingerprint(MODEL_PATH, LABEL_ENCODER_PATH, FEATURES),
+            max_bytes=CACHE_MAX_BYTES
+        )
+    except OSError as e:
+        print(f"Warning: Outline cache disabled: {e}")
+        cache = None
+    
+    try:
+        page_cache = PageSpanCache(PAGE_CACHE_DIR, max_bytes=PAGE_CACHE_MAX_BYTES)
+    except OSError as e:
+        print(f"Warning: Page cache disabled: {e}")
+        page_cache = None
     
-    features = [
-        'page', 'avg_font_size', 'y_position', 'is_bold', 'is_all_caps',
-        'text_len', 'starts_with_numbering', 'relative_font_size',
-        'norm_y_pos', 'is_centered', 'space_before', 'space_after'
-    ]
+    pdf_parser = PDFParser(model=rf_model, label_encoder=le, feature_list=FEATURES, cache=cache,
+                           page_cache=page_cache)
+    
+    try:
+        pdf_parser.feature_store = FeatureStore.for_parser(FEATURE_STORE_DIR, pdf_parser,
+                                                           max_bytes=FEATURE_STORE_MAX_BYTES)
+    except OSError as e:
+        print(f"Warning: Feature store disabled: {e}")
     
-    pdf_parser = PDFParser(model=rf_model, label_encoder=le, feature_list=features)
+    return pdf_parser
+
+def open_quarantine():
+    try:
+        os.makedirs(os.path.dirname(QUARANTINE_PATH), exist_ok=True)
+    except OSError as e:
+        print(f"Warning: Quarantine disabled: {e}")
+        return None
+    return batch.Quarantine(QUARANTINE_PATH)
+
+def main():
+    pdf_parser = build_parser()
+    if pdf_parser is None:
+        return
+    cache = pdf_parser.cache
     
     input_dir = "/app/input"
     output_dir = "/app/output"
@@ -33,20 +95,42 @@ def main():
     
     print(f"Found {len(pdf_files)} PDF file(s) to process")
     
+    # One extraction pool is shared by every file in the batch
+    try:
+        with batch.BatchExtractor(profile=pdf_parser.extraction_profile, page_cache=pdf_parser.page_cache,
+                                  quarantine=open_quarantine()) as extractor:
+            results = pdf_parser.parse_batch(pdf_files, output_dir, extractor=extractor,
+                                             stream_above_pages=STREAMING_PAGE_THRESHOLD)
+    except Exception as e:
+        print(f"Error during batch processing: {str(e)}")
+        return
+    
     for pdf_path in pdf_files:
-        try:
-            print(f"Processing: {os.path.basename(pdf_path)}")
-            result = pdf_parser.parse_and_save(pdf_path, output_dir)
-            
-            if result:
-                output_filename = os.path.basename(pdf_path).replace('.pdf', '.json')
-                print(f"Successfully processed {os.path.basename(pdf_path)} -> {output_filename}")
-            else:
-                print(f"Failed to process {os.path.basename(pdf_path)}")
-                
-        except Exception as e:
-            print(f"Error processing {os.path.basename(pdf_path)}: {str(e)}")
-            continue
+        if results.get(pdf_path):
+            output_filename = os.path.basename(pdf_path).replace('.pdf', '.json')
+            source = pdf_parser.outline_sources.get(pdf_path, "model")
+            pruned, rows = pdf_parser.pruned_rows.get(pdf_path, (0, 0))
+            if pruned:
+                source += f", {pruned} of {rows} rows pruned as repeated headers/footers"
+            print(f"Successfully processed {os.path.basename(pdf_path)} -> {output_filename} ({source})")
+        else:
+            print(f"Failed to process {os.path.basename(pdf_path)}")
+    
+    failed = [pdf_path for pdf_path in pdf_files if not results.get(pdf_path)]
+    print(f"Batch summary: {len(pdf_files) - len(failed)} processed, {len(failed)} skipped or failed")
+    for pdf_path in failed:
+        reason = pdf_parser.failures.get(pdf_path, "no outline produced")
+        print(f"  {os.path.basename(pdf_path)}: {reason}")
+    
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Outline cache: {stats['hits']} hit(s), {stats['misses']} miss(es), {stats['entries']} entries")
+    if pdf_parser.page_cache is not None:
+        stats = pdf_parser.page_cache.stats()
+        print(f"Page cache: {stats['hits']} page hit(s), {stats['misses']} page miss(es)")
+    if pdf_parser.feature_store is not None:
+        stats = pdf_parser.feature_store.stats()
+        print(f"Feature store: {stats['hits']} hit(s), {stats['entries']} documents")
     
     print("Processing complete!")
 
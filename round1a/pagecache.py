@@ -0,0 +1,215 @@
+import os
+import re
+import shutil
+import hashlib
+import numpy as np
+from spans import SpanTable
+
+# Bump when a change to span extraction changes what a page yields
+PAGE_CACHE_VERSION = "2"
+
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+# Stream keys that change when a file is recompressed; the decoded data is hashed instead
+_ENCODING_KEYS = re.compile(rb"/(Length|Filter|DecodeParms)(\s*\d+(\s+0\s+R)?|\s*/\w+|\s*\[[^\]]*\]|\s*<<[^<>]*>>)")
+
+
+def _open_object(doc, xref):
+    """Frame of the digest walk for one object: [xref, source, is_stream, references, resolved]."""
+    source = doc.xref_object(xref, compressed=True).encode()
+    is_stream = doc.xref_is_stream(xref)
+    if is_stream:
+        source = _ENCODING_KEYS.sub(b"", source)
+    return [xref, source, is_stream, [int(m.group(1)) for m in _REFERENCE.finditer(source)], []]
+
+
+def _resolve_references(doc, source, memo):
+    """
+    `source` with each `n 0 R` replaced by the hex digest of the referenced
+    object. An object's digest hashes its dictionary, resolved the same way,
+    and for streams the decompressed data; image data is left out, get_text
+    never reads it. Xrefs are renumbered when a file is rewritten, so this
+    hashes what they point to. `memo` holds the digests already computed
+    for `doc`. The walk keeps its own stack, so reference chains of any
+    depth are fine.
+    """
+    stack = [[None, source, False, [int(m.group(1)) for m in _REFERENCE.finditer(source)], []]]
+    active = set()
+    while True:
+        xref, source, is_stream, references, resolved = stack[-1]
+        if len(resolved) < len(references):
+            child = references[len(resolved)]
+            if child in memo:
+                resolved.append(memo[child])
+            elif not 0 < child < doc.xref_length():
+                resolved.append(b"missing")
+            elif child in active:
+                # A cycle (e.g. /Parent back links); the objects on it are hashed once
+                resolved.append(b"cycle")
+            else:
+                active.add(child)
+                stack.append(_open_object(doc, child))
+            continue
+
+        digests = iter(resolved)
+        source_resolved = _REFERENCE.sub(lambda m: next(digests).hex().encode(), source)
+        stack.pop()
+        if xref is None:
+            return source_resolved
+        active.discard(xref)
+        digest = hashlib.sha256(source_resolved)
+        if is_stream and b"/Subtype/Image" not in source:
+            digest.update(doc.xref_stream(xref) or b"")
+        memo[xref] = digest.digest()
+        stack[-1][4].append(memo[xref])
+
+
+def _page_resources(doc, xref):
+    """Source of the page's /Resources, inherited from the page tree if the page has none"""
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value.encode()
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return b""
+
+
+def page_fingerprint(page, profile, memo=None):
+    """
+    Hash of everything on the page that get_text reads: the decompressed
+    content streams, the page resources with the fonts and form XObjects they
+    reference (recursively, so pages that only draw `/Fm0 Do` still differ),
+    the page geometry and the extraction profile. Revisions that leave a page
+    untouched keep its fingerprint even if other pages were inserted or
+    removed before it. `memo` shares object digests between pages of a
+    document.
+    """
+    doc = page.parent
+    memo = {} if memo is None else memo
+    digest = hashlib.sha256()
+    digest.update(f"{PAGE_CACHE_VERSION}|{profile}|{tuple(page.rect)}|{page.rotation}|".encode())
+    digest.update(_resolve_references(doc, _page_resources(doc, page.xref), memo))
+    digest.update(page.read_contents())
+    return digest.hexdigest()
+
+
+def document_fingerprints(doc, profile):
+    memo = {}
+    return [page_fingerprint(doc.load_page(page_number), profile, memo) for page_number in range(len(doc))]
+
+
+def missing_ranges(pages, max_pages):
+    """Splits sorted page numbers into contiguous (start, stop) ranges of at most max_pages."""
+    ranges = []
+    for page in pages:
+        if ranges and ranges[-1][1] == page and ranges[-1][1] - ranges[-1][0] < max_pages:
+            ranges[-1][1] = page + 1
+        else:
+            ranges.append([page, page + 1])
+    return [tuple(r) for r in ranges]
+
+
+class PageSpanCache:
+    """
+    On-disk cache of the spans extracted from single pages, keyed by
+    page_fingerprint. A revised document only has its changed pages
+    extracted again; everything after extraction (lines, document stats,
+    neighbour features) is cheap and recomputed from the merged spans.
+
+    Entries live in `<cache_dir>/<PAGE_CACHE_VERSION>/<fingerprint>.spans`;
+    directories of other versions are removed when the cache is opened.
+    Once the entries add up to more than `max_bytes`, the least recently used
+    ones are evicted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entry_dir = os.path.join(cache_dir, PAGE_CACHE_VERSION)
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.entry_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name != PAGE_CACHE_VERSION and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+        # name -> [size, last used]
+        self._entries = {}
+        for name in os.listdir(self.entry_dir):
+            if not name.endswith('.spans'):
+                continue
+            stat = os.stat(os.path.join(self.entry_dir, name))
+            self._entries[name] = [stat.st_size, stat.st_mtime]
+        self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    def get(self, fingerprint, page_number):
+        """Spans of the page with this fingerprint, renumbered to `page_number` (0-based)."""
+        name = fingerprint + '.spans'
+        path = os.path.join(self.entry_dir, name)
+        try:
+            with open(path, 'rb') as f:
+                spans = SpanTable.from_bytes(f.read())
+        except (OSError, ValueError, TypeError):
+            self.misses += 1
+            return None
+
+        spans.page = np.full(len(spans), page_number + 1, dtype=np.int32)
+        os.utime(path)
+        stat = os.stat(path)
+        if name in self._entries:
+            self._entries[name][1] = stat.st_mtime
+        else:
+            # Written by another process sharing the directory
+            self._entries[name] = [stat.st_size, stat.st_mtime]
+            self._total_bytes += stat.st_size
+        self.hits += 1
+        return spans
+
+    def put(self, fingerprint, spans):
+        name = fingerprint + '.spans'
+        path = os.path.join(self.entry_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(spans.to_bytes())
+        os.replace(tmp_path, path)
+
+        stat = os.stat(path)
+        if name in self._entries:
+            self._total_bytes -= self._entries[name][0]
+        self._entries[name] = [stat.st_size, stat.st_mtime]
+        self._total_bytes += stat.st_size
+        self._evict()
+
+    def store_pages(self, fingerprints, spans, pages):
+        """Caches every page in `pages` (0-based) from a table that covers them, empty pages included."""
+        by_page = spans.split_pages()
+        for page_number in pages:
+            page_spans = by_page.get(page_number + 1, SpanTable.empty())
+            try:
+                self.put(fingerprints[page_number], page_spans)
+            except OSError as e:
+                print(f"Warning: Could not write page cache entry: {e}")
+                return
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.entry_dir, name))
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+            del self._entries[name]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
@@ -1,19 +1,58 @@
 import os
-import re
-import json
+import tempfile
+import numpy as np
 import pandas as pd
 from collections import Counter
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
-import extract 
-
-class PDFParser:
-    def __init__(self, model, label_encoder, feature_list):
-        if not all([model, label_encoder, feature_list]):
-            raise ValueError("Model, label_encoder, and feature_list must be provided.")
+from multiprocessing import Pool, cpu_count
+import extract
+import batch
+from spans import SpanTable
+from cache import OutlineOutputMixin
+from rules import (
+    TOC_PATTERN, NUMBERING_PATTERN, BOLD_INDICATORS, _clean_line_texts, _count_line_keys, bound_key_counts,
+    assemble_lines, modal_font_size, engineer_features, line_keys, repeated_keys, keys_in, repeated_line_mask,
+    format_predictions, format_bookmarks,
+)
+
+# "sorted" rebuilds lines from a (page, y, x) sort of all spans, which is what
+# the shipped model was trained on; "native" keeps PyMuPDF's own lines
+LINE_ASSEMBLY_MODES = ("sorted", "native")
+# parse_batch classifies the lines of several documents in one predict call
+# once they add up to this many rows
+PREDICT_BATCH_ROWS = 100000
+
+
+class PDFParser(OutlineOutputMixin):
+    def __init__(self, model, label_encoder, feature_list, cache=None, extraction_profile=extract.DEFAULT_PROFILE,
+                 use_bookmarks=True, line_assembly="sorted", page_cache=None, prune_repeated_lines=True,
+                 feature_store=None):
+        if not feature_list:
+            raise ValueError("feature_list must be provided.")
+        # Without a model the parser only computes features (training data curation)
+        if (model is None) != (label_encoder is None):
+            raise ValueError("Model and label_encoder must be provided together.")
         self.model = model
         self.label_encoder = label_encoder
         self.features = feature_list
+        self.cache = cache
+        self.extraction_profile = extraction_profile
+        self.use_bookmarks = use_bookmarks
+        if line_assembly not in LINE_ASSEMBLY_MODES:
+            raise ValueError(f"Unknown line assembly: {line_assembly}. Expected one of {list(LINE_ASSEMBLY_MODES)}.")
+        self.line_assembly = line_assembly
+        # Optional pagecache.PageSpanCache: only changed pages get extracted again
+        self.page_cache = page_cache
+        # pdf path -> "bookmarks", "cache" or "model", whichever produced its outline
+        self.outline_sources = {}
+        # pdf path -> why it has no outline (extraction error, timeout, quarantine, ...)
+        self.failures = {}
+        # Repeated headers/footers are dropped before classification
+        self.prune_repeated_lines = prune_repeated_lines
+        # pdf path -> (rows pruned as repeated headers/footers, rows)
+        self.pruned_rows = {}
+        # Optional featurestore.FeatureStore: featured lines are kept for
+        # re-scoring and training, and documents already in it skip extraction
+        self.feature_store = feature_store
 
     def _group_snippets_into_lines(self, snippets, y_tolerance=2.0):
         if not snippets:
@@ -40,8 +79,7 @@ class PDFParser:
             if not full_text:
                 continue
             
-            toc_pattern = re.compile(r'^(.*?)\\.{3,}\\s*\\d+$')
-            match = toc_pattern.match(full_text)
+            match = TOC_PATTERN.match(full_text)
             if match:
                 full_text = match.group(1).strip()
             elif full_text.endswith('...') and full_text.count('.') > 3:
@@ -65,6 +103,123 @@ class PDFParser:
             })
         return processed_lines
 
+    def _assemble_lines(self, spans, pdf_path, y_tolerance=2.0):
+        """
+        Columnar equivalent of _group_snippets_into_lines followed by
+        _process_lines: takes a SpanTable and returns the processed lines as a
+        DataFrame, with the bbox also split into x0/y0/x1/y1 columns.
+        """
+        lines = assemble_lines(spans, y_tolerance)
+        if lines is None:
+            return pd.DataFrame()
+        return pd.DataFrame({
+            "text": lines["text"],
+            "page": lines["page"],
+            "avg_font_size": lines["avg_font_size"],
+            "y_position": lines["y_position"],
+            "bbox": list(zip(lines["x0"].tolist(), lines["y0"].tolist(), lines["x1"].tolist(), lines["y1"].tolist())),
+            "font_name": lines["font_name"],
+            "source_pdf": os.path.basename(pdf_path),
+            "x0": lines["x0"],
+            "y0": lines["y0"],
+            "x1": lines["x1"],
+            "y1": lines["y1"],
+        })
+
+    def _assemble_native_lines(self, spans, pdf_path, y_tolerance=2.0, merge_gap=1.5, marker_gap=4.0):
+        """
+        Line assembly on top of PyMuPDF's own lines: spans stay grouped by
+        (page, block, line) as extracted, only those lines are ordered within
+        each page (top to bottom, then left to right) and a line is merged
+        into the previous one only when it continues it on the same row, at
+        most `merge_gap` font sizes to its right (`marker_gap` after a bullet
+        or list number of up to 3 characters). Text in another column is
+        never merged, unlike _assemble_lines. Returns the same columns.
+        """
+        if len(spans) == 0:
+            return pd.DataFrame()
+
+        # PyMuPDF's lines are contiguous runs of spans
+        page = spans.page
+        breaks = np.ones(len(spans), dtype=bool)
+        breaks[1:] = (page[1:] != page[:-1]) | (spans.block[1:] != spans.block[:-1]) | (spans.line[1:] != spans.line[:-1])
+        starts = np.flatnonzero(breaks)
+        lengths = np.diff(np.append(starts, len(spans)))
+        span_line = np.cumsum(breaks) - 1
+
+        line_page = page[starts]
+        line_x0 = np.minimum.reduceat(spans.x0, starts)
+        line_y0 = np.minimum.reduceat(spans.y0, starts)
+        line_x1 = np.maximum.reduceat(spans.x1, starts)
+        line_y1 = np.maximum.reduceat(spans.y1, starts)
+        line_size = np.bincount(span_line, weights=spans.font_size) / lengths
+
+        # Per page order; rows are bucketed by y_tolerance so small baseline
+        # jitter doesn't put the right half of a row before its left half
+        order = np.lexsort((line_x0, np.floor(line_y0 / y_tolerance), line_page))
+
+        # Most of PyMuPDF's lines are a single span
+        texts = spans.texts
+        line_texts = list(map(texts.__getitem__, spans.text_id[starts[order]].tolist()))
+        text_ids = spans.text_id.tolist()
+        for i in np.flatnonzero(lengths[order] > 1).tolist():
+            start = int(starts[order[i]])
+            line_texts[i] = "".join([texts[t] for t in text_ids[start:start + lengths[order[i]]]])
+        is_marker = np.fromiter(map(len, map(str.strip, line_texts)), dtype=np.int64, count=len(line_texts)) <= 3
+
+        o_page = line_page[order]
+        o_y0 = line_y0[order]
+        gap = line_x0[order][1:] - line_x1[order][:-1]
+        max_gap = np.where(is_marker[:-1], marker_gap, merge_gap) * line_size[order][:-1]
+        merge = np.zeros(len(order), dtype=bool)
+        merge[1:] = ((o_page[1:] == o_page[:-1]) & (np.abs(o_y0[1:] - o_y0[:-1]) < y_tolerance)
+                     & (gap > -y_tolerance) & (gap <= max_gap))
+        group_starts = np.flatnonzero(~merge)
+        group_of_line = np.cumsum(~merge) - 1
+
+        group_texts = [line_texts[i] for i in group_starts.tolist()]
+        gaps = gap.tolist()
+        sizes = line_size[order].tolist()
+        for i in np.flatnonzero(merge).tolist():
+            g = group_of_line[i]
+            # Separate merged pieces that PyMuPDF left visibly apart
+            if gaps[i - 1] > 0.2 * sizes[i - 1] and not group_texts[g][-1:].isspace() and not line_texts[i][:1].isspace():
+                group_texts[g] += " "
+            group_texts[g] += line_texts[i]
+        keep, group_texts = _clean_line_texts(group_texts)
+
+        if not keep:
+            return pd.DataFrame()
+        keep = np.array(keep)
+
+        x0 = np.minimum.reduceat(line_x0[order], group_starts)[keep]
+        y0 = np.minimum.reduceat(line_y0[order], group_starts)[keep]
+        x1 = np.maximum.reduceat(line_x1[order], group_starts)[keep]
+        y1 = np.maximum.reduceat(line_y1[order], group_starts)[keep]
+        group_of_span = group_of_line[np.argsort(order)][span_line]
+        avg_font_size = (np.bincount(group_of_span, weights=spans.font_size)
+                         / np.bincount(group_of_span))[keep]
+        first = starts[order[group_starts[keep]]]
+
+        return pd.DataFrame({
+            "text": group_texts,
+            "page": spans.page[first].astype(np.int64),
+            "avg_font_size": avg_font_size,
+            "y_position": spans.y0[first],
+            "bbox": list(zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist())),
+            "font_name": [spans.fonts[f] for f in spans.font_id[first].tolist()],
+            "source_pdf": os.path.basename(pdf_path),
+            "x0": x0,
+            "y0": y0,
+            "x1": x1,
+            "y1": y1,
+        })
+
+    def _lines_from_spans(self, spans, pdf_path):
+        if self.line_assembly == "native":
+            return self._assemble_native_lines(spans, pdf_path)
+        return self._assemble_lines(spans, pdf_path)
+
     def _get_doc_stats(self, lines):
         font_sizes = [round(l['avg_font_size'], 2) for l in lines if l['text']]
         if not font_sizes:
@@ -72,21 +227,27 @@ class PDFParser:
         modal_font_size = Counter(font_sizes).most_common(1)[0][0]
         return {'modal_font_size': modal_font_size}
 
+    def _get_doc_stats_vectorized(self, lines_df):
+        return {'modal_font_size': modal_font_size(lines_df['avg_font_size'].to_numpy())}
+
+    def _engineer_features_vectorized(self, lines_df, doc_stats, page_height, page_width):
+        """
+        Computes the same feature columns as _engineer_features for a whole
+        document at once. Expects the DataFrame built by _assemble_lines.
+        """
+        features = engineer_features(lines_df, doc_stats['modal_font_size'], page_height, page_width)
+        for name, values in features.items():
+            lines_df[name] = values
+        return lines_df
+
     def _engineer_features(self, lines, doc_stats, page_height, page_width):
         modal_font_size = doc_stats['modal_font_size']
         for i, line in enumerate(lines):
             font_name_lower = line['font_name'].lower()
-            line['is_bold'] = any(indicator in font_name_lower for indicator in ['bold', 'black', 'heavy', 'sembold'])
+            line['is_bold'] = any(indicator in font_name_lower for indicator in BOLD_INDICATORS)
             line['is_all_caps'] = line['text'].isupper() and len(line['text']) > 3
             line['text_len'] = len(line['text'])
-            numbering_pattern = re.compile(
-                r'^\s*(?:(?:Chapter|Section)\s+[\w\d]+|'
-                r'\d{1,2}(?:\.\d{1,2})*\.?|'
-                r'[A-Z]\.|'
-                r'\([a-z]\)|'
-                r'[ivx]+\.)'
-            )
-            line['starts_with_numbering'] = bool(numbering_pattern.match(line['text']))
+            line['starts_with_numbering'] = bool(NUMBERING_PATTERN.match(line['text']))
             if modal_font_size > 0:
                 line['relative_font_size'] = line['avg_font_size'] / modal_font_size
             else:
@@ -113,87 +274,473 @@ class PDFParser:
             line['space_after'] = space_after
         return lines
 
-    def _create_features_for_new_pdf(self, pdf_path):
-        print(f"Processing PDF: {os.path.basename(pdf_path)}")
-        extractor = extract.TextExtractor(pdf_path)
-        texts = extractor.extract_text_from_all_pages_multiprocessing()
-        
+    def _line_keys(self, lines_df):
+        return line_keys(lines_df['text'].tolist(), lines_df['y_position'].to_numpy())
+
+    def _repeated_keys(self, key_counts, text_pages, total_rows):
+        if not self.prune_repeated_lines:
+            return set()
+        return repeated_keys(key_counts, text_pages, total_rows)
+
+    def _repeated_mask(self, keys, repeated):
+        return keys_in(keys, repeated)
+
+    def _has_stored_features(self, pdf_path):
+        if self.feature_store is None:
+            return False
+        try:
+            return self.feature_store.contains(self.feature_store.key_for(pdf_path))
+        except OSError:
+            return False
+
+    def _load_stored_features(self, pdf_path):
+        """The featured lines of the PDF from the feature store, or None."""
+        if self.feature_store is None:
+            return None
+        try:
+            stored = self.feature_store.get(self.feature_store.key_for(pdf_path),
+                                            pdf_name=os.path.basename(pdf_path))
+        except OSError as e:
+            print(f"Warning: Could not read stored features for {pdf_path}: {e}")
+            return None
+        if stored is None:
+            return None
+        featured_df, metadata = stored
+        print(f"Stored features for {os.path.basename(pdf_path)}")
+        pruned, total_rows = metadata.get("pruned_rows", (0, len(featured_df)))
+        self._record_pruned(pdf_path, pruned, total_rows)
+        return featured_df
+
+    def _store_features(self, pdf_path, featured_df):
+        if self.feature_store is None or featured_df.empty:
+            return
+        pruned, total_rows = self.pruned_rows.get(pdf_path, (0, len(featured_df)))
+        metadata = {"pdf": os.path.basename(pdf_path), "pruned_rows": [pruned, total_rows]}
         try:
-            dims = extractor.get_page_dimensions(0)
-            PAGE_WIDTH = dims["width"]
-            PAGE_HEIGHT = dims["height"]
-        except (IndexError, Exception) as e:
-            print(f"Warning: Could not get page dimensions for {pdf_path}. Using default values. Error: {e}")
+            self.feature_store.put(self.feature_store.key_for(pdf_path), featured_df, metadata)
+        except (OSError, TypeError) as e:
+            print(f"Warning: Could not store features for {pdf_path}: {e}")
+
+    def _create_features_for_new_pdf(self, pdf_path, spans=None, page_dims=None):
+        if spans is None:
+            featured_df = self._load_stored_features(pdf_path)
+            if featured_df is not None:
+                return featured_df
+        print(f"Processing PDF: {os.path.basename(pdf_path)}")
+        if spans is None:
+            extractor = extract.TextExtractor(pdf_path, self.extraction_profile)
+            if self.page_cache is not None:
+                spans = extractor.extract_span_table_cached(self.page_cache)
+            else:
+                spans = extractor.extract_span_table_multiprocessing()
+            
+            try:
+                page_dims = extractor.get_page_dimensions(0)
+            except (IndexError, Exception) as e:
+                print(f"Warning: Could not get page dimensions for {pdf_path}. Using default values. Error: {e}")
+                page_dims = None
+
+        if page_dims is not None:
+            PAGE_WIDTH = page_dims["width"]
+            PAGE_HEIGHT = page_dims["height"]
+        else:
             PAGE_WIDTH, PAGE_HEIGHT = 612, 792 
 
-        sorted_snippets = sorted(texts, key=lambda s: (s['page'], s['y_position'], s['bbox'][0]))
-        grouped_lines = self._group_snippets_into_lines(sorted_snippets)
-        final_lines = self._process_lines(grouped_lines, pdf_path)
+        lines_df = self._lines_from_spans(spans, pdf_path)
         
-        if not final_lines:
-            return pd.DataFrame()
+        if lines_df.empty:
+            return lines_df
 
-        document_stats = self._get_doc_stats(final_lines)
-        featured_lines = self._engineer_features(final_lines, document_stats, PAGE_HEIGHT, PAGE_WIDTH)
-        
-        for line in featured_lines:
-            line['page'] -= 1
+        document_stats = self._get_doc_stats_vectorized(lines_df)
+        repeated = repeated_line_mask(lines_df) if self.prune_repeated_lines else None
+        featured_df = self._engineer_features_vectorized(lines_df, document_stats, PAGE_HEIGHT, PAGE_WIDTH)
+        featured_df['page'] -= 1
+
+        # Dropped only now: the remaining lines keep the space before/after
+        # their pruned neighbours, which is what the model was trained on
+        total_rows = len(featured_df)
+        if repeated is not None and repeated.any():
+            featured_df = featured_df[~repeated].reset_index(drop=True)
+        self._record_pruned(pdf_path, total_rows - len(featured_df), total_rows)
+        self._store_features(pdf_path, featured_df)
             
-        return pd.DataFrame(featured_lines)
+        return featured_df
 
     def _format_predictions_to_json(self, df_with_predictions):
-        title_df = df_with_predictions[df_with_predictions['predicted_label'] == 'Title']
-        document_title = " ".join(title_df.sort_values(by='bbox')['text'].tolist()) if not title_df.empty else "Title Not Found"
+        return format_predictions(df_with_predictions['text'].tolist(), df_with_predictions['page'].tolist(),
+                                  df_with_predictions['bbox'].tolist(), df_with_predictions['predicted_label'].tolist())
 
-        outline = []
-        heading_df = df_with_predictions[df_with_predictions['predicted_label'].str.startswith('H', na=False)]
-        
-        for _, row in heading_df.iterrows():
-            outline.append({
-                "level": row['predicted_label'],
-                "text": row['text'],
-                "page": row['page'] + 1 
-            })
-            
-        output_json = {
-            "title": document_title,
-            "outline": outline
-        }
-        return output_json
+    def _format_bookmarks_to_json(self, toc, metadata_title):
+        return format_bookmarks(toc, metadata_title)
+
+    def _outline_from_bookmarks(self, pdf_path):
+        """
+        The outline straight from the PDF's embedded bookmarks when they pass
+        extract.is_trusted_toc, skipping extraction and the model. Returns
+        None when the model has to run instead.
+        """
+        if not self.use_bookmarks:
+            return None
+        try:
+            extractor = extract.TextExtractor(pdf_path, self.extraction_profile)
+            toc = extractor.get_trusted_toc()
+            metadata_title = extractor.document.metadata.get("title")
+            extractor.document.close()
+        except Exception as e:
+            print(f"Warning: Could not read bookmarks of {pdf_path}: {e}")
+            return None
+        if toc is None:
+            return None
+        print(f"Using embedded bookmarks for {os.path.basename(pdf_path)}")
+        return self._format_bookmarks_to_json(toc, metadata_title)
+
+    def _load_bookmarks(self, pdf_path, output_dir):
+        final_output = self._outline_from_bookmarks(pdf_path)
+        if final_output is None:
+            return None
+        self._save_output(pdf_path, output_dir, final_output)
+        self.outline_sources[pdf_path] = "bookmarks"
+        return final_output
 
-    def parse_and_save(self, pdf_path, output_dir="."):
+    def parse_and_save(self, pdf_path, output_dir=".", spans=None, page_dims=None, check_cache=True,
+                       check_bookmarks=True):
         if not os.path.exists(pdf_path):
             print(f"Error: PDF file not found at {pdf_path}")
+            self.failures[pdf_path] = "file not found"
             return None
 
+        if check_bookmarks:
+            bookmark_output = self._load_bookmarks(pdf_path, output_dir)
+            if bookmark_output is not None:
+                return bookmark_output
+
+        if check_cache:
+            cached_output = self._load_cached(pdf_path, output_dir)
+            if cached_output is not None:
+                return cached_output
+
         try:
             # Create features
-            new_pdf_df = self._create_features_for_new_pdf(pdf_path)
+            new_pdf_df = self._create_features_for_new_pdf(pdf_path, spans, page_dims)
             if new_pdf_df.empty:
                 print(f"Could not extract any text lines from {pdf_path}.")
+                self.failures[pdf_path] = "no text lines"
                 return None
 
             # Prepare feature matrix and make predictions
-            X_new = new_pdf_df[self.features]
-            predictions_encoded = self.model.predict(X_new)
-            predictions_labels = self.label_encoder.inverse_transform(predictions_encoded)
-            new_pdf_df['predicted_label'] = predictions_labels
+            new_pdf_df['predicted_label'] = self._predict_labels(new_pdf_df)
             
             # Format and save the output
-            final_output = self._format_predictions_to_json(new_pdf_df)
-            
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-                
-            output_filename = os.path.basename(pdf_path).replace('.pdf', '.json')
-            output_filepath = os.path.join(output_dir, output_filename)
+            return self._save_predictions(pdf_path, output_dir, new_pdf_df)
             
-            with open(output_filepath, 'w', encoding='utf-8') as f:
-                json.dump(final_output, f, indent=4)
-                
-            print(f"Prediction complete. Output saved to {output_filepath}")
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {str(e)}")
+            self.failures[pdf_path] = str(e)
+            return None
+
+    def _predict_labels(self, featured_df):
+        if self.model is None:
+            raise ValueError("This parser has no model, it can only compute features.")
+        X_new = featured_df[self.features]
+        predictions_encoded = self.model.predict(X_new)
+        return self.label_encoder.inverse_transform(predictions_encoded)
+
+    def _save_predictions(self, pdf_path, output_dir, df_with_predictions):
+        final_output = self._format_predictions_to_json(df_with_predictions)
+        self._save_output(pdf_path, output_dir, final_output)
+        self._store_cached(pdf_path, final_output)
+        self.outline_sources[pdf_path] = "model"
+        return final_output
+
+    def _predict_documents(self, documents, output_dir):
+        """
+        Classifies the feature rows of several documents, a list of
+        (pdf_path, featured_df), with a single predict call and writes each
+        document's outline. Returns {pdf_path: outline or None}.
+        """
+        results = {}
+        try:
+            frames = [featured_df for _, featured_df in documents]
+            combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            labels = self._predict_labels(combined)
+        except Exception as e:
+            for pdf_path, _ in documents:
+                print(f"Error processing {pdf_path}: {str(e)}")
+                self.failures[pdf_path] = str(e)
+                results[pdf_path] = None
+            return results
+
+        bounds = np.cumsum([0] + [len(frame) for frame in frames])
+        for (pdf_path, featured_df), start, end in zip(documents, bounds[:-1], bounds[1:]):
+            try:
+                featured_df['predicted_label'] = labels[start:end]
+                results[pdf_path] = self._save_predictions(pdf_path, output_dir, featured_df)
+            except Exception as e:
+                print(f"Error processing {pdf_path}: {str(e)}")
+                self.failures[pdf_path] = str(e)
+                results[pdf_path] = None
+        return results
+
+    def _load_cached(self, pdf_path, output_dir):
+        cached_output = self._cached_outline(pdf_path)
+        if cached_output is None:
+            return None
+        self._save_output(pdf_path, output_dir, cached_output)
+        self.outline_sources[pdf_path] = "cache"
+        return cached_output
+
+    def _stream_line_windows(self, pdf_path, page_count, window_pages, pool, extractor=None):
+        """
+        Yields the assembled lines of consecutive page windows in page order.
+        At most one window per worker is in flight at any time. With a
+        batch.BatchExtractor the windows run under its time and memory budgets.
+        """
+        if extractor is not None:
+            ranges = [(seg_from, min(seg_from + window_pages, page_count))
+                      for seg_from in range(0, page_count, window_pages)]
+            for spans in extractor.extract_windows(pdf_path, ranges):
+                yield self._lines_from_spans(spans, pdf_path)
+            return
+
+        windows = [
+            (pdf_path, seg_from, min(seg_from + window_pages, page_count), self.extraction_profile)
+            for seg_from in range(0, page_count, window_pages)
+        ]
+        group_size = cpu_count()
+        for i in range(0, len(windows), group_size):
+            descriptors = pool.map(extract.extract_span_window, windows[i:i + group_size])
+            for descriptor in descriptors:
+                spans = SpanTable.from_shared_memory(descriptor)
+                yield self._lines_from_spans(spans, pdf_path)
+
+    def parse_and_save_streaming(self, pdf_path, output_dir=".", window_pages=32, pool=None, check_cache=True,
+                                 check_bookmarks=True, extractor=None):
+        """
+        Bounded-memory variant of parse_and_save for very large PDFs.
+
+        Pass one extracts the document window by window, counts line font
+        sizes for the modal font size and repeated line keys (at most
+        REPEATED_LINE_MAX_KEYS of them, see bound_key_counts) and spills each
+        window's lines to a temporary directory. Pass two reads the windows back, engineers
+        features, predicts and keeps only the Title/H* rows. Lines never span
+        pages and windows are page aligned, so space_before/space_after and
+        the output are the same as with parse_and_save. Pass a
+        batch.BatchExtractor as `extractor` to extract on its pool under its
+        budgets instead of on `pool`.
+        """
+        if not os.path.exists(pdf_path):
+            print(f"Error: PDF file not found at {pdf_path}")
+            self.failures[pdf_path] = "file not found"
+            return None
+
+        if check_bookmarks:
+            bookmark_output = self._load_bookmarks(pdf_path, output_dir)
+            if bookmark_output is not None:
+                return bookmark_output
+
+        if check_cache:
+            cached_output = self._load_cached(pdf_path, output_dir)
+            if cached_output is not None:
+                return cached_output
+
+        try:
+            print(f"Processing PDF (streaming): {os.path.basename(pdf_path)}")
+            text_extractor = extract.TextExtractor(pdf_path, self.extraction_profile)
+            page_count = text_extractor.page_count
+            try:
+                dims = text_extractor.get_page_dimensions(0)
+                PAGE_WIDTH = dims["width"]
+                PAGE_HEIGHT = dims["height"]
+            except (IndexError, Exception) as e:
+                print(f"Warning: Could not get page dimensions for {pdf_path}. Using default values. Error: {e}")
+                PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+
+            with tempfile.TemporaryDirectory(prefix="round1a_stream_") as spill_dir:
+                font_sizes = Counter()
+                key_counts = {}
+                text_pages = 0
+                total_rows = 0
+                spill_files = []
+                own_pool = pool is None and extractor is None
+                if own_pool:
+                    pool = Pool()
+                try:
+                    line_windows = self._stream_line_windows(pdf_path, page_count, window_pages, pool, extractor)
+                    for i, lines_df in enumerate(line_windows):
+                        if lines_df.empty:
+                            continue
+                        font_sizes.update(round(size, 2) for size in lines_df['avg_font_size'].tolist())
+                        if self.prune_repeated_lines:
+                            # Windows are page aligned, so no page is counted twice
+                            pages = lines_df['page'].to_numpy()
+                            _count_line_keys(self._line_keys(lines_df), pages, key_counts)
+                            bound_key_counts(key_counts)
+                            text_pages += len(np.unique(pages))
+                        total_rows += len(lines_df)
+                        spill_path = os.path.join(spill_dir, f"window_{i:06d}.pkl")
+                        lines_df.to_pickle(spill_path)
+                        spill_files.append(spill_path)
+                finally:
+                    if own_pool:
+                        pool.close()
+                        pool.join()
+
+                if not spill_files:
+                    print(f"Could not extract any text lines from {pdf_path}.")
+                    self.failures[pdf_path] = "no text lines"
+                    return None
+
+                document_stats = {'modal_font_size': font_sizes.most_common(1)[0][0]}
+                repeated_keys = self._repeated_keys(key_counts, text_pages, total_rows)
+                pruned = 0
+                predicted_rows = []
+                for spill_path in spill_files:
+                    lines_df = pd.read_pickle(spill_path)
+                    os.remove(spill_path)
+                    repeated = self._repeated_mask(self._line_keys(lines_df), repeated_keys) if repeated_keys else None
+                    featured_df = self._engineer_features_vectorized(lines_df, document_stats, PAGE_HEIGHT, PAGE_WIDTH)
+                    featured_df['page'] -= 1
+                    if repeated is not None and repeated.any():
+                        pruned += int(repeated.sum())
+                        featured_df = featured_df[~repeated].reset_index(drop=True)
+                        if featured_df.empty:
+                            continue
+                    labels = pd.Series(self._predict_labels(featured_df), index=featured_df.index)
+                    keep = (labels == 'Title') | labels.str.startswith('H', na=False)
+                    rows = featured_df.loc[keep, ['text', 'page', 'bbox']]
+                    rows['predicted_label'] = labels[keep]
+                    predicted_rows.append(rows)
+
+            self._record_pruned(pdf_path, pruned, total_rows)
+            final_output = self._format_predictions_to_json(pd.concat(predicted_rows, ignore_index=True))
+            self._save_output(pdf_path, output_dir, final_output)
+            self._store_cached(pdf_path, final_output)
+            self.outline_sources[pdf_path] = "model"
             return final_output
-            
+
         except Exception as e:
             print(f"Error processing {pdf_path}: {str(e)}")
-            return None
\ No newline at end of file
+            self.failures[pdf_path] = str(e)
+            return None
+
+    def parse_batch(self, pdf_paths, output_dir=".", processes=None, pages_per_task=16, stream_above_pages=None,
+                    extractor=None, predict_batch_rows=PREDICT_BATCH_ROWS):
+        """
+        Parses many PDFs with one long-lived extraction pool. Extraction of the
+        next documents keeps running in the workers while this process does
+        feature engineering and prediction for the ones already extracted.
+        Documents with more than `stream_above_pages` pages go through
+        parse_and_save_streaming on the same pool instead. Documents with
+        trusted bookmarks are answered before anything is extracted. Pass a
+        batch.BatchExtractor as `extractor` to reuse its pool across calls;
+        it is left open. Documents in the feature store are not extracted at
+        all. The feature rows of extracted documents are
+        collected until they reach `predict_batch_rows` and then classified by
+        one predict call (None predicts every document on its own). Returns a
+        dict mapping each pdf path to its outline (or None on failure).
+        """
+        results = {}
+        for pdf_path in pdf_paths:
+            self.failures.pop(pdf_path, None)
+            self.pruned_rows.pop(pdf_path, None)
+        if self.use_bookmarks:
+            unmarked = []
+            for pdf_path in pdf_paths:
+                bookmark_output = self._load_bookmarks(pdf_path, output_dir) if os.path.exists(pdf_path) else None
+                if bookmark_output is not None:
+                    results[pdf_path] = bookmark_output
+                else:
+                    unmarked.append(pdf_path)
+            pdf_paths = unmarked
+
+        if self.cache is not None:
+            uncached = []
+            for pdf_path in pdf_paths:
+                cached_output = self._load_cached(pdf_path, output_dir) if os.path.exists(pdf_path) else None
+                if cached_output is not None:
+                    results[pdf_path] = cached_output
+                else:
+                    uncached.append(pdf_path)
+            pdf_paths = uncached
+
+        streamed = []
+        if stream_above_pages is not None:
+            batched = []
+            for pdf_path in pdf_paths:
+                if extract.get_page_count(pdf_path) > stream_above_pages:
+                    streamed.append(pdf_path)
+                else:
+                    batched.append(pdf_path)
+            pdf_paths = batched
+
+        stored = []
+        if self.feature_store is not None:
+            unstored = []
+            for pdf_path in pdf_paths:
+                if os.path.exists(pdf_path) and self._has_stored_features(pdf_path):
+                    stored.append(pdf_path)
+                else:
+                    unstored.append(pdf_path)
+            pdf_paths = unstored
+
+        own_extractor = extractor is None
+        if own_extractor:
+            extractor = batch.BatchExtractor(processes=processes, pages_per_task=pages_per_task,
+                                             profile=self.extraction_profile, page_cache=self.page_cache)
+        try:
+            pending = []
+            pending_rows = 0
+
+            def queue(pdf_path, featured_df):
+                nonlocal pending, pending_rows
+                pending.append((pdf_path, featured_df))
+                pending_rows += len(featured_df)
+                if pending_rows >= predict_batch_rows:
+                    results.update(self._predict_documents(pending, output_dir))
+                    pending = []
+                    pending_rows = 0
+
+            for pdf_path in stored:
+                featured_df = self._load_stored_features(pdf_path)
+                if featured_df is None:
+                    # Evicted or unreadable since the check, extract it after all
+                    pdf_paths.append(pdf_path)
+                elif predict_batch_rows is None:
+                    results.update(self._predict_documents([(pdf_path, featured_df)], output_dir))
+                else:
+                    queue(pdf_path, featured_df)
+
+            for pdf_path, spans, page_dims, error in extractor.extract(pdf_paths):
+                if error is not None:
+                    print(f"Error processing {pdf_path}: {error}")
+                    self.failures[pdf_path] = error
+                    results[pdf_path] = None
+                    continue
+                if predict_batch_rows is None:
+                    results[pdf_path] = self.parse_and_save(pdf_path, output_dir, spans, page_dims,
+                                                            check_cache=False, check_bookmarks=False)
+                    continue
+
+                try:
+                    featured_df = self._create_features_for_new_pdf(pdf_path, spans, page_dims)
+                except Exception as e:
+                    print(f"Error processing {pdf_path}: {str(e)}")
+                    self.failures[pdf_path] = str(e)
+                    results[pdf_path] = None
+                    continue
+                if featured_df.empty:
+                    print(f"Could not extract any text lines from {pdf_path}.")
+                    self.failures[pdf_path] = "no text lines"
+                    results[pdf_path] = None
+                    continue
+                queue(pdf_path, featured_df)
+            if pending:
+                results.update(self._predict_documents(pending, output_dir))
+
+            for pdf_path in streamed:
+                results[pdf_path] = self.parse_and_save_streaming(pdf_path, output_dir, extractor=extractor,
+                                                                  check_cache=False, check_bookmarks=False)
+        finally:
+            if own_extractor:
+                extractor.close()
+        return results
@@ -0,0 +1,282 @@
+"""
+Text rules, constants and array steps of line assembly, features,
+header/footer pruning and outline formatting that do not need pandas.
+parser.py builds its DataFrames on them and faststart.py its NumPy arrays,
+so both paths label lines the same way.
+
+Lines are columns: a mapping (a dict or a DataFrame) with text, page,
+avg_font_size, y_position, font_name and the x0/y0/x1/y1 of the bbox.
+"""
+import re
+import hashlib
+import numpy as np
+
+# Columns the model is trained on, in order
+FEATURES = [
+    'page', 'avg_font_size', 'y_position', 'is_bold', 'is_all_caps',
+    'text_len', 'starts_with_numbering', 'relative_font_size',
+    'norm_y_pos', 'is_centered', 'space_before', 'space_after'
+]
+TOC_PATTERN = re.compile(r'^(.*?)\\.{3,}\\s*\\d+$')
+NUMBERING_PATTERN = re.compile(
+    r'^\s*(?:(?:Chapter|Section)\s+[\w\d]+|'
+    r'\d{1,2}(?:\.\d{1,2})*\.?|'
+    r'[A-Z]\.|'
+    r'\([a-z]\)|'
+    r'[ivx]+\.)'
+)
+BOLD_INDICATORS = ['bold', 'black', 'heavy', 'sembold']
+# Metadata titles that are really the name of the authoring file
+FILE_NAME_TITLE_PATTERN = re.compile(r'^Microsoft \w+ - |\.(?:docx?|pptx?|xlsx?|pdf|cdr|indd|rtf|txt)\s*$', re.IGNORECASE)
+BOOKMARK_LEVELS = {1: 'H1', 2: 'H2', 3: 'H3'}
+# Lines with the same text (digits ignored) at the same height on at least
+# this many pages, and on this share of the pages with text, are running
+# headers, footers or page numbers and are not classified
+REPEATED_LINE_MIN_PAGES = 3
+REPEATED_LINE_MIN_SHARE = 0.3
+REPEATED_LINE_Y_QUANTUM = 3.0
+# Above this share of a document's lines the "headers" are the content, e.g.
+# the same form on every page, and nothing is pruned
+REPEATED_LINE_MAX_PRUNED_SHARE = 0.5
+# Distinct line keys the streaming and sharded paths count before the rarest
+# are dropped (bound_key_counts); documents below it are counted exactly
+REPEATED_LINE_MAX_KEYS = 50_000
+# Dropped from the text of lines compared across pages, so page numbers match
+DELETE_DIGITS = str.maketrans('', '', '0123456789')
+
+
+def _clean_line_texts(raw_texts):
+    """
+    Strips the assembled line texts and drops trailing dot leaders; returns
+    the indices of the non-empty lines and their cleaned text.
+    """
+    keep = []
+    line_texts = []
+    for i, full_text in enumerate(map(str.strip, raw_texts)):
+        if not full_text:
+            continue
+        # TOC_PATTERN needs a literal backslash, skip the regex when there is none
+        match = TOC_PATTERN.match(full_text) if '\\' in full_text else None
+        if match:
+            full_text = match.group(1).strip()
+        elif full_text.endswith('...') and full_text.count('.') > 3:
+            full_text = full_text.rstrip(' .')
+        keep.append(i)
+        line_texts.append(full_text)
+    return keep, line_texts
+
+
+def _normalize_repeated_texts(texts):
+    """Lower-cased line texts without digits."""
+    # One pass over all lines is much faster than one call per line
+    normalized = "\n".join(texts).lower().translate(DELETE_DIGITS).split("\n")
+    if len(normalized) != len(texts):
+        # A line with a newline of its own
+        normalized = [text.lower().translate(DELETE_DIGITS) for text in texts]
+    return normalized
+
+
+def assemble_lines(spans, y_tolerance=2.0):
+    """
+    Lines of a SpanTable in document order: spans sorted by (page, y, x) and
+    broken into lines on a page change or a y jump of `y_tolerance`, left to
+    right inside each line. Returns the line columns, or None without lines.
+    """
+    if len(spans) == 0:
+        return None
+
+    # Document order (page, y, x), then break lines on page change or y jump
+    order = np.lexsort((spans.x0, spans.y0, spans.page))
+    page = spans.page[order]
+    y0 = spans.y0[order]
+    breaks = np.ones(len(order), dtype=bool)
+    breaks[1:] = (page[1:] != page[:-1]) | ~(np.abs(y0[1:] - y0[:-1]) < y_tolerance)
+    line_ids = np.cumsum(breaks) - 1
+
+    # Left to right inside each line; lexsort is stable like list.sort
+    order = order[np.lexsort((spans.x0[order], line_ids))]
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], len(order))
+
+    text_ids = spans.text_id[order].tolist()
+    texts = spans.texts
+    keep, line_texts = _clean_line_texts(
+        "".join([texts[t] for t in text_ids[start:end]]) for start, end in zip(starts.tolist(), ends.tolist())
+    )
+    if not keep:
+        return None
+    keep = np.array(keep)
+
+    first = order[starts[keep]]
+    return {
+        "text": line_texts,
+        "page": spans.page[first].astype(np.int64),
+        # bincount adds in order, so the mean matches sum()/len() exactly
+        "avg_font_size": (np.bincount(line_ids, weights=spans.font_size[order]) / (ends - starts))[keep],
+        "y_position": spans.y0[first],
+        "font_name": [spans.fonts[f] for f in spans.font_id[first].tolist()],
+        "x0": np.minimum.reduceat(spans.x0[order], starts)[keep],
+        "y0": np.minimum.reduceat(spans.y0[order], starts)[keep],
+        "x1": np.maximum.reduceat(spans.x1[order], starts)[keep],
+        "y1": np.maximum.reduceat(spans.y1[order], starts)[keep],
+    }
+
+
+def modal_font_size(avg_font_sizes):
+    """Most common line font size rounded to 2 decimals; ties go to the size seen first."""
+    sizes = np.asarray(avg_font_sizes)
+    if len(sizes) == 0:
+        return 10.0
+    # Python's round() on the distinct sizes only, np.round rounds differently
+    unique_sizes, inverse = np.unique(sizes, return_inverse=True)
+    rounded = np.array([round(size, 2) for size in unique_sizes.tolist()])[inverse]
+    values, first_seen, counts = np.unique(rounded, return_index=True, return_counts=True)
+    # Like Counter.most_common
+    return values[np.lexsort((first_seen, -counts))[0]].item()
+
+
+def engineer_features(lines, modal_font_size, page_height, page_width):
+    """The feature columns the model reads besides page, avg_font_size and y_position."""
+    text = list(lines["text"])
+    fonts = list(lines["font_name"])
+    avg_font_size = np.asarray(lines["avg_font_size"])
+    x0, y0, x1, y1 = (np.asarray(lines[name]) for name in ("x0", "y0", "x1", "y1"))
+
+    bold_fonts = {font: any(indicator in font.lower() for indicator in BOLD_INDICATORS) for font in set(fonts)}
+    text_len = np.fromiter(map(len, text), dtype=np.int64, count=len(text))
+    page = np.asarray(lines["page"])
+    same_page = page[1:] == page[:-1]
+    space_before = np.full(len(page), -1.0)
+    space_after = np.full(len(page), -1.0)
+    space_before[1:] = np.where(same_page, y0[1:] - y1[:-1], -1.0)
+    space_after[:-1] = np.where(same_page, y0[1:] - y1[:-1], -1.0)
+    return {
+        "is_bold": np.array([bold_fonts[font] for font in fonts], dtype=bool),
+        "is_all_caps": np.array([t.isupper() for t in text], dtype=bool) & (text_len > 3),
+        "text_len": text_len,
+        "starts_with_numbering": np.array([NUMBERING_PATTERN.match(t) is not None for t in text], dtype=bool),
+        "relative_font_size": avg_font_size / modal_font_size if modal_font_size > 0 else np.ones(len(text)),
+        "norm_y_pos": np.asarray(lines["y_position"]) / page_height,
+        "is_centered": np.abs((x0 + x1) / 2 - page_width / 2) < (0.1 * page_width),
+        "space_before": space_before,
+        "space_after": space_after,
+    }
+
+
+def line_keys(texts, y_positions):
+    """
+    Hash of every line's normalized text and quantized y position; lines
+    with the same key sit at the same place on their pages. The hash does
+    not depend on the process, so keys from several hosts can be merged.
+    """
+    y_bucket = np.floor(np.asarray(y_positions) / REPEATED_LINE_Y_QUANTUM + 0.5).astype(np.int64).tolist()
+    blake2b = hashlib.blake2b
+    return np.fromiter(
+        (int.from_bytes(blake2b(f"{y}|{text}".encode(errors="surrogatepass"), digest_size=8).digest(), 'little')
+         for text, y in zip(_normalize_repeated_texts(list(texts)), y_bucket)),
+        dtype=np.uint64, count=len(y_bucket)
+    )
+
+
+def _count_line_keys(keys, pages, key_counts=None):
+    """Adds the (pages, rows) of every key to `key_counts`, a dict key -> (pages, rows)."""
+    key_counts = {} if key_counts is None else key_counts
+    if len(keys) == 0:
+        return key_counts
+    order = np.lexsort((pages, keys))
+    keys = keys[order]
+    pages = pages[order]
+    new_key = np.ones(len(keys), dtype=bool)
+    new_key[1:] = keys[1:] != keys[:-1]
+    new_page = new_key.copy()
+    new_page[1:] |= pages[1:] != pages[:-1]
+    starts = np.flatnonzero(new_key)
+    rows = np.diff(np.append(starts, len(keys)))
+    key_pages = np.add.reduceat(new_page.astype(np.int64), starts)
+    for key, counts in zip(keys[starts].tolist(), zip(key_pages.tolist(), rows.tolist())):
+        if key in key_counts:
+            counts = (key_counts[key][0] + counts[0], key_counts[key][1] + counts[1])
+        key_counts[key] = counts
+    return key_counts
+
+
+def bound_key_counts(key_counts, max_keys=REPEATED_LINE_MAX_KEYS):
+    """
+    Keeps `key_counts` at most `max_keys` keys, in place (a Misra-Gries
+    step): when it holds more, the page count of the (max_keys + 1)-th most
+    frequent key is taken off every key and the keys left without pages are
+    dropped. A key is then undercounted by at most total pages / max_keys,
+    so running headers, which are on a large share of the pages, stay.
+    """
+    if len(key_counts) <= max_keys:
+        return key_counts
+    page_counts = np.fromiter((pages for pages, _ in key_counts.values()), dtype=np.int64, count=len(key_counts))
+    cut = int(np.partition(page_counts, len(page_counts) - max_keys - 1)[len(page_counts) - max_keys - 1])
+    for key, (pages, rows) in list(key_counts.items()):
+        if pages <= cut:
+            del key_counts[key]
+        else:
+            key_counts[key] = (pages - cut, rows)
+    return key_counts
+
+
+def repeated_keys(key_counts, text_pages, total_rows):
+    """Keys to prune, from the (pages, rows) of every key over the whole document."""
+    min_pages = max(REPEATED_LINE_MIN_PAGES, REPEATED_LINE_MIN_SHARE * text_pages)
+    repeated = {key for key, (pages, _) in key_counts.items() if pages >= min_pages}
+    if sum(key_counts[key][1] for key in repeated) > REPEATED_LINE_MAX_PRUNED_SHARE * total_rows:
+        return set()
+    return repeated
+
+
+def keys_in(keys, repeated):
+    return np.isin(keys, np.fromiter(repeated, dtype=np.uint64, count=len(repeated)))
+
+
+def repeated_line_mask(lines):
+    """Rows of one document that are running headers, footers or page numbers."""
+    keys = line_keys(lines["text"], lines["y_position"])
+    pages = np.asarray(lines["page"])
+    return keys_in(keys, repeated_keys(_count_line_keys(keys, pages), len(np.unique(pages)), len(keys)))
+
+
+def format_predictions(texts, pages, bboxes, labels):
+    """
+    Outline JSON from classified lines (pages 0-based): the Title lines in
+    bbox order make the title, the H* lines the outline.
+    """
+    title_rows = sorted((i for i, label in enumerate(labels) if label == 'Title'), key=bboxes.__getitem__)
+    document_title = " ".join(texts[i] for i in title_rows) if title_rows else "Title Not Found"
+    outline = [
+        {"level": label, "text": texts[i], "page": pages[i] + 1}
+        for i, label in enumerate(labels) if isinstance(label, str) and label.startswith('H')
+    ]
+    return {
+        "title": document_title,
+        "outline": outline
+    }
+
+
+def format_bookmarks(toc, metadata_title):
+    """Outline JSON from trusted bookmarks: levels 1-3 become H1-H3."""
+    metadata_title = (metadata_title or "").strip()
+    if metadata_title and not FILE_NAME_TITLE_PATTERN.search(metadata_title):
+        document_title = metadata_title
+    else:
+        document_title = "Title Not Found"
+
+    outline = []
+    for level, text, page in toc:
+        if level not in BOOKMARK_LEVELS:
+            continue
+        outline.append({
+            "level": BOOKMARK_LEVELS[level],
+            "text": text.strip(),
+            "page": page
+        })
+
+    output_json = {
+        "title": document_title,
+        "outline": outline
+    }
+    return output_json
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Local HTTP service around the round1a pipeline.
+
+    POST /outline   body: the PDF bytes   -> {"title": ..., "outline": [...]}
+    GET  /stats     queue depth, batch sizes and latency percentiles
+    GET  /health
+
+The model and the extraction pool stay loaded between requests. Every request
+is extracted on the shared batch.BatchExtractor, under its timeouts, memory
+cap and quarantine, and featurized in its own thread; the feature rows of
+requests that arrive within `--batch-wait-ms` of each other are then
+classified by a single predict call (MicroBatcher).
+
+    python service.py --port 8080
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import hashlib
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import batch
+from main import build_parser, open_quarantine
+
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+
+class MicroBatcher:
+    """
+    Collects feature rows from concurrent callers and predicts them together.
+
+    A batch is closed `max_wait` seconds after its first request arrives, or
+    as soon as it holds `max_rows` rows. Rows keep their order, so every
+    caller gets exactly the labels of its own rows back.
+    """
+
+    def __init__(self, predict_fn, max_wait=0.01, max_rows=50000):
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self._condition = threading.Condition()
+        self._pending = []
+        self._pending_rows = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.largest_batch = 0
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def predict(self, featured_df):
+        item = {"df": featured_df, "done": threading.Event(), "labels": None, "error": None}
+        with self._condition:
+            self._pending.append(item)
+            self._pending_rows += len(featured_df)
+            self._condition.notify()
+        item["done"].wait()
+        if item["error"] is not None:
+            raise item["error"]
+        return item["labels"]
+
+    def queue_depth(self):
+        with self._condition:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.max_wait
+                while self._pending_rows < self.max_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                items = self._pending
+                self._pending = []
+                self._pending_rows = 0
+
+            try:
+                frames = [item["df"] for item in items]
+                labels = self.predict_fn(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True))
+                bounds = np.cumsum([0] + [len(frame) for frame in frames])
+                for item, start, end in zip(items, bounds[:-1], bounds[1:]):
+                    item["labels"] = labels[start:end]
+            except Exception as e:
+                for item in items:
+                    item["error"] = e
+            finally:
+                self.batches += 1
+                self.batched_requests += len(items)
+                self.largest_batch = max(self.largest_batch, len(items))
+                for item in items:
+                    item["done"].set()
+
+
+class OutlineService:
+    def __init__(self, pdf_parser, processes=None, pages_per_task=16, batch_wait=0.01, latency_window=1000):
+        self.parser = pdf_parser
+        self.extractor = batch.BatchExtractor(processes, pages_per_task, profile=pdf_parser.extraction_profile,
+                                              page_cache=pdf_parser.page_cache, quarantine=open_quarantine())
+        self.batcher = MicroBatcher(pdf_parser._predict_labels, max_wait=batch_wait)
+        self.spool_dir = tempfile.mkdtemp(prefix="round1a_service_")
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.sources = {"bookmarks": 0, "cache": 0, "model": 0}
+        # Rows dropped as repeated headers/footers, and all rows, over every request
+        self.pruned_rows = 0
+        self.rows = 0
+
+    def close(self):
+        self.extractor.close()
+        try:
+            os.rmdir(self.spool_dir)
+        except OSError:
+            pass
+
+    def _extract(self, pdf_path):
+        [(_, spans, page_dims, error)] = self.extractor.extract([pdf_path])
+        if error is not None:
+            raise RuntimeError(error)
+        return spans, page_dims
+
+    def _outline(self, pdf_path):
+        final_output = self.parser._outline_from_bookmarks(pdf_path)
+        if final_output is not None:
+            return final_output, "bookmarks"
+
+        final_output = self.parser._cached_outline(pdf_path)
+        if final_output is not None:
+            return final_output, "cache"
+
+        featured_df = self.parser._load_stored_features(pdf_path)
+        if featured_df is None:
+            spans, page_dims = self._extract(pdf_path)
+            featured_df = self.parser._create_features_for_new_pdf(pdf_path, spans, page_dims)
+        if featured_df.empty:
+            return None, "model"
+        featured_df['predicted_label'] = self.batcher.predict(featured_df[self.parser.features])
+        final_output = self.parser._format_predictions_to_json(featured_df)
+        self.parser._store_cached(pdf_path, final_output)
+        return final_output, "model"
+
+    def outline_for_bytes(self, pdf_bytes):
+        """Returns (outline or None, source); the bytes are spooled to a private temp file."""
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+        t0 = time.perf_counter()
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf", dir=self.spool_dir)
+        # The spool path is used once, so its content key is passed in rather
+        # than read back from the file and remembered by path
+        stores = [store for store in (self.parser.cache, self.parser.feature_store) if store is not None]
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf_bytes)
+            sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+            for store in stores:
+                store.remember_key(pdf_path, sha256)
+            final_output, source = self._outline(pdf_path)
+        except Exception as e:
+            print(f"Error processing request: {str(e)}")
+            final_output, source = None, None
+        finally:
+            for store in stores:
+                store.forget_key(pdf_path)
+            os.remove(pdf_path)
+            pruned, rows = self.parser.pruned_rows.pop(pdf_path, (0, 0))
+            with self._lock:
+                self.pruned_rows += pruned
+                self.rows += rows
+                self.in_flight -= 1
+                self._latencies.append(time.perf_counter() - t0)
+                if final_output is None:
+                    self.errors += 1
+                else:
+                    self.sources[source] += 1
+        return final_output, source
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            stats = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "sources": dict(self.sources),
+                "pruned_rows": self.pruned_rows,
+                "rows": self.rows,
+            }
+        stats["predict_queue_depth"] = self.batcher.queue_depth()
+        stats["predict_batches"] = self.batcher.batches
+        stats["mean_batch_size"] = self.batcher.batched_requests / self.batcher.batches if self.batcher.batches else 0.0
+        stats["largest_batch"] = self.batcher.largest_batch
+        if len(latencies):
+            stats["latency_ms"] = {
+                f"p{q}": float(np.percentile(latencies, q)) * 1000 for q in (50, 90, 99)
+            }
+        return stats
+
+
+class OutlineRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.service.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/outline":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_json(411, {"error": "Content-Length required"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self._send_json(413, {"error": f"PDF larger than {MAX_UPLOAD_BYTES} bytes"})
+            return
+
+        final_output, source = self.server.service.outline_for_bytes(self.rfile.read(length))
+        if final_output is None:
+            self._send_json(422, {"error": "Could not extract an outline from the PDF"})
+            return
+        self.send_response(200)
+        body = json.dumps(final_output, indent=4).encode('utf-8')
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Outline-Source", source)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--processes", type=int, default=None, help="Extraction workers (default: CPU count)")
+    arg_parser.add_argument("--batch-wait-ms", type=float, default=10.0,
+                            help="How long a predict batch stays open for more requests")
+    arg_parser.add_argument("--no-cache", action="store_true", help="Always run the model (e.g. for load tests)")
+    args = arg_parser.parse_args()
+
+    pdf_parser = build_parser()
+    if pdf_parser is None:
+        return 1
+    if args.no_cache:
+        pdf_parser.cache = None
+
+    # Fork the extraction pool before any server or batcher threads exist
+    service = OutlineService(pdf_parser, processes=args.processes, batch_wait=args.batch_wait_ms / 1000)
+    server = ThreadingHTTPServer((args.host, args.port), OutlineRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+
+    def shutdown(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"Serving outlines on http://{args.host}:{args.port}/outline")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Sharded processing of a single large PDF over several processes or hosts that
+share a directory.
+
+The document-wide context the model needs is the modal font size (relative
+font size) and the neighbouring lines (space before/after). Processing is
+therefore split into two phases over page-range shards:
+
+  plan      record page count, page size and the shard ranges in the job
+            directory (answers straight away from trusted bookmarks or the
+            outline cache, like main.py)
+  phase 1   per shard: extract and assemble lines, spill them, and write the
+            shard's font size counts, the pages and rows of every line
+            position key and its first and last line
+  stats     combine the counts into the document's modal font size and the
+            keys of its repeated headers/footers
+  phase 2   per shard: engineer features with the global stats, repair
+            space_before/space_after of the shard's edge lines from the
+            neighbouring shards, drop the repeated headers/footers, predict,
+            keep the Title/H* rows
+  merge     concatenate the rows in shard order and write the outline
+
+The plan copies the PDF into the job directory, so the hosts only need to
+share that directory. Workers claim shards by creating claim files, so any
+number of `work` processes on any number of hosts can run against the same
+job. A shard that fails writes failed.json, which stops every worker and
+merge waiting for it:
+
+    python shard.py plan big.pdf /shared/jobs --pages-per-shard 64
+    python shard.py work /shared/jobs/<job>        # on every host
+    python shard.py merge /shared/jobs/<job> --output /app/output
+
+or, on one machine, `python shard.py run big.pdf --workers 8`. The outline is
+the same as parse_and_save's.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+from collections import Counter
+from multiprocessing import Process
+from multiprocessing.connection import wait
+import extract
+from cache import file_sha256
+from main import build_parser
+from rules import _count_line_keys, bound_key_counts
+
+PLAN_FILE = "plan.json"
+STATS_FILE = "stats.json"
+FAILED_FILE = "failed.json"
+INPUT_DIR = "input"
+DEFAULT_PAGES_PER_SHARD = 64
+# Waiting for shards of other workers gives up after this many seconds
+DEFAULT_TIMEOUT = 30 * 60.0
+
+
+def _write_json_atomic(path, payload, exclusive=False):
+    """
+    Writes `payload` to `path` so readers never see a partial file. With
+    `exclusive`, an existing file is kept and False is returned.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    try:
+        if not exclusive:
+            os.replace(tmp_path, path)
+            return True
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _edge_line(lines_df, position):
+    row = lines_df.iloc[position]
+    return {"page": int(row['page']), "y0": float(row['y0']), "y1": float(row['y1'])}
+
+
+class ShardedJob:
+    """One PDF split into page-range shards, with its state in `job_dir`."""
+
+    def __init__(self, pdf_parser, job_dir, reclaim_after=None):
+        self.parser = pdf_parser
+        self.job_dir = job_dir
+        # Claims older than this (seconds) without a result are taken over
+        self.reclaim_after = reclaim_after
+        self.plan = _read_json(os.path.join(job_dir, PLAN_FILE))
+        self.pdf_path = os.path.join(job_dir, self.plan["pdf"])
+
+    @classmethod
+    def create(cls, pdf_parser, pdf_path, jobs_dir, pages_per_shard=DEFAULT_PAGES_PER_SHARD, **kwargs):
+        """
+        Plans the job for `pdf_path` under `jobs_dir`, or joins the existing
+        plan if another host got there first. The PDF is copied into the job
+        directory.
+        """
+        job_dir = os.path.join(jobs_dir, file_sha256(pdf_path)[:16])
+        if os.path.exists(os.path.join(job_dir, PLAN_FILE)):
+            return cls(pdf_parser, job_dir, **kwargs)
+        os.makedirs(os.path.join(job_dir, "claims"), exist_ok=True)
+        os.makedirs(os.path.join(job_dir, INPUT_DIR), exist_ok=True)
+        # Keeps the name, which names the output file
+        input_path = os.path.join(INPUT_DIR, os.path.basename(pdf_path))
+        tmp_path = os.path.join(job_dir, f"{input_path}.{os.getpid()}.tmp")
+        shutil.copyfile(pdf_path, tmp_path)
+        os.replace(tmp_path, os.path.join(job_dir, input_path))
+
+        extractor = extract.TextExtractor(pdf_path, pdf_parser.extraction_profile)
+        try:
+            page_dims = extractor.get_page_dimensions(0)
+        except (IndexError, Exception) as e:
+            print(f"Warning: Could not get page dimensions for {pdf_path}. Using default values. Error: {e}")
+            page_dims = {"width": 612, "height": 792}
+        page_count = extractor.page_count
+        extractor.document.close()
+
+        pages_per_shard = max(1, pages_per_shard)
+        plan = {
+            "pdf": input_path,
+            "page_count": page_count,
+            "page_width": page_dims["width"],
+            "page_height": page_dims["height"],
+            "extraction_profile": pdf_parser.extraction_profile,
+            "line_assembly": pdf_parser.line_assembly,
+            "prune_repeated_lines": pdf_parser.prune_repeated_lines,
+            "shards": [
+                [start, min(start + pages_per_shard, page_count)]
+                for start in range(0, page_count, pages_per_shard)
+            ],
+        }
+        _write_json_atomic(os.path.join(job_dir, PLAN_FILE), plan, exclusive=True)
+        return cls(pdf_parser, job_dir, **kwargs)
+
+    def _path(self, name):
+        return os.path.join(self.job_dir, name)
+
+    def _shard_path(self, shard, suffix):
+        return self._path(f"shard_{shard:05d}.{suffix}")
+
+    def _claim(self, name, result_path):
+        """True if this process now owns the task `name` whose output is `result_path`."""
+        claim_path = os.path.join(self.job_dir, "claims", name)
+        while True:
+            if os.path.exists(result_path):
+                return False
+            try:
+                fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.reclaim_after is None:
+                    return False
+                try:
+                    age = time.time() - os.stat(claim_path).st_mtime
+                except FileNotFoundError:
+                    continue
+                if age < self.reclaim_after:
+                    return False
+                print(f"Reclaiming {name} after {age:.0f}s")
+                try:
+                    os.remove(claim_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            os.write(fd, f"{os.uname().nodename} {os.getpid()}".encode())
+            os.close(fd)
+            return True
+
+    def fail(self, task, error):
+        """Records the first failed task of the job; every worker waiting on the job stops."""
+        _write_json_atomic(self._path(FAILED_FILE),
+                           {"task": task, "host": os.uname().nodename, "error": str(error)}, exclusive=True)
+
+    def _check_failed(self):
+        try:
+            failure = _read_json(self._path(FAILED_FILE))
+        except FileNotFoundError:
+            return
+        raise RuntimeError(f"{failure['task']} failed on {failure['host']}: {failure['error']}")
+
+    def _run(self, task, fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            self.fail(task, e)
+            raise
+
+    def _wait_for(self, paths, poll_interval, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(os.path.exists(path) for path in paths):
+            self._check_failed()
+            if deadline is not None and time.monotonic() > deadline:
+                missing = [os.path.basename(path) for path in paths if not os.path.exists(path)]
+                raise TimeoutError(f"Timed out waiting for {', '.join(missing[:5])}")
+            time.sleep(poll_interval)
+
+    def _check_parser(self):
+        for key in ("extraction_profile", "line_assembly", "prune_repeated_lines"):
+            if getattr(self.parser, key) != self.plan[key]:
+                raise ValueError(f"Job was planned with {key}={self.plan[key]!r}, "
+                                 f"this worker uses {getattr(self.parser, key)!r}")
+
+    def run_stats_shard(self, shard):
+        """Phase 1: lines of the shard's pages, their font size counts and the edge lines."""
+        start, stop = self.plan["shards"][shard]
+        spans = extract.extract_span_range(self.pdf_path, start, stop, self.plan["extraction_profile"])
+        lines_df = self.parser._lines_from_spans(spans, self.pdf_path)
+
+        # Insertion order is first-seen order, which decides ties of the mode
+        font_sizes = Counter(round(size, 2) for size in lines_df['avg_font_size'].tolist())
+        pages = lines_df['page'].to_numpy()
+        key_counts = {}
+        if self.parser.prune_repeated_lines and len(lines_df):
+            key_counts = _count_line_keys(self.parser._line_keys(lines_df), pages)
+        shard_stats = {
+            "lines": len(lines_df),
+            "font_sizes": list(font_sizes.items()),
+            "text_pages": len(set(pages.tolist())),
+            "line_keys": [[key, key_pages, rows] for key, (key_pages, rows) in key_counts.items()],
+            "first_line": _edge_line(lines_df, 0) if len(lines_df) else None,
+            "last_line": _edge_line(lines_df, -1) if len(lines_df) else None,
+        }
+        if len(lines_df):
+            lines_df.to_pickle(self._shard_path(shard, "lines.pkl"))
+        _write_json_atomic(self._shard_path(shard, "stats.json"), shard_stats)
+
+    def merge_stats(self):
+        """Modal font size over all shards, and each shard's neighbouring edge lines."""
+        font_sizes = Counter()
+        key_counts = {}
+        shard_stats = []
+        for shard in range(len(self.plan["shards"])):
+            stats = _read_json(self._shard_path(shard, "stats.json"))
+            for size, count in stats["font_sizes"]:
+                font_sizes[size] += count
+            # Shards cover disjoint pages, so page counts add up
+            for key, key_pages, rows in stats.pop("line_keys"):
+                counts = key_counts.get(key, (0, 0))
+                key_counts[key] = (counts[0] + key_pages, counts[1] + rows)
+            bound_key_counts(key_counts)
+            shard_stats.append(stats)
+        lines = sum(stats["lines"] for stats in shard_stats)
+        repeated_keys = self.parser._repeated_keys(
+            key_counts, sum(stats["text_pages"] for stats in shard_stats), lines
+        )
+
+        # The line that precedes/follows each shard, skipping empty shards
+        previous_lines = []
+        last_line = None
+        for stats in shard_stats:
+            previous_lines.append(last_line)
+            if stats["last_line"] is not None:
+                last_line = stats["last_line"]
+        next_lines = []
+        first_line = None
+        for stats in reversed(shard_stats):
+            next_lines.append(first_line)
+            if stats["first_line"] is not None:
+                first_line = stats["first_line"]
+        next_lines.reverse()
+
+        document_stats = {
+            "modal_font_size": font_sizes.most_common(1)[0][0] if font_sizes else 10.0,
+            "lines": lines,
+            "repeated_keys": sorted(repeated_keys),
+            "pruned_rows": sum(key_counts[key][1] for key in repeated_keys),
+            "previous_lines": previous_lines,
+            "next_lines": next_lines,
+        }
+        _write_json_atomic(self._path(STATS_FILE), document_stats)
+        return document_stats
+
+    def run_predict_shard(self, shard, document_stats):
+        """Phase 2: features with the global stats, boundary repair and prediction."""
+        lines_path = self._shard_path(shard, "lines.pkl")
+        if not os.path.exists(lines_path):
+            rows = pd.DataFrame(columns=['text', 'page', 'bbox', 'predicted_label'])
+        else:
+            lines_df = pd.read_pickle(lines_path)
+            featured_df = self.parser._engineer_features_vectorized(
+                lines_df, {'modal_font_size': document_stats["modal_font_size"]},
+                self.plan["page_height"], self.plan["page_width"]
+            )
+
+            # The shard only saw its own lines, so its edges look like page starts/ends
+            previous_line = document_stats["previous_lines"][shard]
+            if previous_line is not None and previous_line["page"] == featured_df['page'].iat[0]:
+                featured_df.iat[0, featured_df.columns.get_loc('space_before')] = \
+                    featured_df['y0'].iat[0] - previous_line["y1"]
+            next_line = document_stats["next_lines"][shard]
+            if next_line is not None and next_line["page"] == featured_df['page'].iat[-1]:
+                featured_df.iat[-1, featured_df.columns.get_loc('space_after')] = \
+                    next_line["y0"] - featured_df['y1'].iat[-1]
+
+            featured_df['page'] -= 1
+            repeated_keys = document_stats["repeated_keys"]
+            if repeated_keys:
+                repeated = self.parser._repeated_mask(self.parser._line_keys(featured_df), repeated_keys)
+                featured_df = featured_df[~repeated].reset_index(drop=True)
+            if featured_df.empty:
+                rows = pd.DataFrame(columns=['text', 'page', 'bbox', 'predicted_label'])
+            else:
+                labels = pd.Series(self.parser._predict_labels(featured_df), index=featured_df.index)
+                keep = (labels == 'Title') | labels.str.startswith('H', na=False)
+                rows = featured_df.loc[keep, ['text', 'page', 'bbox']]
+                rows['predicted_label'] = labels[keep]
+
+        rows_path = self._shard_path(shard, "rows.pkl")
+        tmp_path = f"{rows_path}.{os.getpid()}.tmp"
+        rows.to_pickle(tmp_path)
+        os.replace(tmp_path, rows_path)
+
+    def work(self, poll_interval=0.5, timeout=DEFAULT_TIMEOUT):
+        """
+        Runs whatever shards of both phases no other worker has claimed,
+        waiting in between for the stats of shards claimed elsewhere.
+        Returns the number of shards this worker processed. Raises
+        RuntimeError once a task of the job failed anywhere and TimeoutError
+        after waiting `timeout` seconds (None waits forever).
+        """
+        self._check_parser()
+        self._check_failed()
+        shards = range(len(self.plan["shards"]))
+        done = 0
+        for shard in shards:
+            task = f"stats_{shard:05d}"
+            if self._claim(task, self._shard_path(shard, "stats.json")):
+                self._run(task, self.run_stats_shard, shard)
+                done += 1
+
+        self._wait_for([self._shard_path(shard, "stats.json") for shard in shards], poll_interval, timeout)
+        if self._claim("merge_stats", self._path(STATS_FILE)):
+            self._run("merge_stats", self.merge_stats)
+        self._wait_for([self._path(STATS_FILE)], poll_interval, timeout)
+        document_stats = _read_json(self._path(STATS_FILE))
+
+        for shard in shards:
+            task = f"predict_{shard:05d}"
+            if self._claim(task, self._shard_path(shard, "rows.pkl")):
+                self._run(task, self.run_predict_shard, shard, document_stats)
+                done += 1
+        return done
+
+    def merge(self, output_dir, poll_interval=0.5, timeout=DEFAULT_TIMEOUT, pdf_path=None):
+        """
+        Writes the outline once every shard has its rows; returns it, or None
+        if there was no text. The outline is recorded under `pdf_path`, by
+        default the job's copy of the PDF.
+        """
+        shards = range(len(self.plan["shards"]))
+        self._wait_for([self._shard_path(shard, "rows.pkl") for shard in shards], poll_interval, timeout)
+        pdf_path = pdf_path or self.pdf_path
+        document_stats = _read_json(self._path(STATS_FILE))
+        if document_stats["lines"] == 0:
+            print(f"Could not extract any text lines from {pdf_path}.")
+            return None
+        self.parser._record_pruned(pdf_path, document_stats["pruned_rows"], document_stats["lines"])
+
+        rows = pd.concat([pd.read_pickle(self._shard_path(shard, "rows.pkl")) for shard in shards],
+                         ignore_index=True)
+        final_output = self.parser._format_predictions_to_json(rows)
+        self.parser._save_output(pdf_path, output_dir, final_output)
+        self.parser._store_cached(pdf_path, final_output)
+        self.parser.outline_sources[pdf_path] = "model"
+        return final_output
+
+    def remove(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+
+def plan_job(pdf_parser, pdf_path, jobs_dir, output_dir, pages_per_shard=DEFAULT_PAGES_PER_SHARD, **kwargs):
+    """
+    Returns (ShardedJob, None), or (None, outline) when trusted bookmarks or
+    the outline cache already answered and the outline was written.
+    """
+    if pdf_parser.use_bookmarks:
+        final_output = pdf_parser._load_bookmarks(pdf_path, output_dir)
+        if final_output is not None:
+            return None, final_output
+    final_output = pdf_parser._load_cached(pdf_path, output_dir)
+    if final_output is not None:
+        return None, final_output
+    return ShardedJob.create(pdf_parser, pdf_path, jobs_dir, pages_per_shard, **kwargs), None
+
+
+def _local_worker(job_dir):
+    pdf_parser = build_parser()
+    if pdf_parser is None:
+        sys.exit(1)
+    ShardedJob(pdf_parser, job_dir).work()
+
+
+def run_local(pdf_parser, pdf_path, output_dir, workers=4, pages_per_shard=DEFAULT_PAGES_PER_SHARD, jobs_dir=None):
+    """All phases on this machine with `workers` worker processes; returns the outline."""
+    with tempfile.TemporaryDirectory(prefix="round1a_shards_", dir=jobs_dir) as tmp_jobs_dir:
+        job, final_output = plan_job(pdf_parser, pdf_path, tmp_jobs_dir, output_dir, pages_per_shard)
+        if job is None:
+            return final_output
+        processes = [Process(target=_local_worker, args=(job.job_dir,)) for _ in range(max(1, workers))]
+        for process in processes:
+            process.start()
+        running = list(processes)
+        while running:
+            wait([process.sentinel for process in running])
+            for process in [process for process in running if not process.is_alive()]:
+                running.remove(process)
+                if process.exitcode != 0:
+                    # A worker killed outright wrote no failure; the others must not wait for its shards
+                    job.fail("worker", f"exited with code {process.exitcode}")
+        if any(process.exitcode != 0 for process in processes):
+            print(f"Error processing {pdf_path}: a shard worker failed")
+            return None
+        return job.merge(output_dir, pdf_path=pdf_path)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="Create the job directory for a PDF and print its path")
+    plan.add_argument("pdf")
+    plan.add_argument("jobs_dir")
+    plan.add_argument("--output", default="/app/output", help="Where bookmark/cached outlines are written")
+    plan.add_argument("--pages-per-shard", type=int, default=DEFAULT_PAGES_PER_SHARD)
+
+    work = commands.add_parser("work", help="Process unclaimed shards of a job")
+    work.add_argument("job_dir")
+    work.add_argument("--poll-interval", type=float, default=0.5)
+    work.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                      help="Give up waiting for other workers after this many seconds")
+    work.add_argument("--reclaim-after", type=float, default=None,
+                      help="Take over shards claimed this many seconds ago that have no result yet")
+
+    merge = commands.add_parser("merge", help="Write the outline once all shards are done")
+    merge.add_argument("job_dir")
+    merge.add_argument("--output", default="/app/output")
+    merge.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    merge.add_argument("--keep", action="store_true", help="Keep the job directory")
+
+    run = commands.add_parser("run", help="Plan, work and merge on this machine")
+    run.add_argument("pdf")
+    run.add_argument("--output", default="/app/output")
+    run.add_argument("--workers", type=int, default=os.cpu_count())
+    run.add_argument("--pages-per-shard", type=int, default=DEFAULT_PAGES_PER_SHARD)
+    args = arg_parser.parse_args()
+
+    pdf_parser = build_parser()
+    if pdf_parser is None:
+        return 1
+
+    if args.command == "plan":
+        job, final_output = plan_job(pdf_parser, args.pdf, args.jobs_dir, args.output, args.pages_per_shard)
+        if job is None:
+            return 0 if final_output is not None else 1
+        print(job.job_dir)
+    elif args.command == "work":
+        job = ShardedJob(pdf_parser, args.job_dir, reclaim_after=args.reclaim_after)
+        done = job.work(poll_interval=args.poll_interval, timeout=args.timeout)
+        print(f"Processed {done} shard task(s) of {job.plan['pdf']}")
+    elif args.command == "merge":
+        job = ShardedJob(pdf_parser, args.job_dir)
+        final_output = job.merge(args.output, timeout=args.timeout)
+        if final_output is None:
+            return 1
+        if not args.keep:
+            job.remove()
+    else:
+        if run_local(pdf_parser, args.pdf, args.output, args.workers, args.pages_per_shard) is None:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
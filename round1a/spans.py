@@ -0,0 +1,313 @@
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+FLOAT_COLUMNS = ("x0", "y0", "x1", "y1", "font_size")
+INT_COLUMNS = ("page", "flags", "font_id", "text_id", "block", "line")
+# to_bytes header: count, font_count, text_count, font_bytes, text_bytes
+SIZES_HEADER_BYTES = 5 * 8
+
+
+class SpanTable:
+    """
+    Columnar storage for extracted spans.
+
+    Geometry and font size are float64 arrays, page/flags are int32 arrays and
+    font names and span texts are interned into string tables that the
+    `font_id` / `text_id` columns index into. Pages are 1-based, like the
+    `page` key of the span dicts returned by TextExtractor. `block` and `line`
+    are PyMuPDF's block and line numbers within the page, and spans are kept
+    in PyMuPDF's order, so each (page, block, line) is a contiguous run.
+    """
+
+    def __init__(self, x0, y0, x1, y1, font_size, page, flags, font_id, text_id, block, line, fonts, texts):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.font_size = font_size
+        self.page = page
+        self.flags = flags
+        self.font_id = font_id
+        self.text_id = text_id
+        self.block = block
+        self.line = line
+        self.fonts = fonts
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.page)
+
+    @classmethod
+    def empty(cls):
+        floats = [np.empty(0, dtype=np.float64) for _ in FLOAT_COLUMNS]
+        ints = [np.empty(0, dtype=np.int32) for _ in INT_COLUMNS]
+        return cls(*floats, *ints, [], [])
+
+    @classmethod
+    def concat(cls, tables):
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+
+        fonts = []
+        font_index = {}
+        font_ids = []
+        text_ids = []
+        texts = []
+        for table in tables:
+            remap = np.empty(len(table.fonts), dtype=np.int32)
+            for i, font in enumerate(table.fonts):
+                if font not in font_index:
+                    font_index[font] = len(fonts)
+                    fonts.append(font)
+                remap[i] = font_index[font]
+            font_ids.append(remap[table.font_id])
+            text_ids.append(table.text_id + len(texts))
+            texts.extend(table.texts)
+
+        return cls(
+            *[np.concatenate([getattr(t, c) for t in tables]) for c in FLOAT_COLUMNS],
+            np.concatenate([t.page for t in tables]),
+            np.concatenate([t.flags for t in tables]),
+            np.concatenate(font_ids),
+            np.concatenate(text_ids),
+            np.concatenate([t.block for t in tables]),
+            np.concatenate([t.line for t in tables]),
+            fonts,
+            texts,
+        )
+
+    def to_dicts(self):
+        """Converts back to the list-of-dicts format of extract_text_from_page."""
+        spans = []
+        columns = zip(
+            self.x0.tolist(), self.y0.tolist(), self.x1.tolist(), self.y1.tolist(),
+            self.font_size.tolist(), self.page.tolist(), self.flags.tolist(),
+            self.font_id.tolist(), self.text_id.tolist(),
+        )
+        for x0, y0, x1, y1, size, page, flags, font_id, text_id in columns:
+            spans.append({
+                "text": self.texts[text_id],
+                "font_size": size,
+                "font_name": self.fonts[font_id],
+                "flags": flags,
+                "page": page,
+                "bbox": (x0, y0, x1, y1),
+                "y_position": y0
+            })
+        return spans
+
+    def take(self, indices):
+        """The spans at `indices`, with string tables cut down to what they use."""
+        font_ids, font_inverse = np.unique(self.font_id[indices], return_inverse=True)
+        text_ids, text_inverse = np.unique(self.text_id[indices], return_inverse=True)
+        return SpanTable(
+            *[getattr(self, c)[indices] for c in FLOAT_COLUMNS],
+            self.page[indices],
+            self.flags[indices],
+            font_inverse.astype(np.int32),
+            text_inverse.astype(np.int32),
+            self.block[indices],
+            self.line[indices],
+            [self.fonts[i] for i in font_ids.tolist()],
+            [self.texts[i] for i in text_ids.tolist()],
+        )
+
+    def split_pages(self):
+        """{page: SpanTable} for every page that has spans."""
+        if len(self) == 0:
+            return {}
+        bounds = np.flatnonzero(np.diff(self.page)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(self)]))
+        return {
+            int(self.page[start]): self.take(np.arange(start, end))
+            for start, end in zip(starts.tolist(), ends.tolist())
+        }
+
+    def _sizes(self):
+        font_blob, font_offsets = _pack_strings(self.fonts)
+        text_blob, text_offsets = _pack_strings(self.texts)
+        sizes = (len(self), len(font_offsets), len(text_offsets), len(font_blob), len(text_blob))
+        return sizes, (font_blob, font_offsets, text_blob, text_offsets)
+
+    def _write(self, buf, layout, packed):
+        font_blob, font_offsets, text_blob, text_offsets = packed
+        floats, offsets, ints, blobs = _views(buf, layout)
+        for i, column in enumerate(FLOAT_COLUMNS):
+            floats[i] = getattr(self, column)
+        offsets[:len(font_offsets)] = font_offsets
+        offsets[len(font_offsets):] = text_offsets
+        for i, column in enumerate(INT_COLUMNS):
+            ints[i] = getattr(self, column)
+        blobs[:len(font_blob)] = np.frombuffer(font_blob, dtype=np.uint8)
+        blobs[len(font_blob):] = np.frombuffer(text_blob, dtype=np.uint8)
+
+    @classmethod
+    def _read(cls, buf, layout, font_count, font_bytes):
+        floats, offsets, ints, blobs = _views(buf, layout)
+        float_columns = [floats[i].copy() for i in range(len(FLOAT_COLUMNS))]
+        int_columns = [ints[i].copy() for i in range(len(INT_COLUMNS))]
+        fonts = _unpack_strings(bytes(blobs[:font_bytes]), offsets[:font_count])
+        texts = _unpack_strings(bytes(blobs[font_bytes:]), offsets[font_count:])
+        return cls(*float_columns, *int_columns, fonts, texts)
+
+    def to_bytes(self):
+        """The shared-memory layout preceded by its five sizes, e.g. for a file."""
+        sizes, packed = self._sizes()
+        layout = _layout(*sizes)
+        buf = bytearray(SIZES_HEADER_BYTES + layout["size"])
+        buf[:SIZES_HEADER_BYTES] = np.array(sizes, dtype=np.int64).tobytes()
+        self._write(memoryview(buf)[SIZES_HEADER_BYTES:], layout, packed)
+        return bytes(buf)
+
+    @classmethod
+    def from_bytes(cls, data):
+        sizes = np.frombuffer(data, dtype=np.int64, count=5).tolist()
+        layout = _layout(*sizes)
+        return cls._read(memoryview(data)[SIZES_HEADER_BYTES:], layout, sizes[1], sizes[3])
+
+    def to_shared_memory(self):
+        """
+        Copies the table into a new shared memory block and returns a small
+        descriptor that can be sent back from a worker instead of the table.
+        The block is owned by whoever calls `from_shared_memory`.
+        """
+        n = len(self)
+        if n == 0:
+            return None
+
+        sizes, packed = self._sizes()
+        layout = _layout(*sizes)
+
+        shm = shared_memory.SharedMemory(create=True, size=layout["size"])
+        # The receiving process unlinks the block, not this one
+        resource_tracker.unregister(shm._name, "shared_memory")
+        try:
+            self._write(shm.buf, layout, packed)
+        finally:
+            shm.close()
+
+        return {
+            "name": shm.name,
+            "count": n,
+            "font_count": sizes[1],
+            "text_count": sizes[2],
+            "font_bytes": sizes[3],
+            "text_bytes": sizes[4],
+        }
+
+    @classmethod
+    def from_shared_memory(cls, descriptor):
+        """Rebuilds a table from a descriptor and releases the shared block."""
+        if descriptor is None:
+            return cls.empty()
+
+        layout = _layout(
+            descriptor["count"], descriptor["font_count"], descriptor["text_count"],
+            descriptor["font_bytes"], descriptor["text_bytes"],
+        )
+        shm = shared_memory.SharedMemory(name=descriptor["name"])
+        try:
+            return cls._read(shm.buf, layout, descriptor["font_count"], descriptor["font_bytes"])
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class SpanTableBuilder:
+    """Accumulates PyMuPDF spans page by page and interns fonts and texts."""
+
+    def __init__(self):
+        self.x0 = []
+        self.y0 = []
+        self.x1 = []
+        self.y1 = []
+        self.font_size = []
+        self.page = []
+        self.flags = []
+        self.font_id = []
+        self.text_id = []
+        self.block = []
+        self.line = []
+        self.font_index = {}
+        self.text_index = {}
+
+    def add_page(self, page_number, blocks):
+        font_index = self.font_index
+        text_index = self.text_index
+        for block_number, block in enumerate(blocks):
+            if 'lines' not in block:
+                continue
+            for line_number, line in enumerate(block['lines']):
+                for span in line['spans']:
+                    bbox = span['bbox']
+                    self.x0.append(bbox[0])
+                    self.y0.append(bbox[1])
+                    self.x1.append(bbox[2])
+                    self.y1.append(bbox[3])
+                    self.font_size.append(span['size'])
+                    self.page.append(page_number + 1)
+                    self.flags.append(span['flags'])
+                    self.font_id.append(font_index.setdefault(span['font'], len(font_index)))
+                    self.text_id.append(text_index.setdefault(span['text'], len(text_index)))
+                    self.block.append(block_number)
+                    self.line.append(line_number)
+
+    def build(self):
+        return SpanTable(
+            np.array(self.x0, dtype=np.float64),
+            np.array(self.y0, dtype=np.float64),
+            np.array(self.x1, dtype=np.float64),
+            np.array(self.y1, dtype=np.float64),
+            np.array(self.font_size, dtype=np.float64),
+            np.array(self.page, dtype=np.int32),
+            np.array(self.flags, dtype=np.int32),
+            np.array(self.font_id, dtype=np.int32),
+            np.array(self.text_id, dtype=np.int32),
+            np.array(self.block, dtype=np.int32),
+            np.array(self.line, dtype=np.int32),
+            list(self.font_index),
+            list(self.text_index),
+        )
+
+
+def _pack_strings(strings):
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    if strings:
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+    blob = "".join(strings).encode("utf-8", "surrogatepass")
+    return blob, offsets
+
+
+def _unpack_strings(blob, offsets):
+    joined = blob.decode("utf-8", "surrogatepass")
+    bounds = offsets.tolist()
+    return [joined[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def _layout(count, font_count, text_count, font_bytes, text_bytes):
+    float_bytes = len(FLOAT_COLUMNS) * count * 8
+    offset_bytes = (font_count + text_count) * 8
+    int_bytes = len(INT_COLUMNS) * count * 4
+    return {
+        "count": count,
+        "offset_count": font_count + text_count,
+        "offsets_at": float_bytes,
+        "ints_at": float_bytes + offset_bytes,
+        "blobs_at": float_bytes + offset_bytes + int_bytes,
+        "blob_bytes": font_bytes + text_bytes,
+        "size": max(1, float_bytes + offset_bytes + int_bytes + font_bytes + text_bytes),
+    }
+
+
+def _views(buf, layout):
+    count = layout["count"]
+    floats = np.ndarray((len(FLOAT_COLUMNS), count), dtype=np.float64, buffer=buf)
+    offsets = np.ndarray((layout["offset_count"],), dtype=np.int64, buffer=buf, offset=layout["offsets_at"])
+    ints = np.ndarray((len(INT_COLUMNS), count), dtype=np.int32, buffer=buf, offset=layout["ints_at"])
+    blobs = np.ndarray((layout["blob_bytes"],), dtype=np.uint8, buffer=buf, offset=layout["blobs_at"])
+    return floats, offsets, ints, blobs
@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+
+ROUND1A_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1A_DIR)
+
+import batch
+import extract
+
+PDF_DIR = os.path.join(ROUND1A_DIR, "..", "hackathon-task", "sample-1a", "Datasets", "Pdfs")
+PDFS = [os.path.join(PDF_DIR, name) for name in ("kham116.pdf", "E0CCG5S312.pdf", "E0H1CM114.pdf")]
+
+
+def test_slow_consumer_does_not_time_out_finished_tasks(tmp_path):
+    # Results that wait in the queue while the caller is busy count as done
+    # when the worker finished them, not when the caller reads them
+    quarantine = batch.Quarantine(str(tmp_path / "quarantine.json"))
+    with batch.BatchExtractor(processes=2, pages_per_task=1, page_timeout=1.0,
+                              quarantine=quarantine) as extractor:
+        results = []
+        for pdf_path, spans, page_dims, error in extractor.extract(PDFS):
+            results.append((pdf_path, spans, error))
+            if len(results) == 1:
+                time.sleep(3)
+        killed_workers = extractor.killed_workers
+
+    assert [error for _, _, error in results] == [None] * len(PDFS)
+    assert killed_workers == 0
+    assert not os.path.exists(quarantine.path)
+    for pdf_path, spans, _ in results:
+        expected = extract.extract_span_range(pdf_path, 0, extract.get_page_count(pdf_path))
+        assert len(spans) == len(expected)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Repeated runs against one persistent Chroma collection, the way every
+Round1BProcessor run shares /tmp/chroma_db_1b: random uuid4 section IDs
+with `collection.add` (what chroma.py did) against the content-derived
+IDs and upserts of add_sections_to_chroma.
+
+Every run processes one job per sample-1b collection, with sections from
+synthetic outlines (every `--every`-th line a heading, see
+bench_sections.py), and then queries for the job. After each run it
+reports the sections in the collection, how many were embedded, the time
+spent adding them, the size of the persist directory, the median query time and how many of the top
+`--top-k` results came from another job or duplicated a section already
+ranked higher.
+
+By default sections are embedded with a cheap hashed bag of words so the
+script runs without downloading a model; `--model` uses the
+SentenceTransformer model of dbManager.py instead.
+
+    python benchmarks/bench_chroma_ids.py --runs 5 --json chroma_ids.json
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import uuid
+import zlib
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+ROUND1B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1B_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import chromadb
+from chromadb.config import Settings
+
+from chroma import add_sections_to_chroma
+from extraction import extract_sections_from_outline
+from pagetext import PageTextCache
+from bench_sections import DEFAULT_COLLECTIONS_DIR, synthetic_outline
+
+QUERY = "Persona: Travel Planner. Task: Plan a trip of 4 days for a group of 10 college friends."
+
+
+class HashedEmbedding:
+    """Bag of words hashed into `dims` buckets; counts the texts it embeds"""
+
+    def __init__(self, dims=64):
+        self.dims = dims
+        self.embedded = 0
+
+    def __call__(self, input):
+        self.embedded += len(input)
+        vectors = []
+        for text in input:
+            vector = [0.0] * self.dims
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode()) % self.dims] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+class CountingEmbedding:
+    def __init__(self, embedding_function):
+        self.embedding_function = embedding_function
+        self.embedded = 0
+
+    def __call__(self, input):
+        self.embedded += len(input)
+        return self.embedding_function(input)
+
+
+def legacy_add(sections, collection):
+    """chroma.py before content-derived IDs: a fresh uuid4 per section, collection.add"""
+    documents, metadatas, ids = [], [], []
+    for i, section in enumerate(sections):
+        if not section.content.strip():
+            continue
+        documents.append(f"{section.section_title}\n{section.content}")
+        metadatas.append({"title": section.section_title, "document_name": section.document_name,
+                          "page_number": section.page_number, "section_index": i})
+        ids.append(f"{section.document_name}_{section.page_number}_{i}_{uuid.uuid4().hex[:8]}")
+    for i in range(0, len(ids), 100):
+        collection.add(documents=documents[i:i+100], metadatas=metadatas[i:i+100], ids=ids[i:i+100])
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def load_jobs(collections_dir, every, cache_dir):
+    cache = PageTextCache(cache_dir)
+    jobs = []
+    for pdf_dir in sorted(glob.glob(os.path.join(collections_dir, "*", "PDFs"))):
+        sections = []
+        for pdf_path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+            outline = synthetic_outline(cache.pages_text(pdf_path), every)
+            sections += extract_sections_from_outline(pdf_path, {"outline": outline}, cache)
+        jobs.append(sections)
+    return jobs
+
+
+def run_mode(mode, jobs, args, work_dir, embedding_function):
+    persist_dir = os.path.join(work_dir, mode)
+    client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection(name="round1b_sections", embedding_function=embedding_function)
+    add = legacy_add if mode == "uuid_add" else add_sections_to_chroma
+
+    runs = []
+    for _ in range(args.runs):
+        embedded = 0
+        add_seconds = 0.0
+        query_times = []
+        foreign = duplicates = 0
+        for sections in jobs:
+            embedded_before = embedding_function.embedded
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                add(sections, collection)
+            add_seconds += time.perf_counter() - t0
+            embedded += embedding_function.embedded - embedded_before
+            job_documents = {section.document_name for section in sections}
+            # Only content-derived IDs store the PDF hash to scope the query with
+            where = None
+            if mode == "content_ids":
+                where = {"document_sha256": {"$in": sorted({section.document_sha256 for section in sections})}}
+            for _ in range(args.queries):
+                t0 = time.perf_counter()
+                results = collection.query(query_texts=[QUERY], n_results=args.top_k, where=where)
+                query_times.append(time.perf_counter() - t0)
+            seen = set()
+            for document, metadata in zip(results['documents'][0], results['metadatas'][0]):
+                foreign += metadata['document_name'] not in job_documents
+                duplicates += document in seen
+                seen.add(document)
+        runs.append({
+            "sections": collection.count(),
+            "embedded": embedded,
+            "add_seconds": add_seconds,
+            "disk_bytes": directory_bytes(persist_dir),
+            "query_ms": statistics.median(query_times) * 1000,
+            "foreign_results": foreign,
+            "duplicate_results": duplicates,
+        })
+    return runs
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--collections-dir", default=DEFAULT_COLLECTIONS_DIR)
+    arg_parser.add_argument("--every", type=int, default=5, help="Every n-th line is a heading")
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--queries", type=int, default=5, help="Timed queries per job")
+    arg_parser.add_argument("--top-k", type=int, default=15)
+    arg_parser.add_argument("--model", action="store_true", help="Embed with all-MiniLM-L6-v2 like dbManager.py")
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    results = {"runs": args.runs, "modes": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        jobs = load_jobs(args.collections_dir, args.every, os.path.join(work_dir, "page_text"))
+        results["sections_per_run"] = sum(len(sections) for sections in jobs)
+        for mode in ("uuid_add", "content_ids"):
+            if args.model:
+                from chromadb.utils import embedding_functions
+                embedding_function = CountingEmbedding(
+                    embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2"))
+            else:
+                embedding_function = HashedEmbedding()
+            results["modes"][mode] = run_mode(mode, jobs, args, work_dir, embedding_function)
+
+    print(f"{len(jobs)} jobs, {results['sections_per_run']} sections per run")
+    for mode, runs in results["modes"].items():
+        print(mode)
+        print(f"{'run':>5} {'sections':>9} {'embedded':>9} {'add s':>7} {'disk MB':>8} {'query ms':>9} "
+              f"{'foreign':>8} {'dupes':>6}")
+        for i, run in enumerate(runs, 1):
+            print(f"{i:>5} {run['sections']:>9} {run['embedded']:>9} {run['add_seconds']:>7.2f} {run['disk_bytes'] / 1e6:>8.1f} "
+                  f"{run['query_ms']:>9.2f} {run['foreign_results']:>8} {run['duplicate_results']:>6}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
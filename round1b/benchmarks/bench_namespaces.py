@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Retrieval latency of one job as unrelated jobs pile up in the same
+persist directory: one shared collection, where queries filter on the
+content hashes of the job's PDFs, against one namespace (collection) per
+job corpus with size-budget eviction (namespaces.py).
+
+The measured job is sample-1b Collection 1. The history consists of jobs
+over random subsets of the other sample-1b PDFs, with sections from
+synthetic outlines (see bench_sections.py). After every `--step` history
+jobs the measured job is run again. The script reports the add time, the
+median query time, the sections in the queried collection and the
+size of the persist directory. It ends with a compaction
+(namespaces.compact) of each directory. Embeddings are the hashed bag of
+words of bench_chroma_ids.py.
+
+    python benchmarks/bench_namespaces.py --history 40 --step 10 --max-sections 6000
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+ROUND1B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1B_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import chromadb
+from chromadb.config import Settings
+
+import namespaces
+from chroma import add_sections_to_chroma
+from bench_sections import DEFAULT_COLLECTIONS_DIR
+from bench_chroma_ids import QUERY, HashedEmbedding, directory_bytes, load_jobs
+
+
+def history_jobs(jobs, count, seed=0):
+    """`count` jobs over random subsets of the PDFs of every collection but the first"""
+    rng = random.Random(seed)
+    by_document = {}
+    for sections in jobs[1:]:
+        for section in sections:
+            by_document.setdefault(section.document_sha256, []).append(section)
+    documents = sorted(by_document)
+    history = []
+    for _ in range(count):
+        picked = rng.sample(documents, rng.randint(3, min(8, len(documents))))
+        history.append([section for sha256 in picked for section in by_document[sha256]])
+    return history
+
+
+class Store:
+    def __init__(self, mode, persist_dir, args):
+        self.mode = mode
+        self.args = args
+        self.persist_dir = persist_dir
+        self.embedding_function = HashedEmbedding()
+        self.client = chromadb.PersistentClient(path=persist_dir, settings=Settings(anonymized_telemetry=False))
+        if mode == "shared":
+            self.shared = self.client.get_or_create_collection(name=namespaces.LEGACY_COLLECTION,
+                                                               embedding_function=self.embedding_function)
+
+    def run_job(self, sections):
+        """Add the job's sections; returns (collection, query filter, add seconds)"""
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if self.mode == "shared":
+                add_sections_to_chroma(sections, self.shared)
+                document_hashes = sorted({section.document_sha256 for section in sections})
+                collection, where = self.shared, {"document_sha256": {"$in": document_hashes}}
+            else:
+                name = namespaces.namespace_for([section.document_sha256 for section in sections])
+                collection, where = namespaces.use_namespace(self.client, name, self.embedding_function), None
+                add_sections_to_chroma(sections, collection)
+                namespaces.evict_namespaces(self.client, ttl_seconds=None, max_sections=self.args.max_sections,
+                                            keep=name)
+        return collection, where, time.perf_counter() - t0
+
+    def measure(self, sections):
+        collection, where, add_seconds = self.run_job(sections)
+        query_times = []
+        for _ in range(self.args.queries):
+            t0 = time.perf_counter()
+            collection.query(query_texts=[QUERY], n_results=self.args.top_k, where=where)
+            query_times.append(time.perf_counter() - t0)
+        return {
+            "add_seconds": add_seconds,
+            "query_ms": statistics.median(query_times) * 1000,
+            "collection_sections": collection.count(),
+            "disk_bytes": directory_bytes(self.persist_dir),
+        }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--collections-dir", default=DEFAULT_COLLECTIONS_DIR)
+    arg_parser.add_argument("--every", type=int, default=5, help="Every n-th line is a heading")
+    arg_parser.add_argument("--history", type=int, default=40, help="Unrelated jobs run in total")
+    arg_parser.add_argument("--step", type=int, default=10, help="Measure after this many history jobs")
+    arg_parser.add_argument("--max-sections", type=int, default=6000, help="Namespace size budget")
+    arg_parser.add_argument("--queries", type=int, default=5)
+    arg_parser.add_argument("--top-k", type=int, default=15)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    results = {"history": args.history, "max_sections": args.max_sections, "modes": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        jobs = load_jobs(args.collections_dir, args.every, os.path.join(work_dir, "page_text"))
+        measured, history = jobs[0], history_jobs(jobs, args.history)
+        for mode in ("shared", "namespaced"):
+            store = Store(mode, os.path.join(work_dir, mode), args)
+            points = [dict(history_jobs=0, **store.measure(measured))]
+            for done in range(1, args.history + 1):
+                store.run_job(history[done - 1])
+                if done % args.step == 0 or done == args.history:
+                    points.append(dict(history_jobs=done, **store.measure(measured)))
+            with contextlib.redirect_stdout(io.StringIO()):
+                compaction = namespaces.compact(store.client, store.persist_dir, ttl_seconds=None,
+                                                max_sections=args.max_sections)
+            results["modes"][mode] = {"points": points, "compaction": compaction}
+
+    print(f"Measured job: {len(measured)} sections; {args.history} history jobs; "
+          f"namespace budget {args.max_sections} sections")
+    for mode, result in results["modes"].items():
+        print(mode)
+        print(f"{'history':>8} {'add s':>7} {'query ms':>9} {'in coll.':>9} {'disk MB':>8}")
+        for point in result["points"]:
+            print(f"{point['history_jobs']:>8} {point['add_seconds']:>7.2f} {point['query_ms']:>9.2f} "
+                  f"{point['collection_sections']:>9} {point['disk_bytes'] / 1e6:>8.1f}")
+        compaction = result["compaction"]
+        print(f"  compaction: {len(compaction['evicted'])} collections evicted, "
+              f"{compaction['bytes_before'] / 1e6:.1f} MB -> {compaction['bytes_after'] / 1e6:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
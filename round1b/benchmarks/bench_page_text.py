@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Page text extraction for round1b: LangChain's PyPDFLoader (what
+PDFContentProcessor used) against pagetext.py's PyMuPDF extractor and
+its content-hash cache, on the sample-1b collections.
+
+For every collection each PDF is read once per pass, best of `--rounds`:
+
+    loader       PyPDFLoader(path).load()
+    pymupdf      pagetext.extract_pages_text
+    cache_cold   PageTextCache.pages_text on an empty cache (parse + write)
+    cache_warm   PageTextCache.pages_text once every PDF is cached
+
+A corpus where every collection is referenced by `--inputs` input JSONs
+(personas sharing the documents) costs `--inputs` loader passes before,
+and one cold plus `--inputs - 1` warm cache passes now. The script checks
+both extractors see the same number of pages. The loader needs
+langchain-community and pypdf, which round1b no longer installs:
+
+    pip install langchain-community==0.2.5 pypdf==4.2.0
+    python benchmarks/bench_page_text.py --inputs 3 --json page_text.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import itertools
+import tempfile
+
+ROUND1B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1B_DIR)
+
+from pagetext import PageTextCache, extract_pages_text
+
+DEFAULT_COLLECTIONS_DIR = os.path.join(ROUND1B_DIR, "..", "hackathon-task", "sample-1b")
+
+
+def loader_pages_text(pdf_path):
+    from langchain_community.document_loaders import PyPDFLoader
+    return {i: doc.page_content for i, doc in enumerate(PyPDFLoader(pdf_path).load())}
+
+
+def best_time(fn, pdf_paths, rounds, setup=None):
+    best = float("inf")
+    pages = None
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        pages = [fn(path) for path in pdf_paths]
+        best = min(best, time.perf_counter() - t0)
+    return best, pages
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--collections-dir", default=DEFAULT_COLLECTIONS_DIR)
+    arg_parser.add_argument("--inputs", type=int, default=3, help="Input JSONs referencing each collection")
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    collections = sorted(glob.glob(os.path.join(args.collections_dir, "*", "PDFs")))
+    results = {"inputs": args.inputs, "collections": {}}
+    same_pages = True
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for pdf_dir in collections:
+            name = os.path.basename(os.path.dirname(pdf_dir))
+            pdf_paths = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+            cache = None
+            cache_dirs = itertools.count()
+
+            def fresh_cache():
+                nonlocal cache
+                cache = PageTextCache(os.path.join(work_dir, f"{name}_{next(cache_dirs)}"))
+
+            times = {}
+            times["loader"], loaded = best_time(loader_pages_text, pdf_paths, args.rounds)
+            times["pymupdf"], extracted = best_time(extract_pages_text, pdf_paths, args.rounds)
+            times["cache_cold"], _ = best_time(lambda path: cache.pages_text(path), pdf_paths, args.rounds,
+                                               setup=fresh_cache)
+            times["cache_warm"], cached = best_time(lambda path: cache.pages_text(path), pdf_paths, args.rounds)
+
+            same_pages &= [len(p) for p in loaded] == [len(p) for p in extracted]
+            same_pages &= cached == extracted
+            before = times["loader"] * args.inputs
+            after = times["cache_cold"] + times["cache_warm"] * (args.inputs - 1)
+            results["collections"][name] = {
+                "documents": len(pdf_paths),
+                "pages": sum(len(p) for p in extracted),
+                "seconds": times,
+                "extract_speedup": times["loader"] / times["pymupdf"],
+                "corpus_seconds": {"loader": before, "cached": after},
+                "corpus_speedup": before / after,
+            }
+
+    results["same_pages"] = same_pages
+    for name, result in results["collections"].items():
+        times = result["seconds"]
+        print(f"{name}: {result['documents']} PDFs, {result['pages']} pages")
+        for mode, seconds in times.items():
+            print(f"{mode:>12}: {seconds * 1000:8.1f} ms")
+        print(f"{'':>12}  PyMuPDF {result['extract_speedup']:.1f}x faster than PyPDFLoader; "
+              f"{args.inputs} inputs: {result['corpus_seconds']['loader']:.2f}s -> "
+              f"{result['corpus_seconds']['cached']:.2f}s ({result['corpus_speedup']:.1f}x)")
+    if not same_pages:
+        print("Page counts or cached text DIFFER")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0 if same_pages else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Section slicing: PDFContentProcessor._extract_section_content called per
+outline heading (what extraction.py did) against the single-pass
+_slice_sections.
+
+Page text comes from the sample-1b PDFs (pagetext.py). Their outlines are
+synthetic: every `--every`-th non-empty line becomes a heading, so the
+outlines are long and pages hold several headings, each of which splits
+and searches its pages again. Besides every PDF on its own, all pages of
+all collections are also run as one document. Best of `--rounds`; the
+script checks both give the same content for every heading and reports
+how many characters the copied section strings held against the shared
+text.
+
+    python benchmarks/bench_sections.py --every 5 --json sections.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+ROUND1B_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROUND1B_DIR)
+
+from pagetext import extract_pages_text
+from processor import PDFContentProcessor
+
+DEFAULT_COLLECTIONS_DIR = os.path.join(ROUND1B_DIR, "..", "hackathon-task", "sample-1b")
+
+
+def synthetic_outline(pages_text, every):
+    lines = [(page_num, line.strip()) for page_num, page in sorted(pages_text.items())
+             for line in page.split('\n') if line.strip()]
+    return [{"level": "H1", "text": text, "page": page_num} for page_num, text in lines[::every]]
+
+
+def per_heading(processor, outline, pages_text):
+    return [processor._extract_section_content(heading, outline[i+1] if i+1 < len(outline) else None, pages_text)
+            for i, heading in enumerate(outline)]
+
+
+def best_time(fn, rounds):
+    best = float("inf")
+    result = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--collections-dir", default=DEFAULT_COLLECTIONS_DIR)
+    arg_parser.add_argument("--every", type=int, default=5, help="Every n-th line is a heading")
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    processor = PDFContentProcessor()
+    documents = {}
+    corpus = {}
+    for pdf_path in sorted(glob.glob(os.path.join(args.collections_dir, "*", "PDFs", "*.pdf"))):
+        pages_text = extract_pages_text(pdf_path)
+        documents[os.path.basename(pdf_path)] = pages_text
+        first_page = len(corpus)
+        corpus.update((first_page + i, pages_text[i]) for i in range(len(pages_text)))
+
+    runs = {"all PDFs": list(documents.values()), "one document": [corpus]}
+    results = {"every": args.every, "runs": {}}
+    same_content = True
+    for name, docs in runs.items():
+        outlines = [synthetic_outline(pages_text, args.every) for pages_text in docs]
+        loop_seconds, copied = best_time(
+            lambda: [per_heading(processor, outline, pages_text) for outline, pages_text in zip(outlines, docs)],
+            args.rounds)
+        slice_seconds, sliced = best_time(
+            lambda: [processor._slice_sections(outline, pages_text) for outline, pages_text in zip(outlines, docs)],
+            args.rounds)
+        same_content &= all(contents == [text[start:end] for start, end in spans]
+                            for contents, (text, spans) in zip(copied, sliced))
+        results["runs"][name] = {
+            "documents": len(docs),
+            "pages": sum(len(pages_text) for pages_text in docs),
+            "headings": sum(len(outline) for outline in outlines),
+            "seconds": {"per_heading": loop_seconds, "single_pass": slice_seconds},
+            "speedup": loop_seconds / slice_seconds,
+            "copied_chars": sum(len(content) for contents in copied for content in contents),
+            "shared_chars": sum(len(text) for text, _ in sliced),
+        }
+
+    results["same_content"] = same_content
+    for name, result in results["runs"].items():
+        print(f"{name}: {result['documents']} documents, {result['pages']} pages, {result['headings']} headings")
+        print(f"  per heading {result['seconds']['per_heading'] * 1000:9.1f} ms, "
+              f"single pass {result['seconds']['single_pass'] * 1000:7.1f} ms ({result['speedup']:.1f}x); "
+              f"{result['copied_chars']} copied chars -> {result['shared_chars']} shared")
+    print(f"{'Same' if same_content else 'DIFFERENT'} content for every heading")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    return 0 if same_content else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,15 @@
-import uuid
 from typing import List
+from models import create_section_id
 
 def add_sections_to_chroma(sections, collection):
     """
     Add extracted sections to ChromaDB with improved error handling.
+    Section IDs are derived from the PDF content hash, the outline position
+    and the section text, so a section already in the collection is never
+    embedded again: new IDs are upserted, stored sections whose metadata
+    changed are updated without re-embedding, the rest are left alone.
+    Stored sections of these PDFs that are not in `sections` (an older
+    outline or text) are deleted, so each PDF is stored once.
     :param sections: List of extracted sections.
     :param collection: ChromaDB collection instance.
     """
@@ -11,9 +17,9 @@ def add_sections_to_chroma(sections, collection):
         print("No sections to add to ChromaDB.")
         return
     
-    documents = []
-    metadatas = []
-    ids = []
+    # section ID -> (document, metadata); a PDF listed twice (even under
+    # another name) gives the same IDs and is stored once
+    records = {}
     
     for i, section in enumerate(sections):
         try:
@@ -22,43 +28,60 @@ def add_sections_to_chroma(sections, collection):
                 print(f"Skipping empty section: {section.section_title}")
                 continue
             
-            # Create unique ID
-            section_id = f"{section.document_name}_{section.page_number}_{i}_{uuid.uuid4().hex[:8]}"
+            document = f"{section.section_title}\n{section.content}"
+            section_id = create_section_id(section.document_sha256, section.section_index, document)
+            if section_id in records:
+                continue
             
-            documents.append(f"{section.section_title}\n{section.content}")
-            metadatas.append({
+            records[section_id] = (document, {
                 "title": section.section_title or "Untitled",
                 "content_length": len(section.content),
                 "document_name": section.document_name or "Unknown",
+                "document_sha256": section.document_sha256,
                 "page_number": section.page_number or 0,
                 "heading_level": getattr(section, 'heading_level', 'unknown'),
-                "section_index": i
+                "section_index": section.section_index
             })
-            ids.append(section_id)
             
         except Exception as e:
             print(f"Error processing section {i}: {e}")
             continue
     
-    if not documents:
+    if not records:
         print("No valid documents to add after filtering.")
         return
     
+    document_hashes = sorted({metadata["document_sha256"] for _, metadata in records.values()})
     try:
+        # Everything already stored for these PDFs, in one read
+        stored = collection.get(where={"document_sha256": {"$in": document_hashes}}, include=["metadatas"])
+        stored_metas = dict(zip(stored['ids'], stored['metadatas']))
+        
+        new_ids = [section_id for section_id in records if section_id not in stored_metas]
+        changed_ids = [section_id for section_id in records
+                       if section_id in stored_metas and stored_metas[section_id] != records[section_id][1]]
+        stale_ids = [section_id for section_id in stored_metas if section_id not in records]
+        
         # Add to ChromaDB in batches if needed
         batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i+batch_size]
-            batch_metas = metadatas[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
-            
-            collection.add(
-                documents=batch_docs,
-                metadatas=batch_metas,
+        for i in range(0, len(new_ids), batch_size):
+            batch_ids = new_ids[i:i+batch_size]
+            collection.upsert(
+                documents=[records[section_id][0] for section_id in batch_ids],
+                metadatas=[records[section_id][1] for section_id in batch_ids],
                 ids=batch_ids
             )
+        if changed_ids:
+            collection.update(
+                metadatas=[records[section_id][1] for section_id in changed_ids],
+                ids=changed_ids
+            )
+        if stale_ids:
+            collection.delete(ids=stale_ids)
             
-        print(f"Successfully added {len(documents)} sections to ChromaDB.")
+        print(f"Successfully added {len(new_ids)} sections to ChromaDB "
+              f"({len(records) - len(new_ids)} already stored, {len(changed_ids)} updated, "
+              f"{len(stale_ids)} stale removed).")
         
     except Exception as e:
         print(f"Error adding sections to ChromaDB: {e}")
@@ -1,6 +1,8 @@
 # chroma_utils.py - Utility script for managing ChromaDB
 from dbManager import ChromaDBManager
+import namespaces
 import os
+import sys
 
 def inspect_database():
     """Inspect the current state of the database"""
@@ -151,6 +153,25 @@ def check_storage_location():
     else:
         print("❌ Storage directory does not exist yet")
 
+def compact_database(persist_dir=None):
+    """Evict expired and over-budget job namespaces and reclaim their disk space"""
+    if persist_dir is None:
+        persist_dir = input("Persist directory [/tmp/chroma_db_1b]: ").strip() or "/tmp/chroma_db_1b"
+    if not os.path.exists(os.path.join(persist_dir, "chroma.sqlite3")):
+        print(f"No ChromaDB database at {os.path.abspath(persist_dir)}")
+        return
+    
+    db_manager = ChromaDBManager(persist_directory=persist_dir, collection_name=None)
+    result = db_manager.compact()
+    
+    print(f"Evicted {len(result['evicted'])} collections, removed {len(result['orphan_segments'])} orphaned segments")
+    for name in result['evicted']:
+        print(f"  - {name}")
+    print(f"{result['namespaces']} namespaces left")
+    for namespace in namespaces.list_namespaces(db_manager.client):
+        print(f"  {namespace['name']}: {namespace['sections']} sections")
+    print(f"Disk usage: {result['bytes_before'] / 1e6:.1f} MB -> {result['bytes_after'] / 1e6:.1f} MB")
+
 def main():
     """Main menu for database utilities"""
     while True:
@@ -162,6 +183,7 @@ def main():
         print("4. Check storage location") 
         print("5. Test query")
         print("6. Reset database")
+        print("7. Compact database (evict old job namespaces)")
         print("9. Exit")
         
         choice = input("\nEnter your choice (1-9): ").strip()
@@ -176,6 +198,8 @@ def main():
             test_query()
         elif choice == '6':
             reset_database()
+        elif choice == '7':
+            compact_database()
         elif choice == '9':
             print("Goodbye!")
             break
@@ -183,4 +207,8 @@ def main():
             print("Invalid choice. Please try again.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python chromaUtils.py compact [persist_dir] runs compaction without the menu
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        compact_database(sys.argv[2] if len(sys.argv) > 2 else "/tmp/chroma_db_1b")
+    else:
+        main()
\ No newline at end of file
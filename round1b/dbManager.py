@@ -4,6 +4,7 @@ from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 from sentence_transformers import SentenceTransformer
 import os
+import namespaces
 
 class ChromaDBManager:
     def __init__(self, persist_directory="chroma_db", collection_name="document_sections"):
@@ -28,11 +29,13 @@ class ChromaDBManager:
             model_name="all-MiniLM-L6-v2"
         )
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name, 
-            embedding_function=self.embedding_function
-        )
+        # Get or create collection; without a name, use_namespace picks one per job
+        self.collection = None
+        if collection_name is not None:
+            self.collection = self.client.get_or_create_collection(
+                name=collection_name, 
+                embedding_function=self.embedding_function
+            )
         
         print(f"ChromaDB initialized with persistent storage at: {os.path.abspath(persist_directory)}")
     
@@ -54,6 +57,25 @@ class ChromaDBManager:
         )
         print(f"Collection '{self.collection_name}' recreated.")
     
+    def use_namespace(self, document_hashes):
+        """Switch to the collection of the job whose PDFs have these content hashes"""
+        self.collection_name = namespaces.namespace_for(document_hashes)
+        self.collection = namespaces.use_namespace(self.client, self.collection_name, self.embedding_function)
+        print(f"Using namespace '{self.collection_name}'")
+        return self.collection
+    
+    def evict_namespaces(self, ttl_seconds=namespaces.NAMESPACE_TTL_SECONDS,
+                         max_sections=namespaces.MAX_NAMESPACE_SECTIONS):
+        """Evict expired and over-budget namespaces, never the current one"""
+        evicted = namespaces.evict_namespaces(self.client, ttl_seconds, max_sections, keep=self.collection_name)
+        if evicted:
+            print(f"Evicted {len(evicted)} namespaces: {', '.join(evicted)}")
+        return evicted
+    
+    def compact(self, ttl_seconds=namespaces.NAMESPACE_TTL_SECONDS,
+                max_sections=namespaces.MAX_NAMESPACE_SECTIONS):
+        return namespaces.compact(self.client, self.persist_directory, ttl_seconds, max_sections)
+    
     def get_collection_stats(self):
         count = self.collection.count()
         print(f"Collection '{self.collection_name}' contains {count} documents")
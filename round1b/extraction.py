@@ -1,13 +1,15 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from models import DocumentSection
+from pagetext import PageTextCache
 from processor import PDFContentProcessor
 
 def extract_sections_from_outline(
     pdf_path: str,
-    outline_data: Dict[str, Any]
+    outline_data: Dict[str, Any],
+    page_text_cache: Optional[PageTextCache] = None
 ) -> List[DocumentSection]:
     
-    processor = PDFContentProcessor()
+    processor = PDFContentProcessor(page_text_cache)
 
     sections = []
     outline = outline_data['outline']
@@ -15,24 +17,21 @@ def extract_sections_from_outline(
 
     # This is crucial: Extract all pages text ONCE
     pages_text = processor._extract_pages_text(pdf_path)
+    document_sha256 = processor._document_sha256(pdf_path)
 
-    for i, heading in enumerate(outline):
-        # Get the next heading (to know where current section ends)
-        # This part of the logic is correct as per your initial design
-        next_heading = outline[i+1] if i+1 < len(outline) else None
-
-        # Call the internal processor method with the necessary arguments
-        # The fix for content extraction goes INSIDE this _extract_section_content method
-        section_content = processor._extract_section_content(
-            current_heading=heading,
-            next_heading=next_heading,
-            pages_text=pages_text # Pass the full pages_text here
-        )
+    # One pass over the pages slices out every section; the sections share
+    # the document text and hold offsets into it
+    text, spans = processor._slice_sections(outline, pages_text)
 
+    for i, (heading, (start, end)) in enumerate(zip(outline, spans)):
         section = DocumentSection(
             document_name=document_name,
+            document_sha256=document_sha256,
             section_title=heading['text'],
-            content=section_content,
+            section_index=i,
+            text=text,
+            start=start,
+            end=end,
             page_number=heading['page'],
             heading_level=heading['level'],
             parent_sections=[] # This might need to be populated if you build a hierarchy
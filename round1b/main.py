@@ -8,18 +8,24 @@ from pathlib import Path
 
 import llm
 from extraction import extract_sections_from_outline
+from pagetext import PageTextCache
 from chroma import add_sections_to_chroma, query_chroma
 from dbManager import ChromaDBManager
 from models import DocumentSection, PersonaJobInput, ExtractedSection
 
+# Page text of every PDF, shared by all input JSONs that reference it
+PAGE_TEXT_CACHE_DIR = "/tmp/page_text_1b"
+
 class Round1BProcessor:
-    def __init__(self, persist_directory="/tmp/chroma_db_1b"):
+    def __init__(self, persist_directory="/tmp/chroma_db_1b", page_text_cache=None):
 
+        # Each job gets its own collection (namespace), see process_challenge
         self.db_manager = ChromaDBManager(
             persist_directory=persist_directory,
-            collection_name="round1b_sections"
+            collection_name=None
         )
-        self.collection = self.db_manager.get_collection()
+        self.collection = None
+        self.page_text_cache = page_text_cache
         
     def load_input_json(self, input_path: str) -> PersonaJobInput:
         """Load and parse the input JSON file"""
@@ -67,7 +73,7 @@ class Round1BProcessor:
                     outline_data = json.load(f)
                 
                 # Extract sections from this document
-                sections = extract_sections_from_outline(pdf_path, outline_data)
+                sections = extract_sections_from_outline(pdf_path, outline_data, self.page_text_cache)
                 all_sections.extend(sections)
                 
                 print(f"Extracted {len(sections)} sections from {os.path.basename(pdf_path)}")
@@ -82,7 +88,7 @@ class Round1BProcessor:
         return f"Persona: {persona}. Task: {job_to_be_done}"
     
     def rank_sections_by_relevance(self, query: str, top_k: int = 20) -> List[Dict]:
-       
+        """Rank the sections of the job's namespace by similarity to the query"""
         try:
             results = self.collection.query(
                 query_texts=[query],
@@ -205,9 +211,12 @@ class Round1BProcessor:
             if not sections:
                 raise Exception("No sections were extracted from any documents")
             
-            # Add sections to ChromaDB
+            # Add sections to the namespace of this job's PDFs, so queries
+            # search only them; unused namespaces of other jobs are evicted
+            self.collection = self.db_manager.use_namespace([section.document_sha256 for section in sections])
             print(f"\nAdding {len(sections)} sections to ChromaDB...")
             add_sections_to_chroma(sections, self.collection)
+            self.db_manager.evict_namespaces()
             
             # Build query and rank sections
             query = self.build_query_from_persona_job(input_data.persona, input_data.job_to_be_done)
@@ -274,6 +283,8 @@ def main():
         print("Please ensure input JSON files are mounted in the /app/input directory")
         return
     
+    page_text_cache = PageTextCache(PAGE_TEXT_CACHE_DIR)
+    
     # Process each input file
     for input_file in input_files:
         try:
@@ -286,7 +297,7 @@ def main():
             output_file = os.path.join(output_dir, f"{input_basename}_output.json")
             
             # Initialize processor and run
-            processor = Round1BProcessor()
+            processor = Round1BProcessor(page_text_cache=page_text_cache)
             processor.process_challenge(input_file, output_file, input_dir)
             
             print(f"Successfully processed {input_file}")
@@ -295,6 +306,8 @@ def main():
         except Exception as e:
             print(f"Failed to process {input_file}: {e}")
             continue
+    
+    print(f"Page text cache: {page_text_cache.stats()}")
 
 
 if __name__ == "__main__":
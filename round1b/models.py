@@ -1,17 +1,29 @@
 # models.py
-from dataclasses import dataclass
+import hashlib
+from dataclasses import dataclass, field
 from typing import List, Dict, Any
 from datetime import datetime
 
 @dataclass
 class DocumentSection:
     document_name: str
+    document_sha256: str
     section_title: str
-    content: str
+    # Position of the section's heading in the document outline
+    section_index: int
+    # Text of the whole document, shared by all its sections; the section
+    # is text[start:end]
+    text: str = field(repr=False)
+    start: int
+    end: int
     page_number: int
     heading_level: str
     parent_sections: List[str]
 
+    @property
+    def content(self) -> str:
+        return self.text[self.start:self.end]
+
 @dataclass
 class PersonaJobInput:
     persona: str
@@ -27,6 +39,11 @@ class ExtractedSection:
     relevance_score: float = 0.0
 
 # You can also add utility functions here
-def create_section_id(document_name: str, page: int, index: int) -> str:
-    """Create unique ID for a section"""
-    return f"{document_name}_{page}_{index}"
\ No newline at end of file
+def create_section_id(document_sha256: str, index: int, text: str) -> str:
+    """
+    Create the ID of a section from the PDF content hash, the outline
+    position and a hash of the section text, so the same section always
+    gets the same ID and changed text gets a new one
+    """
+    text_sha256 = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{document_sha256[:16]}_{index}_{text_sha256[:16]}"
\ No newline at end of file
@@ -0,0 +1,140 @@
+# namespaces.py - One Chroma collection per job corpus, evicted by age and size
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+from typing import List, Dict, Any, Optional
+
+NAMESPACE_PREFIX = "round1b_job_"
+# The single collection every job shared before namespaces
+LEGACY_COLLECTION = "round1b_sections"
+# Namespaces unused for longer than this are evicted
+NAMESPACE_TTL_SECONDS = 24 * 60 * 60
+# Once all namespaces hold more sections than this, the least recently used go
+MAX_NAMESPACE_SECTIONS = 50_000
+
+
+def namespace_for(document_hashes: List[str]) -> str:
+    """Collection name of a job corpus: input JSONs over the same PDFs share it"""
+    digest = hashlib.sha256(json.dumps(sorted(set(document_hashes))).encode()).hexdigest()
+    return f"{NAMESPACE_PREFIX}{digest[:16]}"
+
+
+def use_namespace(client, name: str, embedding_function):
+    """Get or create the collection of a namespace and mark it used now"""
+    now = time.time()
+    try:
+        collection = client.get_collection(name=name, embedding_function=embedding_function)
+        metadata = dict(collection.metadata or {})
+    except ValueError:
+        collection = client.create_collection(name=name, embedding_function=embedding_function)
+        metadata = {"created": now}
+    metadata["last_used"] = now
+    collection.modify(metadata=metadata)
+    return collection
+
+
+def list_namespaces(client) -> List[Dict[str, Any]]:
+    """Every namespace with its section count and last use, least recently used first"""
+    namespaces = []
+    for collection in client.list_collections():
+        if not collection.name.startswith(NAMESPACE_PREFIX):
+            continue
+        metadata = collection.metadata or {}
+        namespaces.append({
+            "name": collection.name,
+            "sections": collection.count(),
+            "created": metadata.get("created", 0.0),
+            "last_used": metadata.get("last_used", 0.0),
+        })
+    return sorted(namespaces, key=lambda namespace: namespace["last_used"])
+
+
+def evict_namespaces(
+    client,
+    ttl_seconds: Optional[float] = NAMESPACE_TTL_SECONDS,
+    max_sections: Optional[int] = MAX_NAMESPACE_SECTIONS,
+    keep: Optional[str] = None
+) -> List[str]:
+    """
+    Delete namespaces unused for more than `ttl_seconds`, then the least
+    recently used ones until all left hold at most `max_sections` sections.
+    `keep` (the job's own namespace) is never evicted. Returns the names of
+    the deleted namespaces.
+    """
+    now = time.time()
+    namespaces = list_namespaces(client)
+    total = sum(namespace["sections"] for namespace in namespaces)
+    evicted = []
+    for namespace in namespaces:
+        if namespace["name"] == keep:
+            continue
+        expired = ttl_seconds is not None and now - namespace["last_used"] > ttl_seconds
+        over_budget = max_sections is not None and total > max_sections
+        if not (expired or over_budget):
+            continue
+        client.delete_collection(name=namespace["name"])
+        total -= namespace["sections"]
+        evicted.append(namespace["name"])
+    return evicted
+
+
+def _remove_orphan_segments(persist_directory: str) -> List[str]:
+    """HNSW segment directories of collections the database no longer has"""
+    db_path = os.path.join(persist_directory, "chroma.sqlite3")
+    conn = sqlite3.connect(db_path)
+    try:
+        segment_ids = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    finally:
+        conn.close()
+    removed = []
+    for name in os.listdir(persist_directory):
+        path = os.path.join(persist_directory, name)
+        try:
+            uuid.UUID(name)
+        except ValueError:
+            continue
+        if os.path.isdir(path) and name not in segment_ids:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def compact(
+    client,
+    persist_directory: str,
+    ttl_seconds: Optional[float] = NAMESPACE_TTL_SECONDS,
+    max_sections: Optional[int] = MAX_NAMESPACE_SECTIONS
+) -> Dict[str, Any]:
+    """
+    Evict namespaces (see evict_namespaces), drop the legacy shared
+    collection, remove orphaned segment directories and VACUUM the SQLite
+    file so the freed space goes back to the file system.
+    """
+    bytes_before = _directory_bytes(persist_directory)
+    evicted = evict_namespaces(client, ttl_seconds, max_sections)
+    if any(collection.name == LEGACY_COLLECTION for collection in client.list_collections()):
+        client.delete_collection(name=LEGACY_COLLECTION)
+        evicted.append(LEGACY_COLLECTION)
+    orphans = _remove_orphan_segments(persist_directory)
+
+    conn = sqlite3.connect(os.path.join(persist_directory, "chroma.sqlite3"))
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    return {
+        "evicted": evicted,
+        "orphan_segments": orphans,
+        "namespaces": len(list_namespaces(client)),
+        "bytes_before": bytes_before,
+        "bytes_after": _directory_bytes(persist_directory),
+    }
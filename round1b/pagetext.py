@@ -0,0 +1,123 @@
+# pagetext.py - Page text of the input PDFs, parsed once per document
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+
+import pymupdf
+
+# Bump when a change to extract_pages_text changes the text it returns
+PAGE_TEXT_VERSION = "1"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_pages_text(pdf_path: str) -> Dict[int, str]:
+    """Text of every page with PyMuPDF, keyed by 0-based page number"""
+    with pymupdf.open(pdf_path) as doc:
+        return {page.number: page.get_text() for page in doc}
+
+
+class PageTextCache:
+    """
+    On-disk cache of the page text of each PDF, keyed by content hash.
+
+    Entries live in `<cache_dir>/<PAGE_TEXT_VERSION>/<sha256>.json`, so a
+    document shared by several input JSONs (or copied under another name)
+    is parsed once. Once the entries add up to more than `max_bytes`, the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entry_dir = os.path.join(cache_dir, PAGE_TEXT_VERSION)
+        self.hits = 0
+        self.misses = 0
+        self._hash_memo = {}
+
+        os.makedirs(self.entry_dir, exist_ok=True)
+
+        # name -> [size, last used]
+        self._entries = {}
+        for name in os.listdir(self.entry_dir):
+            if not name.endswith('.json'):
+                continue
+            stat = os.stat(os.path.join(self.entry_dir, name))
+            self._entries[name] = [stat.st_size, stat.st_mtime]
+        self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    def key_for(self, pdf_path: str) -> str:
+        stat = os.stat(pdf_path)
+        memo_key = (os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+        key = self._hash_memo.get(memo_key)
+        if key is None:
+            key = file_sha256(pdf_path)
+            self._hash_memo[memo_key] = key
+        return key
+
+    def get(self, pdf_path: str) -> Optional[Dict[int, str]]:
+        name = self.key_for(pdf_path) + '.json'
+        path = os.path.join(self.entry_dir, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        if name in self._entries:
+            self._entries[name][1] = os.stat(path).st_mtime
+        self.hits += 1
+        return dict(enumerate(pages))
+
+    def put(self, pdf_path: str, pages_text: Dict[int, str]):
+        name = self.key_for(pdf_path) + '.json'
+        path = os.path.join(self.entry_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([pages_text[i] for i in range(len(pages_text))], f)
+        os.replace(tmp_path, path)
+
+        stat = os.stat(path)
+        if name in self._entries:
+            self._total_bytes -= self._entries[name][0]
+        self._entries[name] = [stat.st_size, stat.st_mtime]
+        self._total_bytes += stat.st_size
+        self._evict()
+
+    def pages_text(self, pdf_path: str) -> Dict[int, str]:
+        """Page text of `pdf_path`, parsed only if no entry has it"""
+        pages_text = self.get(pdf_path)
+        if pages_text is None:
+            pages_text = extract_pages_text(pdf_path)
+            self.put(pdf_path, pages_text)
+        return pages_text
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.entry_dir, name))
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+            del self._entries[name]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
@@ -1,24 +1,25 @@
 # processor.py
 import re
-from typing import List, Dict, Any
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional, Tuple
 from models import DocumentSection
+from pagetext import PageTextCache, extract_pages_text, file_sha256
 
 class PDFContentProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, page_text_cache: Optional[PageTextCache] = None):
+        self.page_text_cache = page_text_cache
     
     def _extract_pages_text(self, pdf_path: str) -> Dict[int, str]:
-        """Extract text from each page"""
-        pages_text = {}
-        
-        from langchain_community.document_loaders import PyPDFLoader
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
-        
-        for i, doc in enumerate(documents):
-            pages_text[i] = doc.page_content
-        
-        return pages_text
+        """Extract text from each page, from the cache when it has the PDF"""
+        if self.page_text_cache is not None:
+            return self.page_text_cache.pages_text(pdf_path)
+        return extract_pages_text(pdf_path)
+    
+    def _document_sha256(self, pdf_path: str) -> str:
+        """Content hash of the PDF, memoized by the cache when there is one"""
+        if self.page_text_cache is not None:
+            return self.page_text_cache.key_for(pdf_path)
+        return file_sha256(pdf_path)
     
     def _remove_heading_from_content(self, content: str, heading: str) -> str:
         """Remove heading text from beginning of content"""
@@ -98,3 +99,84 @@ class PDFContentProcessor:
             content_parts.append("\n".join(lines))
 
         return "\n".join(content_parts).strip()
+
+    def _slice_sections(
+    self,
+    outline: List[Dict],
+    pages_text: Dict[int, str]
+) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Content of every outline heading as (start, end) offsets into one
+        text of the document: the stripped non-empty lines of each page
+        joined by newlines, pages joined by newlines. Same content as
+        _extract_section_content per heading, but each page is split once
+        and headings are found through an index built in the same pass,
+        instead of rescanning the pages of every section.
+        """
+        page_numbers = sorted(pages_text)
+        heading_texts = {heading['text'].strip() for heading in outline}
+
+        page_texts = []
+        page_index = {}       # page number -> position in page_numbers
+        page_lines = []       # (first line, end line) of each page
+        page_spans = []       # (start, end) offsets of each page
+        line_starts = []
+        occurrences = {}      # heading text -> lines holding it, in order
+        offset = 0
+        for position, page_num in enumerate(page_numbers):
+            lines = [line.strip() for line in pages_text[page_num].split('\n') if line.strip()]
+            first_line = len(line_starts)
+            page_start = offset
+            for line in lines:
+                if line in heading_texts:
+                    occurrences.setdefault(line, []).append(len(line_starts))
+                line_starts.append(offset)
+                offset += len(line) + 1
+            page_end = offset - 1 if lines else page_start
+            offset = page_end + 1
+            page_index[page_num] = position
+            page_lines.append((first_line, len(line_starts)))
+            page_spans.append((page_start, page_end))
+            page_texts.append("\n".join(lines))
+        text = "\n".join(page_texts)
+
+        def find(heading_text, first_line, end_line):
+            lines = occurrences.get(heading_text.strip(), ())
+            i = bisect_left(lines, first_line)
+            return lines[i] if i < len(lines) and lines[i] < end_line else None
+
+        spans = []
+        for i, heading in enumerate(outline):
+            next_heading = outline[i+1] if i+1 < len(outline) else None
+            start_page = heading['page']
+            end_page = next_heading['page'] if next_heading else page_numbers[-1]
+            if start_page not in page_index or start_page > end_page:
+                spans.append((0, 0))
+                continue
+
+            position = page_index[start_page]
+            first_line, end_line = page_lines[position]
+            heading_line = find(heading['text'], first_line, end_line)
+            if heading_line is None:
+                # Fallback: the full start page and nothing after it
+                start = page_spans[position][0]
+                last = position
+            else:
+                first_line = heading_line + 1
+                start = line_starts[first_line] if first_line < end_line else page_spans[position][1]
+                last = bisect_right(page_numbers, end_page) - 1
+
+            end = page_spans[last][1]
+            if next_heading:
+                next_line = find(next_heading['text'], first_line, page_lines[last][1])
+                if next_line is not None:
+                    end = max(start, line_starts[next_line])
+
+            # .strip(): only page separators can be left at either end
+            while start < end and text[start] == '\n':
+                start += 1
+            while end > start and text[end - 1] == '\n':
+                end -= 1
+            spans.append((start, end))
+
+        return text, spans
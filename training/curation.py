@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Training data curation for the round1a heading classifier.
+
+Every PDF with a ground-truth outline (`<name>.json` next to it in the JSON
+directory) goes through three steps:
+
+  features  round1a's PDFParser extracts the spans, assembles the lines and
+            engineers the features, with the same code as inference. Each
+            worker of a process pool takes one PDF. The featured lines go to
+            the feature store (round1a/featurestore.py) under the PDF's
+            content hash and feature set version, so adding PDFs or
+            relabeling does not extract the others again. Point
+            --feature-store at the store inference writes (/app/feature_store)
+            to reuse the features of every PDF it has parsed
+  labels    the first line on page 1 with the largest relative font size
+            (merged with the next line if its font size is within 1pt) is
+            the Title if it partially matches the ground-truth title. Every
+            other line gets the level of the best fuzz.ratio match among the
+            ground-truth headings on its page, if that scores above the
+            threshold, and Body Text otherwise. A character trigram index
+            narrows every line to the few headings that can still reach the
+            threshold; the labels are the same as comparing every line with
+            every heading of its page
+  dataset   all rows are written as one columnar table (round1a/columnar.py)
+
+    python training/curation.py --output training/dataset --processes 8
+    python training/curation.py --pdf-dir corpus/pdfs --json-dir corpus/outlines --output corpus/dataset
+
+Load the result with `load_dataset(path)`, which returns a DataFrame.
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+from collections import Counter, defaultdict
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import pandas as pd
+from thefuzz import fuzz
+
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+ROUND1A_DIR = os.path.join(os.path.dirname(TRAINING_DIR), "round1a")
+sys.path.insert(0, ROUND1A_DIR)
+
+import extract
+import columnar
+from cache import file_sha256
+from featurestore import FeatureStore
+from parser import PDFParser
+from main import FEATURES
+
+DEFAULT_PDF_DIR = os.path.join(TRAINING_DIR, "..", "hackathon-task", "sample-1a", "Datasets", "Pdfs")
+DEFAULT_JSON_DIR = os.path.join(TRAINING_DIR, "..", "hackathon-task", "sample-1a", "Datasets", "Output.json")
+DEFAULT_FEATURE_STORE = os.path.join(TRAINING_DIR, "feature_store")
+FUZZ_THRESHOLD = 85
+BODY_LABEL = "Body Text"
+TITLE_LABEL = "Title"
+# Character n-grams of the heading index
+NGRAM = 3
+# Columns that are not written to the dataset (x0/y0/x1/y1 hold the bbox)
+DROPPED_COLUMNS = ("bbox",)
+
+
+def normalize_text(text):
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    text = text.strip()
+    text = re.sub(r'[\u2013\u2014]', '-', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text
+
+
+def find_pairs(pdf_dir, json_dir):
+    """(pdf_path, json_path) of every PDF that has a ground-truth outline, sorted by PDF name."""
+    pairs = []
+    for pdf_path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+        json_path = os.path.join(json_dir, os.path.basename(pdf_path).split('.')[0] + ".json")
+        if os.path.exists(json_path):
+            pairs.append((pdf_path, json_path))
+    return pairs
+
+
+def build_parser(extraction_profile=extract.DEFAULT_PROFILE, line_assembly="sorted", prune_repeated_lines=True):
+    """A model-less PDFParser with the settings inference uses."""
+    return PDFParser(model=None, label_encoder=None, feature_list=FEATURES, extraction_profile=extraction_profile,
+                     use_bookmarks=False, line_assembly=line_assembly, prune_repeated_lines=prune_repeated_lines)
+
+
+class HeadingIndex:
+    """
+    Ground-truth headings of one document, grouped by page, with an inverted
+    index from character trigrams to the headings containing them.
+
+    fuzz.ratio is 100 * (1 - d / (len_a + len_b)) rounded, with d the
+    insert/delete distance, so a score above the threshold bounds d. Each
+    insert or delete destroys at most NGRAM trigrams, and the Levenshtein
+    distance is at most d, so a match shares at least
+    max(len_a, len_b) - NGRAM + 1 - NGRAM * d trigrams with the line. Only
+    headings that pass this count (and the length difference, which d also
+    bounds) are scored with fuzz.ratio.
+    """
+
+    def __init__(self, headings, threshold=FUZZ_THRESHOLD):
+        self.threshold = threshold
+        # Largest share of len_a + len_b that d can be while the rounded score stays above the threshold
+        self.max_distance_share = (100 - threshold - 0.5) / 100
+        self.pages = defaultdict(list)
+        self.grams = defaultdict(lambda: defaultdict(list))
+        for heading in headings:
+            norm_text = normalize_text(heading['text'])
+            if not norm_text:
+                continue
+            page_headings = self.pages[heading['page']]
+            heading_id = len(page_headings)
+            page_headings.append((heading['level'], norm_text))
+            for gram, count in Counter(self._ngrams(norm_text)).items():
+                self.grams[heading['page']][gram].append((heading_id, count))
+
+    @staticmethod
+    def _ngrams(text):
+        return [text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)]
+
+    def candidates(self, page, norm_line):
+        """Indices of the headings on `page` that may score above the threshold, in page order."""
+        page_headings = self.pages.get(page)
+        if not page_headings:
+            return []
+        shared = Counter()
+        page_grams = self.grams[page]
+        for gram, count in Counter(self._ngrams(norm_line)).items():
+            for heading_id, heading_count in page_grams.get(gram, ()):
+                shared[heading_id] += min(count, heading_count)
+
+        line_len = len(norm_line)
+        result = []
+        for heading_id, (_, norm_heading) in enumerate(page_headings):
+            heading_len = len(norm_heading)
+            max_distance = int(self.max_distance_share * (line_len + heading_len) + 1e-9)
+            if abs(line_len - heading_len) > max_distance:
+                continue
+            if shared[heading_id] >= max(line_len, heading_len) - NGRAM + 1 - NGRAM * max_distance:
+                result.append(heading_id)
+        return result
+
+    def match(self, page, norm_line):
+        """Level of the best-scoring heading on `page` if it scores above the threshold, else None."""
+        best_level = None
+        best_score = -1
+        page_headings = self.pages.get(page, ())
+        for heading_id in self.candidates(page, norm_line):
+            level, norm_heading = page_headings[heading_id]
+            score = fuzz.ratio(norm_line, norm_heading)
+            if score > best_score:
+                best_level, best_score = level, score
+        return best_level if best_score > self.threshold else None
+
+
+def label_lines(featured_df, ground_truth, threshold=FUZZ_THRESHOLD):
+    """Labels for the featured lines of one document (0-based pages) from its ground-truth JSON."""
+    labels = np.full(len(featured_df), BODY_LABEL, dtype=object)
+    if featured_df.empty:
+        return labels
+    norm_texts = [normalize_text(text) for text in featured_df['text'].tolist()]
+    pages = featured_df['page'].tolist()
+
+    first_page = np.flatnonzero(featured_df['page'].to_numpy() == 0)
+    if len(first_page):
+        sizes = featured_df['relative_font_size'].to_numpy()
+        candidate = int(first_page[np.argmax(sizes[first_page])])
+        title_text = norm_texts[candidate]
+        merged = False
+        font_sizes = featured_df['avg_font_size'].to_numpy()
+        if candidate + 1 < len(featured_df) and abs(font_sizes[candidate + 1] - font_sizes[candidate]) < 1:
+            title_text += " " + norm_texts[candidate + 1]
+            merged = True
+        if fuzz.partial_ratio(title_text, normalize_text(ground_truth.get('title', ""))) > threshold:
+            labels[candidate] = TITLE_LABEL
+            if merged:
+                labels[candidate + 1] = TITLE_LABEL
+
+    index = HeadingIndex(ground_truth.get('outline', []), threshold)
+    for i, (page, norm_text) in enumerate(zip(pages, norm_texts)):
+        if labels[i] == TITLE_LABEL:
+            continue
+        level = index.match(page, norm_text)
+        if level is not None:
+            labels[i] = level
+    return labels
+
+
+def _extract_features(pdf_parser, pdf_path):
+    """Featured lines of one PDF, extracted in this process (pool workers cannot have pools of their own)."""
+    text_extractor = extract.TextExtractor(pdf_path, pdf_parser.extraction_profile)
+    try:
+        page_count = text_extractor.page_count
+        page_dims = text_extractor.get_page_dimensions(0) if page_count else None
+    finally:
+        text_extractor.document.close()
+    spans = extract.extract_span_range(pdf_path, 0, page_count, pdf_parser.extraction_profile)
+    return pdf_parser._create_features_for_new_pdf(pdf_path, spans, page_dims)
+
+
+def curate_document(task):
+    """
+    Pool task: (pdf_path, json_path, feature store directory, parser settings,
+    threshold). Returns (pdf_path, sha256, labeled DataFrame or None, whether
+    the features came from the store, error).
+    """
+    pdf_path, json_path, store_dir, settings, threshold = task
+    try:
+        pdf_parser = build_parser(**settings)
+        if store_dir is not None:
+            pdf_parser.feature_store = FeatureStore.for_parser(store_dir, pdf_parser)
+            sha256 = pdf_parser.feature_store.key_for(pdf_path)
+        else:
+            sha256 = file_sha256(pdf_path)
+        featured_df = pdf_parser._load_stored_features(pdf_path)
+        hit = featured_df is not None
+        if featured_df is None:
+            featured_df = _extract_features(pdf_parser, pdf_path)
+        featured_df = featured_df.drop(columns=[c for c in DROPPED_COLUMNS if c in featured_df.columns])
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            ground_truth = json.load(f)
+        featured_df['label'] = label_lines(featured_df, ground_truth, threshold)
+        return pdf_path, sha256, featured_df, hit, None
+    except Exception as e:
+        return pdf_path, None, None, False, str(e)
+
+
+def curate(pairs, output_dir, store_dir=DEFAULT_FEATURE_STORE, processes=None, threshold=FUZZ_THRESHOLD,
+           **settings):
+    """
+    Builds the labeled dataset for (pdf_path, json_path) pairs and writes it
+    to `output_dir`. Returns (DataFrame, summary); failed PDFs are listed
+    in the summary and left out of the dataset.
+    """
+    t0 = time.perf_counter()
+    tasks = [(pdf_path, json_path, store_dir, settings, threshold) for pdf_path, json_path in pairs]
+    results = {}
+    with Pool(processes or cpu_count()) as pool:
+        for pdf_path, sha256, labeled_df, hit, error in pool.imap_unordered(curate_document, tasks):
+            results[pdf_path] = (sha256, labeled_df, hit, error)
+            status = error or f"{len(labeled_df)} rows{' (stored features)' if hit else ''}"
+            print(f"{os.path.basename(pdf_path)}: {status}")
+
+    frames = []
+    documents = []
+    failures = {}
+    for pdf_path, _ in pairs:
+        sha256, labeled_df, hit, error = results[pdf_path]
+        if error is not None:
+            failures[pdf_path] = error
+            continue
+        frames.append(labeled_df)
+        documents.append({"pdf": os.path.basename(pdf_path), "sha256": sha256, "rows": len(labeled_df)})
+    dataset = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    summary = {
+        "documents": documents,
+        "failures": failures,
+        "store_hits": sum(1 for _, _, hit, error in results.values() if hit and error is None),
+        "rows": len(dataset),
+        "labels": {label: int(count) for label, count in dataset['label'].value_counts().items()}
+        if len(dataset) else {},
+        "features": list(FEATURES),
+        "settings": settings,
+        "fuzz_threshold": threshold,
+        "seconds": time.perf_counter() - t0,
+    }
+    columnar.write_table(output_dir, dataset, summary)
+    return dataset, summary
+
+
+def load_dataset(path, columns=None):
+    """The curated dataset at `path` as a DataFrame, plus its summary."""
+    return columnar.read_frame(path, columns)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR)
+    arg_parser.add_argument("--json-dir", default=DEFAULT_JSON_DIR)
+    arg_parser.add_argument("--output", default=os.path.join(TRAINING_DIR, "dataset"), help="Dataset directory")
+    arg_parser.add_argument("--feature-store", default=DEFAULT_FEATURE_STORE, help="Feature store directory")
+    arg_parser.add_argument("--no-feature-store", action="store_true", help="Extract every PDF, store nothing")
+    arg_parser.add_argument("--processes", type=int, default=None)
+    arg_parser.add_argument("--fuzz-threshold", type=int, default=FUZZ_THRESHOLD)
+    arg_parser.add_argument("--line-assembly", default="sorted")
+    arg_parser.add_argument("--keep-repeated-lines", action="store_true",
+                            help="Keep running headers/footers, which inference never classifies")
+    args = arg_parser.parse_args()
+
+    pairs = find_pairs(args.pdf_dir, args.json_dir)
+    if not pairs:
+        print(f"No PDFs with a ground-truth JSON in {args.pdf_dir} / {args.json_dir}")
+        return 1
+    print(f"Curating {len(pairs)} PDFs with matching JSON files")
+    dataset, summary = curate(
+        pairs, args.output, store_dir=None if args.no_feature_store else args.feature_store, processes=args.processes,
+        threshold=args.fuzz_threshold, line_assembly=args.line_assembly,
+        prune_repeated_lines=not args.keep_repeated_lines,
+    )
+
+    print(f"Dataset: {summary['rows']} rows from {len(summary['documents'])} PDFs "
+          f"({summary['store_hits']} from the feature store) in {summary['seconds']:.1f}s -> {args.output}")
+    for label, count in summary["labels"].items():
+        print(f"  {label}: {count}")
+    for pdf_path, error in summary["failures"].items():
+        print(f"  failed {os.path.basename(pdf_path)}: {error}")
+    return 0 if not summary["failures"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())